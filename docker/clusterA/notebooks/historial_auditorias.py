@@ -0,0 +1,205 @@
+# Histórico columnar (Parquet) de las auditorías del clúster
+#
+# El notebook 02_auditoria_integridad.ipynb ya no re-parsea todos los reportes de
+# 'raw_audits' en cada ejecución: este módulo incorpora al histórico solo los
+# reportes nuevos o modificados y guarda sus métricas en Parquet, particionadas
+# por fecha:
+#
+#   historial/fsck/fecha=2026-02-05/fsck_data_dt=2026-02-05.parquet
+#   historial/inventario/fecha=2026-02-05/inventario_dt=2026-02-05.parquet
+#
+# Uso desde el notebook:
+#   import historial_auditorias as historial
+#   historial.actualizar()
+#   historial.tendencia("fsck", capa="/data")
+
+import json
+import re
+from pathlib import Path
+
+import polars as pl
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+DIR_NOTEBOOKS = Path(__file__).resolve().parent
+AUDIT_DIR = DIR_NOTEBOOKS / "raw_audits"
+HISTORIAL_DIR = DIR_NOTEBOOKS / "historial"
+
+# Registro de reportes ya incorporados: {nombre: [tamaño, mtime]}.
+# Si un reporte se reescribe (p.ej. 70/80 repiten la auditoría del día) se vuelve a ingerir.
+REGISTRO = HISTORIAL_DIR / "_ingestados.json"
+
+# Reportes que sabemos leer
+RE_FSCK = re.compile(r"^fsck_(?P<capa>data|backup)_dt=(?P<fecha>\d{4}-\d{2}-\d{2})\.(?P<ext>jsonl|txt)$")
+RE_INVENTARIO = re.compile(r"^inventario(?:_historico|_merkle)?_dt=(?P<fecha>\d{4}-\d{2}-\d{2})\.json$")
+
+# Esquema de cada tabla (la columna 'fecha' va además en el nombre de la partición)
+ESQUEMAS = {
+    "fsck": {
+        "fecha": pl.Utf8, "capa": pl.Utf8, "archivo": pl.Utf8, "estado": pl.Utf8,
+        "HEALTHY": pl.Int8, "CORRUPT": pl.Int64, "MISSING": pl.Int64, "UNDER_REPLICATED": pl.Int64,
+        "total_files": pl.Int64, "total_blocks": pl.Int64, "total_size": pl.Int64,
+    },
+    "inventario": {
+        "fecha": pl.Utf8, "alcance": pl.Utf8, "familia": pl.Utf8, "checksum": pl.Utf8, "archivo": pl.Utf8,
+        "archivos_origen": pl.Int64, "archivos_destino": pl.Int64, "faltan": pl.Int64, "sobran": pl.Int64,
+        "mal_tamano": pl.Int64, "mal_checksum": pl.Int64, "segundos": pl.Float64,
+    },
+}
+
+# ---------------------------------------------------------
+# 2. LECTURA DE REPORTES
+# ---------------------------------------------------------
+def ultima_linea(ruta, tam_cola=256 * 1024):
+    """
+    Última línea no vacía de un archivo, leyendo solo su cola.
+    En el JSONL de fsck el resumen es siempre la última línea, así que no hace
+    falta recorrer los registros de todos los bloques.
+    """
+    with open(ruta, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - tam_cola))
+        lineas = [l for l in f.read().splitlines() if l.strip()]
+    return lineas[-1].decode("utf-8") if lineas else ""
+
+def fila_fsck_jsonl(ruta):
+    """Métricas de un reporte estructurado de fsck (scripts 30/60)."""
+    linea = ultima_linea(ruta)
+    resumen = json.loads(linea) if '"tipo": "resumen"' in linea else {}
+    contadores = resumen.get("contadores", {})
+    return {
+        "estado": resumen.get("estado", ""),
+        "HEALTHY": 1 if resumen.get("estado") == "HEALTHY" else 0,
+        "CORRUPT": contadores.get("corrupt_blocks", 0) + contadores.get("ec_corrupt_block_groups", 0),
+        "MISSING": contadores.get("missing_blocks", 0) + contadores.get("ec_missing_block_groups", 0),
+        "UNDER_REPLICATED": contadores.get("under_replicated_blocks", 0),
+        "total_files": contadores.get("total_files", 0) + contadores.get("ec_total_files", 0),
+        "total_blocks": contadores.get("total_blocks_validated", 0),
+        "total_size": contadores.get("total_size", 0) + contadores.get("ec_total_size", 0),
+    }
+
+def fila_fsck_txt(ruta):
+    """
+    Métricas de un reporte de fsck en texto (auditorías anteriores al JSONL).
+    Mismas reglas que el antiguo parse_fsck_report del notebook, pero línea a línea.
+    """
+    patrones = {
+        "CORRUPT": re.compile(r"Corrupt blocks:\s+(\d+)", re.IGNORECASE),
+        "MISSING": re.compile(r"Missing blocks:\s+(\d+)", re.IGNORECASE),
+        "UNDER_REPLICATED": re.compile(r"Under[- ]replicated blocks:\s+(\d+)", re.IGNORECASE),
+        "total_files": re.compile(r"^\s*Total files:\s+(\d+)"),
+        "total_blocks": re.compile(r"^\s*Total blocks \(validated\):\s+(\d+)"),
+        "total_size": re.compile(r"^\s*Total size:\s+(\d+)"),
+    }
+    fila = dict.fromkeys(patrones, 0)
+    fila["estado"] = ""
+    with open(ruta, encoding="utf-8", errors="ignore") as f:
+        for linea in f:
+            for metrica, patron in patrones.items():
+                encontrado = patron.search(linea)
+                if encontrado:
+                    fila[metrica] += int(encontrado.group(1))
+            if linea.startswith("Status:"):
+                fila["estado"] = linea.split(":", 1)[1].strip()
+    fila["HEALTHY"] = 1 if fila["estado"] == "HEALTHY" else 0
+    return fila
+
+def filas_inventario(ruta, fecha):
+    """Una fila por familia del resumen JSON que deja 50_inventory_compare.py."""
+    datos = json.loads(Path(ruta).read_text(encoding="utf-8"))
+    return [{"fecha": fecha, "alcance": datos.get("alcance", ""), "familia": familia,
+             "checksum": datos.get("checksum", ""), "archivo": Path(ruta).name, **metricas}
+            for familia, metricas in datos.get("familias", {}).items()]
+
+# ---------------------------------------------------------
+# 3. INGESTA INCREMENTAL
+# ---------------------------------------------------------
+def cargar_registro():
+    if REGISTRO.exists():
+        return json.loads(REGISTRO.read_text(encoding="utf-8"))
+    return {}
+
+def guardar_registro(registro):
+    temporal = REGISTRO.with_suffix(".tmp")
+    temporal.write_text(json.dumps(registro, indent=1), encoding="utf-8")
+    temporal.replace(REGISTRO)
+
+def escribir_particion(tabla, fecha, nombre, filas):
+    """Escribe (o reescribe) el Parquet de un reporte dentro de su partición de fecha."""
+    destino = HISTORIAL_DIR / tabla / f"fecha={fecha}" / f"{Path(nombre).stem}.parquet"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_suffix(".tmp")
+    esquema = ESQUEMAS[tabla]
+    pl.DataFrame([{c: fila.get(c) for c in esquema} for fila in filas], schema=esquema).write_parquet(temporal)
+    temporal.replace(destino)
+
+def actualizar(audit_dir=AUDIT_DIR):
+    """
+    Incorpora al histórico los reportes de 'raw_audits' nuevos o modificados.
+    Si de una misma auditoría existen el .jsonl y el .txt, se usa solo el .jsonl.
+    Devuelve el número de reportes ingeridos en esta llamada.
+    """
+    audit_dir = Path(audit_dir)
+    HISTORIAL_DIR.mkdir(parents=True, exist_ok=True)
+    registro = cargar_registro()
+    ingeridos = 0
+
+    for ruta in sorted(audit_dir.glob("*")):
+        fsck = RE_FSCK.match(ruta.name)
+        inventario = RE_INVENTARIO.match(ruta.name)
+        if not (fsck or inventario):
+            continue
+        if fsck and fsck.group("ext") == "txt" and ruta.with_suffix(".jsonl").exists():
+            continue
+
+        # ¿Ya estaba ingerido y no ha cambiado? Lo saltamos sin abrirlo
+        info = ruta.stat()
+        huella = [info.st_size, info.st_mtime_ns]
+        if registro.get(ruta.name) == huella:
+            continue
+
+        if fsck:
+            fila = fila_fsck_jsonl(ruta) if fsck.group("ext") == "jsonl" else fila_fsck_txt(ruta)
+            fila.update(fecha=fsck.group("fecha"), capa=f"/{fsck.group('capa')}", archivo=ruta.name)
+            # El .txt y el .jsonl de la misma auditoría van al mismo Parquet (se sobrescribe)
+            escribir_particion("fsck", fsck.group("fecha"), ruta.name, [fila])
+        else:
+            escribir_particion("inventario", inventario.group("fecha"), ruta.name,
+                               filas_inventario(ruta, inventario.group("fecha")))
+
+        registro[ruta.name] = huella
+        ingeridos += 1
+
+    guardar_registro(registro)
+    return ingeridos
+
+# ---------------------------------------------------------
+# 4. CONSULTAS
+# ---------------------------------------------------------
+def cargar(tabla="fsck", desde=None, hasta=None):
+    """
+    LazyFrame con el histórico de una tabla. Con desde/hasta ('AAAA-MM-DD') solo se
+    abren los archivos de las particiones de ese rango (poda por nombre de carpeta).
+    """
+    particiones = [p for p in sorted((HISTORIAL_DIR / tabla).glob("fecha=*"))
+                   if (desde is None or p.name[6:] >= desde) and (hasta is None or p.name[6:] <= hasta)]
+    archivos = [str(a) for p in particiones for a in sorted(p.glob("*.parquet"))]
+    if not archivos:
+        return pl.LazyFrame(schema=ESQUEMAS[tabla])
+    return pl.scan_parquet(archivos)
+
+def tendencia(tabla="fsck", metricas=None, capa=None, desde=None, hasta=None):
+    """
+    Evolución de las métricas por fecha.
+      tabla:    "fsck" o "inventario"
+      metricas: lista de columnas (por defecto, todas)
+      capa:     "/data" o "/backup" (solo fsck)
+    """
+    consulta = cargar(tabla, desde, hasta)
+    if capa is not None:
+        consulta = consulta.filter(pl.col("capa") == capa)
+    claves = ["fecha", "capa", "archivo"] if tabla == "fsck" else ["fecha", "alcance", "familia", "archivo"]
+    if metricas:
+        consulta = consulta.select(claves + list(metricas))
+    return consulta.sort(claves).collect()
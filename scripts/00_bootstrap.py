@@ -1,6 +1,8 @@
 # Importamos las librerías necesarias
+import os
 from datetime import datetime
-from hdfs import InsecureClient  # Librería específica para conectar Python con Hadoop (HDFS)
+from contexto import Contexto  # Acceso compartido a Hadoop (HDFS) a través de WebHDFS (hdfs_io.py)
+from trazas import etapa, salir, actual, sumar  # Tramos medidos y métricas de la etapa (trazas.py)
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -9,28 +11,27 @@ ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 # ---------------------------------------------------------
 # FUNCIÓN PRINCIPAL DE CREACIÓN DE DIRECTORIOS
 # ---------------------------------------------------------
-def crear_directorios_hdfs():
+@etapa("00_bootstrap")
+def crear_directorios_hdfs(ctx=None):
     
     # ---------------------------------------------------------
     # 1. CONFIGURACIÓN DE LA CONEXIÓN
     # ---------------------------------------------------------
-    # Definimos dónde está "escuchando" nuestro sistema Hadoop.
-    # host: La dirección del servidor (localhost porque estamos en la misma máquina).
-    # port: 9870 es el puerto web estándar para Hadoop 3.
-    # user: El usuario con permisos para crear carpetas.
-    # url:  La dirección completa (Endpoint) de la API WebHDFS.
+    # El contexto sabe dónde está "escuchando" nuestro sistema Hadoop (contexto.py):
+    # url:  La dirección completa (Endpoint) de la API WebHDFS, http://localhost:9870
+    #       (9870 es el puerto web estándar para Hadoop 3).
     #       Es el "enchufe" HTTP por donde Python enviará las órdenes al clúster.
-    host = "localhost"
-    port = 9870
-    user = "hdadmin"
-    url = f'http://{host}:{port}'
+    # user: El usuario con permisos para crear carpetas (hdadmin).
+    # Si nos llama 90_run_all.py recibimos su contexto y reutilizamos su conexión.
+    ctx = ctx or Contexto()
+    url = ctx.raiz_local if ctx.local else ctx.hdfs_url
     
     # ---------------------------------------------------------
     # 2. CONFIGURACIÓN DE LA FECHA
     # ---------------------------------------------------------
-    # Calculamos la fecha de hoy.
+    # Calculamos la fecha de hoy (o la de la variable DT en un backfill de 90_run_all.py).
     # Usamos el formato 'dt=AAAA-MM-DD'.
-    dt = datetime.now().strftime('%Y-%m-%d')
+    dt = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
     particion = f"dt={dt}"
 
     # ---------------------------------------------------------
@@ -43,7 +44,9 @@ def crear_directorios_hdfs():
         "/audit/fsck",             # Auditorías de salud del sistema
         "/audit/inventory",        # Inventarios de archivos
         "/backup/logs/raw",        # Carpeta de respaldo para Logs
-        "/backup/iot/raw"          # Carpeta de respaldo para IoT
+        "/backup/iot/raw",         # Carpeta de respaldo para IoT
+        "/curated/logs",           # Capa curada (Parquet) de Logs
+        "/curated/iot"             # Capa curada (Parquet) de IoT
     ]
 
     print(f"[{ahora()}] [INFO]  --> INICIO BOOTSTRAP HDFS | FECHA={dt}")
@@ -57,11 +60,11 @@ def crear_directorios_hdfs():
     try:
         print(f"[{ahora()}] [INFO]  Conectando con NameNode en {url}...")
         
-        # Creamos el cliente manejar HDFS).
-        client = InsecureClient(url, user=user)
+        # Acceso para manejar HDFS (se crea la primera vez que se pide).
+        hdfs = ctx.hdfs
         
-        # Probamos la conexión listando la raíz
-        client.list("/") 
+        # Probamos la conexión consultando la raíz
+        hdfs.estado("/")
         print(f"[{ahora()}] [INFO]  Conexión establecida correctamente.")
         
         # BUCLE: Recorremos la lista de rutas una por una
@@ -75,15 +78,19 @@ def crear_directorios_hdfs():
             # Si falla una carpeta concreta, capturamos el error aquí dentro
             # para que el bucle continúe y cree las demás.
             try:
-                # client.makedirs: Equivalente a 'mkdir -p'.
+                # crear_directorio: Equivalente a 'mkdir -p'.
                 # Crea la carpeta y, si no existen las superiores, las crea también.
-                client.makedirs(full_path)
+                hdfs.crear_directorio(full_path)
+                sumar(directorios=1)
                 print(f"[{ahora()}] [OK]    Creado: {full_path}")
                 
             except Exception as e_path:
                 # Si falla solo esta carpeta, avisamos pero NO paramos el programa.
+                # La etapa sí queda fallida: las siguientes escriben en esa carpeta.
                 print(f"[{ahora()}] [ERROR] Falló al crear {full_path}")
                 print(f"                      -> {e_path}")
+                sumar(errores=1)
+                actual().fallar(e_path)
 
     # GESTIÓN DE ERROR FATAL
     # Aquí caemos si falló el BLOQUE 1 (ej: el servidor Hadoop está apagado).
@@ -91,6 +98,7 @@ def crear_directorios_hdfs():
         print(f"[{ahora()}] [FATAL] No se pudo conectar con HDFS.")
         print(f"                      -> Asegúrate de que Docker está corriendo.")
         print(f"                      -> Detalle: {e_conn}")
+        actual().fallar(e_conn)
 
     print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE CREACIÓN DE DIRECTORIOS")
     print("="*60 + "\n")
@@ -99,4 +107,4 @@ def crear_directorios_hdfs():
 # ---------------------------------------------------------
 # Asegura que este script se ejecute solo si lo llamamos directamente.
 if __name__ == "__main__":
-    crear_directorios_hdfs()
\ No newline at end of file
+    salir(crear_directorios_hdfs)
\ No newline at end of file
@@ -1,9 +1,17 @@
 # Importamos las librerías necesarias
-import random
+import argparse
+import io
+import multiprocessing
+import os
+import time
+import numpy as np
 import polars as pl
-from datetime import datetime
+from datetime import datetime, timedelta
 from faker import Faker
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contexto import cargar_etapa
+from trazas import tramo, etapa, salir, sumar
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -18,8 +26,10 @@ ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 # Objetivo: Guardar los datos en una carpeta 'data_local' separada del código fuente.
 BASE_DIR = Path(__file__).resolve().parents[2] / "data_local"
 
-# Definimos la carpeta de destino usando la fecha de hoy.
-DT = datetime.now().strftime('%Y-%m-%d')
+# Definimos la carpeta de destino usando la fecha de hoy
+# (o la de la variable DT: 90_run_all.py --desde/--hasta reprocesa días pasados).
+HOY = datetime.now().strftime('%Y-%m-%d')
+DT = os.environ.get("DT") or HOY
 OUTPUT_DIR = BASE_DIR / DT
 
 # Nombres de los archivos finales
@@ -39,106 +49,287 @@ META_BYTES = 250 * 1024 * 1024
 # Guardamos de 100.000 en 100.000.
 LOTE = 100000 
 
+# PROCESOS: Número de procesos generadores.
+# Con 1 se escriben los archivos clásicos (logs_{DT}.log / iot_{DT}.jsonl).
+# Con N > 1 cada proceso escribe su propio shard (logs_{DT}_part-XXXX.log, ...)
+# y la meta de cada familia se reparte entre ellos.
+PROCESOS = 1
+
+# SEMILLA: Si es None, cada ejecución genera datos distintos (modo aleatorio).
+# Si es un entero, el generador es reproducible: misma semilla -> mismos archivos,
+# byte a byte (incluidas las marcas de tiempo, que parten de la medianoche de DT).
+SEMILLA = None
+
+# PASO_MAX_US: Separación máxima (en microsegundos) entre dos registros seguidos.
+# Las marcas de tiempo se construyen sumando pasos aleatorios a un instante base.
+PASO_MAX_US = 2000
+
+# Catálogos fijos de valores categóricos
+ACCIONES = ["LOGIN", "LOGOUT", "COMPRA", "ERROR", "CLICK"]
+ESTADOS = ["INFO", "ALERTA", "CRITICO", "DEBUG"]
+METRICAS = ["temp", "humedad", "co2"]
+
 # ---------------------------------------------------------
-# 3. FUNCIONES DE ESCRITURA EN DISCO
+# 3. FUNCIONES DE SERIALIZACIÓN
 # ---------------------------------------------------------
+# Convertimos cada lote a bytes en memoria antes de escribirlo.
+# Así sabemos exactamente cuántos bytes lleva cada archivo sin preguntar al disco.
 
-def guardar_como_log(dataframe, ruta_archivo):
+def serializar_log(dataframe):
     """
-    Guarda un dataframe en formato CSV separado por tuberías (|).
-    Modo 'ab' (Append Binary): Abre el archivo y añade al final sin borrar lo anterior.
+    Convierte un dataframe a CSV separado por tuberías (|), sin cabecera.
+    Devuelve los bytes listos para añadir al archivo .log
     """
-    with open(ruta_archivo, "ab") as f:
-        dataframe.write_csv(f, separator="|", include_header=False)
+    buffer = io.BytesIO()
+    dataframe.write_csv(buffer, separator="|", include_header=False)
+    return buffer.getvalue()
 
-def guardar_como_jsonl(dataframe, ruta_archivo):
+def serializar_jsonl(dataframe):
     """
-    Guarda un dataframe en formato JSON Lines (un objeto JSON por línea).
+    Convierte un dataframe a JSON Lines (un objeto JSON por línea).
     Ideal para datos IoT.
     """
-    with open(ruta_archivo, "ab") as f:
-        dataframe.write_ndjson(f)
+    buffer = io.BytesIO()
+    dataframe.write_ndjson(buffer)
+    return buffer.getvalue()
+
+# ---------------------------------------------------------
+# 4. MOTOR DE GENERACIÓN COLUMNAR
+# ---------------------------------------------------------
+# En lugar de construir cada fila con bucles de Python, generamos columnas
+# enteras de golpe con NumPy y se las entregamos a Polars ya montadas.
+
+def crear_catalogos(semilla=None):
+    """
+    Crea las listas fijas de usuarios y sensores.
+    Con semilla, Faker devuelve siempre los mismos nombres.
+    """
+    fake = Faker()
+    if semilla is not None:
+        fake.seed_instance(semilla)
+    usuarios = [fake.user_name() for _ in range(2000)]
+    sensores = [f"sensor_{i:04d}" for i in range(500)]
+    return usuarios, sensores
+
+def instante_base_us(semilla=None):
+    """
+    Instante inicial (epoch en microsegundos) de las marcas de tiempo.
+    Modo reproducible o día pasado (backfill): medianoche de DT. Modo aleatorio: el momento actual.
+    Se calcula sobre la hora local "tal cual" (sin zona horaria), igual que isoformat().
+    """
+    base = datetime.strptime(DT, "%Y-%m-%d") if semilla is not None or DT != HOY else datetime.now()
+    return (base - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+
+def columna_fechas(rng, n, inicio_us):
+    """
+    Construye n marcas de tiempo crecientes como aritmética sobre el instante base:
+    inicio + suma acumulada de pasos aleatorios. Devuelve la columna ya formateada
+    en ISO 8601 y el último instante usado (para encadenar el siguiente lote).
+    """
+    marcas = inicio_us + np.cumsum(rng.integers(0, PASO_MAX_US, n, dtype=np.int64))
+    fechas = pl.Series(marcas).cast(pl.Datetime("us")).dt.strftime("%Y-%m-%dT%H:%M:%S%.6f")
+    return fechas, int(marcas[-1])
+
+def elegir(rng, catalogo, n):
+    """
+    Selección aleatoria vectorizada: generamos n índices y los usamos
+    para indexar el catálogo (equivalente a random.choices, pero columnar).
+    """
+    return pl.Series(catalogo).gather(rng.integers(0, len(catalogo), n))
+
+def generar_lote_logs(rng, n, inicio_us, usuarios):
+    """Genera un lote de n filas de logs. Devuelve (dataframe, último instante)."""
+    fechas, ultimo_us = columna_fechas(rng, n, inicio_us)
+    df = pl.DataFrame({
+        "fecha": fechas,
+        "usuario": elegir(rng, usuarios, n),
+        "accion": elegir(rng, ACCIONES, n),
+        "estado": elegir(rng, ESTADOS, n)
+    })
+    return df, ultimo_us
+
+def generar_lote_iot(rng, n, inicio_us, sensores):
+    """Genera un lote de n filas de telemetría IoT. Devuelve (dataframe, último instante)."""
+    fechas, ultimo_us = columna_fechas(rng, n, inicio_us)
+    df = pl.DataFrame({
+        "fecha": fechas,
+        "sensor_id": elegir(rng, sensores, n),
+        "metrica": elegir(rng, METRICAS, n),
+        "valor": np.round(rng.uniform(10.0, 99.9, n), 2)
+    })
+    return df, ultimo_us
+
+# ---------------------------------------------------------
+# 5. GENERACIÓN DE UN ARCHIVO CON TAMAÑO EXACTO
+# ---------------------------------------------------------
+# Cada familia sabe cómo generar un lote, cómo serializarlo y qué extensión lleva.
+FAMILIAS = {
+    "logs": (generar_lote_logs, serializar_log, "log"),
+    "iot":  (generar_lote_iot, serializar_jsonl, "jsonl"),
+}
+
+def abrir_local(ruta):
+    """Destino por defecto de cada archivo: el disco local (data_local/DT)."""
+    return open(ruta, "wb")
+
+def generar_archivo(ruta, familia, meta_bytes, rng, catalogo, reloj_us, mostrar_progreso=True, abrir=abrir_local):
+    """
+    Escribe un archivo de la familia indicada hasta alcanzar meta_bytes.
+    abrir(ruta) devuelve el archivo donde se escriben los lotes: el disco local o,
+    en la ingesta en streaming (20_ingest_hdfs.py --modo streaming), HDFS directamente.
+
+    Los bytes escritos se cuentan en memoria (sin stat() al disco). Tras el primer
+    lote estimamos los bytes por fila y, al acercarnos a la meta, reducimos el
+    tamaño del lote para no pasarnos: el archivo termina a menos de una fila de la meta.
+    Devuelve (bytes escritos, filas escritas).
+    """
+    generar_lote, serializar, _ = FAMILIAS[familia]
+    escritos = 0
+    filas_totales = 0
+    bytes_por_fila = None
+
+    with abrir(ruta) as f:
+        while escritos < meta_bytes:
+            restante = meta_bytes - escritos
+
+            # Primer lote pequeño (sonda) para estimar cuánto ocupa una fila.
+            # Después, el lote se ajusta a lo que falta para la meta, apuntando
+            # un 2% por debajo para que el error de la estimación no nos haga pasar.
+            if bytes_por_fila is None:
+                filas = min(LOTE, 1000)
+            else:
+                filas = max(1, min(LOTE, int(restante * 0.98 / bytes_por_fila)))
+
+            t0 = time.perf_counter()
+            df, reloj_us = generar_lote(rng, filas, reloj_us, catalogo)
+            datos = serializar(df)
+            f.write(datos)
+            segundos = max(time.perf_counter() - t0, 1e-9)
+
+            escritos += len(datos)
+            filas_totales += filas
+            bytes_por_fila = escritos / filas_totales
+
+            # Rendimiento del lote (filas/s y MB/s).
+            # end='\r' hace que la línea se sobrescriba a sí misma (efecto de carga).
+            if mostrar_progreso:
+                print(f"[{ahora()}] [PROG]  {familia}: {escritos // 1024 // 1024} MB | "
+                      f"Lote: {filas / segundos:,.0f} filas/s, {len(datos) / 1024 / 1024 / segundos:.1f} MB/s   ", end='\r')
+
+    if mostrar_progreso:
+        print("")
+    return escritos, filas_totales
+
+def generar_shard(indice, secuencia_semilla, meta_bytes, usuarios, sensores, base_us):
+    """
+    Trabajo de un proceso: escribe su propio shard de logs y de IoT
+    (logs_{DT}_part-XXXX.log / iot_{DT}_part-XXXX.jsonl) con una semilla independiente.
+    Devuelve un resumen con bytes, filas y segundos de cada archivo.
+    """
+    rng = np.random.default_rng(secuencia_semilla)
+    catalogos = {"logs": usuarios, "iot": sensores}
+    resumen = {"indice": indice}
+
+    for familia, (_, _, extension) in FAMILIAS.items():
+        ruta = OUTPUT_DIR / f"{familia}_{DT}_part-{indice:04d}.{extension}"
+        t0 = time.perf_counter()
+        escritos, filas = generar_archivo(ruta, familia, meta_bytes, rng, catalogos[familia],
+                                          base_us, mostrar_progreso=False)
+        resumen[familia] = (escritos, filas, time.perf_counter() - t0)
+
+    return resumen
 
 # ---------------------------------------------------------
-# 4. FUNCIÓN PRINCIPAL (GENERADOR)
+# 6. FUNCIÓN PRINCIPAL (GENERADOR)
 # ---------------------------------------------------------
-def generar_datos():
+@etapa("10_generate_data")
+def generar_datos(semilla=SEMILLA, procesos=PROCESOS, meta_bytes=META_BYTES, abrir=None):
     
     print(f"[{ahora()}] [INFO]  --> INICIO GENERADOR DE DATOS | FECHA={DT}")
+    if semilla is not None:
+        print(f"[{ahora()}] [INFO]  Modo reproducible activado (semilla={semilla})")
     
     # --- PREPARACIÓN DEL ENTORNO ---
-    # Creamos la carpeta física. exist_ok=True evita errores si ya existe.
-    # parents=True crea las carpetas intermedias si faltan.
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    # .resolve() nos da la ruta absoluta para imprimirla
-    print(f"[{ahora()}] [INFO]  Directorio de salida: {OUTPUT_DIR.resolve()}")
-    
-    # Limpieza inicial: Si existen archivos de una ejecución anterior, los borramos
-    # para empezar de cero y no duplicar datos.
-    if LOG_FILE.exists(): LOG_FILE.unlink()
-    print(f"[{ahora()}] [INFO]  Limpiando archivo anterior: {LOG_FILE.name}")
-    
-    if IOT_FILE.exists(): IOT_FILE.unlink()
-    print(f"[{ahora()}] [INFO]  Limpiando archivo anterior: {IOT_FILE.name}")
-    
+    if abrir:
+        # Streaming (lo pide 20_ingest_hdfs.py): cada lote va directo a HDFS, sin data_local.
+        # Los archivos son los del modo de un proceso: los shards viven en otros procesos
+        # y no pueden escribir en el flujo abierto aquí.
+        print(f"[{ahora()}] [INFO]  Destino: HDFS en streaming (sin archivos locales)")
+        if procesos > 1:
+            print(f"[{ahora()}] [WARN]  El streaming usa un solo proceso generador (se ignora procesos={procesos})")
+            procesos = 1
+    else:
+        abrir = abrir_local
+        # Creamos la carpeta física. exist_ok=True evita errores si ya existe.
+        # parents=True crea las carpetas intermedias si faltan.
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        # .resolve() nos da la ruta absoluta para imprimirla
+        print(f"[{ahora()}] [INFO]  Directorio de salida: {OUTPUT_DIR.resolve()}")
+
+        # Limpieza inicial: Si existen archivos de una ejecución anterior (completos o
+        # shards), los borramos para empezar de cero y no duplicar datos.
+        for anterior in [*OUTPUT_DIR.glob(f"logs_{DT}*.log"), *OUTPUT_DIR.glob(f"iot_{DT}*.jsonl")]:
+            anterior.unlink()
+            print(f"[{ahora()}] [INFO]  Limpiando archivo anterior: {anterior.name}")
 
     # --- OPTIMIZACIÓN DE DATOS FALSOS ---
     # En lugar de generar un nombre nuevo cada vez (muy lento),
     # creamos una lista fija de 2000 usuarios y 500 sensores.
     # Luego elegiremos aleatoriamente de aquí (mucho más rápido).
-    fake = Faker()
-    LISTA_USUARIOS = [fake.user_name() for _ in range(2000)]
-    LISTA_SENSORES = [f"sensor_{i:04d}" for i in range(500)]
-    ACCIONES = ["LOGIN", "LOGOUT", "COMPRA", "ERROR", "CLICK"]
-    ESTADOS = ["INFO", "ALERTA", "CRITICO", "DEBUG"]
-    
-    print(f"[{ahora()}] [INFO]  Comenzando bucle de generación masiva (Batch={LOTE} filas)")
+    LISTA_USUARIOS, LISTA_SENSORES = crear_catalogos(semilla)
+    base_us = instante_base_us(semilla)
 
-    # --- BUCLE INFINITO DE GENERACIÓN ---
-    while True:
-        
-        # 1. MEDICIÓN
-        # Comprobamos cuánto pesan los archivos en este momento.
-        # .stat().st_size obtiene el tamaño en bytes del archivo.
-        peso_log = LOG_FILE.stat().st_size if LOG_FILE.exists() else 0
-        peso_iot = IOT_FILE.stat().st_size if IOT_FILE.exists() else 0
-        
-        # 2. CONDICIÓN DE SALIDA (META ALCANZADA)
-        # Si AMBOS archivos superan el tamaño objetivo, terminamos el bucle.
-        if peso_log >= META_BYTES and peso_iot >= META_BYTES:
-            print("") 
-            print(f"[{ahora()}] [OK]    META ALCANZADA (Logs: {peso_log//1024//1024}MB | IoT: {peso_iot//1024//1024}MB)")
-            break
-
-        # 3. GENERACIÓN DE LOGS (CSV)
-        # Solo generamos si aún no hemos llegado al peso objetivo
-        if peso_log < META_BYTES:
-            # Polars crea el DataFrame rapidísimo en memoria
-            df_logs = pl.DataFrame({
-                "fecha": [datetime.now().isoformat() for _ in range(LOTE)],
-                "usuario": random.choices(LISTA_USUARIOS, k=LOTE), # Elige k elementos al azar
-                "accion": random.choices(ACCIONES, k=LOTE),
-                "estado": random.choices(ESTADOS, k=LOTE)
-            })
-            # Volcamos el lote al disco
-            guardar_como_log(df_logs, LOG_FILE)
-            
-        # 4. GENERACIÓN DE IOT (JSONL)
-        if peso_iot < META_BYTES:
-            df_iot = pl.DataFrame({
-                "fecha": [datetime.now().isoformat() for _ in range(LOTE)],
-                "sensor_id": random.choices(LISTA_SENSORES, k=LOTE),
-                "metrica": random.choices(["temp", "humedad", "co2"], k=LOTE),
-                "valor": [round(random.uniform(10.0, 99.9), 2) for _ in range(LOTE)]
-            })
-            guardar_como_jsonl(df_iot, IOT_FILE)
-
-        # 5. FEEDBACK AL USUARIO
-        # Calculamos MB para mostrarlo.
-        # end='\r' hace que la línea se sobrescriba a sí misma (efecto de carga).
-        mb_log = peso_log // 1024 // 1024
-        mb_iot = peso_iot // 1024 // 1024
-        print(f"[{ahora()}] [PROG]  Generando... Logs: {mb_log} MB / IoT: {mb_iot} MB", end='\r')
+    # La generación es un tramo propio dentro de la etapa (trazas.py): tiempo real,
+    # CPU y bytes escritos quedan en la traza en lugar de en un cronómetro suelto.
+    with tramo("generacion", procesos=procesos) as generacion:
+
+        # --- MODO 1: UN SOLO PROCESO (un archivo por familia) ---
+        if procesos <= 1:
+            print(f"[{ahora()}] [INFO]  Comenzando generación masiva (Batch={LOTE} filas)")
+
+            # Generador aleatorio de NumPy (con semilla fija si estamos en modo reproducible)
+            rng = np.random.default_rng(semilla)
+            peso_log, _ = generar_archivo(LOG_FILE, "logs", meta_bytes, rng, LISTA_USUARIOS, base_us, abrir=abrir)
+            peso_iot, _ = generar_archivo(IOT_FILE, "iot", meta_bytes, rng, LISTA_SENSORES, base_us, abrir=abrir)
+
+        # --- MODO 2: VARIOS PROCESOS (un shard por proceso y familia) ---
+        else:
+            print(f"[{ahora()}] [INFO]  Comenzando generación en {procesos} procesos (Batch={LOTE} filas)")
+
+            # Repartimos la meta entre los shards (el resto va a los primeros)
+            # y derivamos una semilla independiente y determinista para cada uno.
+            metas = [meta_bytes // procesos + (1 if i < meta_bytes % procesos else 0) for i in range(procesos)]
+            semillas = np.random.SeedSequence(semilla).spawn(procesos)
+
+            # Procesos con "spawn", no "fork": este proceso ya puede tener hilos (el pool de
+            # Polars, el DAG de 90 en modo interno) y un fork copiaría sus cerrojos tomados
+            # (p.ej. el de los print), dejando los shards bloqueados. Cada shard arranca un
+            # intérprete limpio que carga este script como módulo (cargar_etapa): así
+            # encuentra generar_shard aunque 90 lo haya importado como etapa_10_generate_data.
+            peso_log = peso_iot = 0
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=cargar_etapa, initargs=("10_generate_data.py",)) as pool:
+                tareas = [pool.submit(generar_shard, i, semillas[i], metas[i], LISTA_USUARIOS, LISTA_SENSORES, base_us)
+                          for i in range(procesos)]
+                for tarea in as_completed(tareas):
+                    resumen = tarea.result()
+                    for familia in FAMILIAS:
+                        escritos, filas, segundos = resumen[familia]
+                        segundos = max(segundos, 1e-9)
+                        print(f"[{ahora()}] [OK]    Shard {resumen['indice']:04d} {familia}: {escritos // 1024 // 1024} MB | "
+                              f"{filas / segundos:,.0f} filas/s, {escritos / 1024 / 1024 / segundos:.1f} MB/s")
+                    peso_log += resumen["logs"][0]
+                    peso_iot += resumen["iot"][0]
+
+        # En streaming los bytes ya los cuenta la escritura en HDFS (hdfs_io)
+        if abrir is abrir_local:
+            sumar(bytes_escritos=peso_log + peso_iot)
+
+    # --- META ALCANZADA ---
+    duracion = generacion.segundos
+    total_mb = (peso_log + peso_iot) / 1024 / 1024
+    print(f"[{ahora()}] [OK]    META ALCANZADA (Logs: {peso_log//1024//1024}MB | IoT: {peso_iot//1024//1024}MB)")
+    print(f"[{ahora()}] [METRICAS] Generación: {total_mb:.1f} MB en {duracion:.2f} s ({total_mb / max(duracion, 1e-9):.1f} MB/s)")
         
     print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE GENERACIÓN DE DATOS")
     print("="*60 + "\n")
@@ -147,4 +338,11 @@ def generar_datos():
 # PUNTO DE ENTRADA
 # ---------------------------------------------------------
 if __name__ == "__main__":
-    generar_datos()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos (Logs/IoT)")
+    parser.add_argument("--procesos", type=int, default=PROCESOS,
+                        help="Número de procesos; con más de 1 se escribe un shard por proceso")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="Semilla para una generación reproducible")
+    parser.add_argument("--meta-mb", type=int, default=META_BYTES // 1024 // 1024,
+                        help="Tamaño objetivo por familia en MB (se reparte entre los shards)")
+    args = parser.parse_args()
+    salir(generar_datos, semilla=args.semilla, procesos=args.procesos, meta_bytes=args.meta_mb * 1024 * 1024)
@@ -1,8 +1,16 @@
 # Importamos las librerías necesarias
-import subprocess
+import argparse
+import json
+import math
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path 
+from contexto import Contexto, cargar_etapa  # Acceso compartido a HDFS (hdfs_io.py), creado solo si hace falta
+from hdfs_io import legible, FlujoEscritura
+from compresion import Compresor, CODECS, variantes
+from trazas import tramo, etapa, salir, actual, sumar, propagar  # Tramos medidos y métricas (trazas.py)
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -13,7 +21,8 @@ ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 # ---------------------------------------------------------
 
 # Calculamos la fecha de hoy para sincronizarnos con el generador de datos
-DT = datetime.now().strftime("%Y-%m-%d")
+# (la variable DT la sustituye al reprocesar días pasados con 90_run_all.py --desde/--hasta)
+DT = os.environ.get("DT") or datetime.now().strftime("%Y-%m-%d")
 
 # __file__: Es la ruta de este script.
 # .resolve(): Obtiene la ruta absoluta completa.
@@ -30,29 +39,58 @@ DESTINOS = {
 }
 
 # ---------------------------------------------------------
-# 3. FUNCIÓN PRINCIPAL
+# 2. CONFIGURACIÓN DEL MODO DE INGESTA
 # ---------------------------------------------------------
-def ingestar():
-    
-    # Iniciamos el cronómetro para medir el rendimiento (KPIs)
-    inicio = time.time()
-    
-    print(f"[{ahora()}] [INFO]  --> INICIO PROCESO DE INGESTA | FECHA={DT}")
+# MODO_INGESTA:
+#   "docker"  -> Puente clásico: docker cp + hdfs dfs -put + rm (ver README). Los archivos
+#                de una misma carpeta de destino se cargan con un solo 'hdfs dfs -put'.
+#                Los grandes van por partes reanudables (sección 4), cada una con su
+#                'hdfs dfs -put -' por la entrada estándar.
+#   "webhdfs" -> Subida directa por streaming a través de la API WebHDFS,
+#                sin copias intermedias en /tmp ni arranques de JVM.
+#                Requiere que el host pueda resolver los DataNodes a los que
+#                redirige el NameNode (ver README).
+#   "streaming" -> Sin archivos locales: esta etapa ejecuta el generador (10_generate_data.py)
+#                y cada lote que produce se sube a HDFS mientras se genera el siguiente
+#                (cola acotada, hdfs_io.FlujoEscritura). Los archivos en HDFS son los
+#                mismos, byte a byte, que los del camino generar + ingestar.
+# Se puede fijar con la variable de entorno MODO_INGESTA (así lo hace 90_run_all.py --streaming).
+MODO_INGESTA = os.environ.get("MODO_INGESTA", "docker")
 
-    # --- CHEQUEO DE SEGURIDAD INICIAL ---
-    # Antes de intentar nada, verificamos si la carpeta de origen existe.
-    # Si no existe, cortamos el programa para evitar errores en cascada.
-    if not LOCAL_DIR.exists():
-        print(f"[{ahora()}] [WARN]  No se encontraron datos locales en:")
-        print(f"                      -> {LOCAL_DIR}")
-        print(f"[{ahora()}] [INFO]  Abortando proceso de forma segura.")
-        return
+# TAM_BUFFER: Tamaño de cada trozo que leemos del disco y enviamos por la red.
+# HILOS_SUBIDA: Número de archivos que se suben a la vez.
+TAM_BUFFER = 8 * 1024 * 1024
+HILOS_SUBIDA = 4
 
-    print(f"[{ahora()}] [INFO]  Directorio local detectado: {LOCAL_DIR}")
-    
-    # --- FASE 1: PROCESAMIENTO Y CARGA ---
-    # Iteramos sobre cada elemento dentro de la carpeta local
-    for archivo in LOCAL_DIR.iterdir():
+# CODEC: Compresión al vuelo de los archivos subidos (compresion.py), o None para subirlos tal cual.
+#   "gzip" -> logs_{DT}.log.gz | "zstd" -> logs_{DT}.log.zst (necesita 'zstandard')
+# Se comprimen por bloques en paralelo mientras viajan: no hay archivos comprimidos en disco.
+# Se puede fijar con la variable de entorno CODEC_COMPRESION (así lo hace 90_run_all.py --codec).
+CODEC = os.environ.get("CODEC_COMPRESION") or None
+
+# REPLICACION: Factor de replicación de los archivos subidos.
+# None = el del clúster (dfs.replication en hdfs-site.xml, 3 por defecto).
+# Lo usa el benchmark 95_replication_benchmark.py para comparar factores.
+REPLICACION = None
+
+# SUBIDA POR PARTES (REANUDABLE)
+# Los archivos mayores que UMBRAL_PARTES se trocean en partes de TAM_PARTE bytes
+# que se suben en paralelo (en los modos docker y webhdfs). TAM_PARTE coincide con dfs.blocksize (64 MB), así
+# cada parte ocupa bloques completos y HDFS puede unirlas sin reescribir datos.
+# En DIR_CHECKPOINTS guardamos un manifiesto por archivo con las partes ya
+# subidas y verificadas: si la ingesta se corta, la siguiente ejecución solo
+# sube las partes que faltan.
+UMBRAL_PARTES = 128 * 1024 * 1024
+TAM_PARTE = 64 * 1024 * 1024
+DIR_CHECKPOINTS = LOCAL_DIR / ".checkpoints"
+
+# ---------------------------------------------------------
+# 3. FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+def trabajos_locales():
+    """Empareja cada archivo local con su carpeta de destino en HDFS: [(archivo, destino)]."""
+    trabajos = []
+    for archivo in sorted(LOCAL_DIR.iterdir()):
         
         # Filtro de Seguridad:
         # iterdir() devuelve todo (archivos y carpetas).
@@ -63,68 +101,445 @@ def ingestar():
         # Analizamos el nombre del archivo para ver si coincide con alguna clave de nuestro diccionario DESTINOS.
         # Si encuentra coincidencia devuelve la ruta, si no, devuelve None.
         destino = next((ruta for clave, ruta in DESTINOS.items() if clave in archivo.name), None)
-
         if destino:
-            print(f"[{ahora()}] [INFO]  Procesando: {archivo.name}")
-            
+            trabajos.append((archivo, destino))
+    return trabajos
+
+def por_partes(archivo, codec=None):
+    """
+    Si el archivo se sube troceado en partes reanudables. Comprimiendo, nunca: las
+    partes comprimidas no ocuparían bloques completos y CONCAT ya no podría unirlas
+    sin reescribir datos.
+    """
+    return not codec and archivo.stat().st_size > UMBRAL_PARTES
+
+def leer_en_bloques(archivo, tam_buffer, offset=0, longitud=None):
+    """
+    Generador que lee el archivo local a trozos de tam_buffer bytes.
+    Nunca cargamos el archivo completo en memoria: cada trozo se envía
+    por la red y se descarta antes de leer el siguiente.
+    Con offset/longitud lee solo un tramo del archivo (una parte).
+    """
+    with open(archivo, "rb") as f:
+        f.seek(offset)
+        restante = longitud
+        while restante is None or restante > 0:
+            bloque = f.read(tam_buffer if restante is None else min(tam_buffer, restante))
+            if not bloque:
+                break
+            if restante is not None:
+                restante -= len(bloque)
+            yield bloque
+
+def subir_webhdfs(hdfs, archivo, destino, tam_buffer, replicacion=None, codec=None):
+    """
+    Sube un archivo local a HDFS en streaming (por WebHDFS, o por 'hdfs dfs -put -'
+    si el acceso es el del puente docker).
+    escribir() sobrescribe, igual que el '-f' de 'hdfs dfs -put'.
+    Con codec, los trozos se comprimen por el camino y el archivo lleva su extensión (.gz/.zst).
+    Devuelve (bytes subidos, segundos empleados).
+    """
+    inicio = time.perf_counter()
+    datos, nombre = leer_en_bloques(archivo, tam_buffer), archivo.name
+    if codec:
+        compresor = Compresor(codec)
+        datos, nombre = compresor.comprimir(datos), nombre + compresor.extension
+    hdfs.escribir(f"{destino}/{nombre}", datos, replicacion, tam_buffer)
+    borrar_variantes(hdfs, destino, nombre)
+    if codec:
+        print(f"[{ahora()}] [METRICAS] {nombre}: {compresor.resumen()}")
+    return archivo.stat().st_size, time.perf_counter() - inicio
+
+def borrar_variantes(hdfs, destino, nombre):
+    """
+    Borra el mismo archivo guardado con otro formato por una ingesta anterior
+    (x.log frente a x.log.gz o x.log.zst): en HDFS solo debe quedar el recién subido.
+    """
+    for otro in variantes(nombre):
+        if otro != nombre:
+            hdfs.borrar(f"{destino}/{otro}")
+
+# ---------------------------------------------------------
+# 4. SUBIDA POR PARTES CON MANIFIESTO DE CHECKPOINT
+# ---------------------------------------------------------
+def ruta_parte(destino, archivo, indice):
+    """
+    Ruta HDFS de una parte. CONCAT exige que las partes estén en la misma
+    carpeta que el archivo final, por eso van junto a él con un punto delante.
+    """
+    return f"{destino}/.{archivo.name}.parte-{indice:05d}"
+
+def rango_parte(archivo, indice, tam_parte):
+    """Devuelve (offset, longitud) de la parte 'indice' dentro del archivo local."""
+    offset = indice * tam_parte
+    return offset, min(tam_parte, archivo.stat().st_size - offset)
+
+def cargar_manifiesto(archivo, destino, tam_parte):
+    """
+    Lee el manifiesto de checkpoint del archivo. Si no existe, o si el archivo
+    local ha cambiado desde entonces (tamaño/fecha), empezamos uno nuevo.
+    """
+    info = archivo.stat()
+    nuevo = {"archivo": archivo.name, "destino": destino, "tamano": info.st_size,
+             "mtime": info.st_mtime, "tam_parte": tam_parte, "partes_ok": []}
+    ruta = DIR_CHECKPOINTS / f"{archivo.name}.json"
+    if ruta.exists():
+        previo = json.loads(ruta.read_text(encoding="utf-8"))
+        if all(previo.get(clave) == nuevo[clave] for clave in ("destino", "tamano", "mtime", "tam_parte")):
+            return previo
+    return nuevo
+
+def guardar_manifiesto(archivo, manifiesto):
+    """
+    Guarda el manifiesto de forma atómica (archivo temporal + replace), para que
+    un corte a mitad de escritura nunca deje un checkpoint corrupto.
+    """
+    DIR_CHECKPOINTS.mkdir(parents=True, exist_ok=True)
+    ruta = DIR_CHECKPOINTS / f"{archivo.name}.json"
+    temporal = ruta.with_suffix(".tmp")
+    temporal.write_text(json.dumps(manifiesto, indent=2), encoding="utf-8")
+    temporal.replace(ruta)
+
+def partes_pendientes(hdfs, archivo, destino, manifiesto):
+    """
+    Devuelve los índices de las partes que hay que subir.
+    Las partes que el manifiesto da por buenas se comprueban contra HDFS
+    (existen y tienen la longitud esperada); si no, se vuelven a subir.
+    Todas se comprueban en lote (un solo listado de la carpeta de destino).
+    """
+    tam_parte = manifiesto["tam_parte"]
+    total = math.ceil(manifiesto["tamano"] / tam_parte)
+    estados = hdfs.estados([ruta_parte(destino, archivo, i) for i in manifiesto["partes_ok"]])
+    confirmadas = set()
+    for indice in manifiesto["partes_ok"]:
+        estado = estados[ruta_parte(destino, archivo, indice)]
+        if estado and estado["length"] == rango_parte(archivo, indice, tam_parte)[1]:
+            confirmadas.add(indice)
+    manifiesto["partes_ok"] = sorted(confirmadas)
+    return [i for i in range(total) if i not in confirmadas]
+
+def subir_parte(hdfs, archivo, destino, indice, tam_parte, tam_buffer, replicacion=None):
+    """
+    Sube una parte del archivo y verifica que HDFS tiene exactamente sus bytes.
+    Devuelve (bytes subidos, segundos empleados).
+    """
+    inicio = time.perf_counter()
+    offset, longitud = rango_parte(archivo, indice, tam_parte)
+    ruta = ruta_parte(destino, archivo, indice)
+    hdfs.escribir(ruta, leer_en_bloques(archivo, tam_buffer, offset, longitud), replicacion, tam_buffer)
+    subidos = hdfs.estado(ruta)["length"]
+    if subidos != longitud:
+        raise IOError(f"Parte {indice} incompleta en HDFS ({subidos} de {longitud} bytes)")
+    return longitud, time.perf_counter() - inicio
+
+def ensamblar(hdfs, archivo, destino, total_partes):
+    """
+    Une las partes en el archivo final: la parte 0 se renombra como archivo
+    final y el resto se le concatenan (CONCAT mueve bloques, no copia bytes).
+    """
+    final = f"{destino}/{archivo.name}"
+    hdfs.borrar(final)  # Equivalente al '-f' de 'hdfs dfs -put'
+    hdfs.renombrar(ruta_parte(destino, archivo, 0), final)
+    if total_partes > 1:
+        hdfs.concatenar(final, [ruta_parte(destino, archivo, i) for i in range(1, total_partes)])
+    if hdfs.estado(final)["length"] != archivo.stat().st_size:
+        raise IOError(f"El archivo ensamblado {final} no tiene el tamaño esperado")
+
+# ---------------------------------------------------------
+# 5. FUNCIÓN PRINCIPAL
+# ---------------------------------------------------------
+@etapa("20_ingest_hdfs")
+def ingestar(modo=MODO_INGESTA, tam_buffer=TAM_BUFFER, hilos=HILOS_SUBIDA, replicacion=REPLICACION, ctx=None,
+             semilla=None, meta_bytes=None, codec=CODEC):
+    
+    # La etapa completa es un tramo (ver el decorador): el tiempo, los bytes
+    # escritos y las llamadas a HDFS se miden ahí, sin cronómetros sueltos.
+    print(f"[{ahora()}] [INFO]  --> INICIO PROCESO DE INGESTA | FECHA={DT} | MODO={modo}"
+          + (f" | REPLICACION={replicacion}" if replicacion else "") + (f" | CODEC={codec}" if codec else ""))
+
+    # --- CHEQUEO DE SEGURIDAD INICIAL ---
+    # Antes de intentar nada, verificamos si la carpeta de origen existe.
+    # Si no existe, cortamos el programa para evitar errores en cascada.
+    # (en streaming no hay carpeta de origen: los datos se generan aquí mismo)
+    if modo != "streaming" and not LOCAL_DIR.exists():
+        print(f"[{ahora()}] [WARN]  No se encontraron datos locales en:")
+        print(f"                      -> {LOCAL_DIR}")
+        print(f"[{ahora()}] [INFO]  Abortando proceso de forma segura.")
+        actual().fallar(FileNotFoundError(f"No existe {LOCAL_DIR}"))
+        return
+    if modo != "streaming":
+        print(f"[{ahora()}] [INFO]  Directorio local detectado: {LOCAL_DIR}")
+
+    # Acceso a HDFS del contexto (compartido con el resto de etapas en 90_run_all.py)
+    ctx = ctx or Contexto()
+
+    # Archivos que no han llegado completos a HDFS: si hay alguno, la etapa falla
+    # al final (después de mostrar las evidencias de lo que sí se subió).
+    fallidos = 0
+
+    # --- FASE 1 (MODO STREAMING): GENERACIÓN Y SUBIDA SOLAPADAS ---
+    if modo == "streaming":
+        fallidos = ingestar_streaming(replicacion, semilla, meta_bytes, ctx, codec)
+    # --- FASE 1 (MODO WEBHDFS): SUBIDA EN STREAMING Y EN PARALELO ---
+    elif modo == "webhdfs":
+        fallidos = ingestar_webhdfs(tam_buffer, hilos, replicacion, ctx, codec)
+    else:
+        # --- FASE 1 (MODO DOCKER): PROCESAMIENTO Y CARGA ---
+        hdfs = ctx.acceso("docker")
+        trabajos = trabajos_locales()
+
+        # Los archivos grandes van por partes reanudables, igual que en modo webhdfs:
+        # cada parte es un 'hdfs dfs -put -' por la entrada estándar y el ensamblado
+        # (RENAME + CONCAT) son operaciones de metadatos en el NameNode. Si la carga se
+        # corta (p.ej. la caída de nodos de 70), la siguiente solo sube las partes que faltan.
+        grandes = [(archivo, destino) for archivo, destino in trabajos if por_partes(archivo, codec)]
+        if grandes:
+            with tramo("subida_partes", archivos=len(grandes), hilos=hilos):
+                fallidos += len(subir_archivos(hdfs, grandes, tam_buffer, hilos, replicacion)[0])
+
+        # El resto se agrupa por carpeta de destino: cada grupo se carga de una vez.
+        lotes = {}
+        for archivo, destino in trabajos:
+            if (archivo, destino) not in grandes:
+                lotes.setdefault(destino, []).append(archivo)
+
+        for destino, archivos in lotes.items():
+            print(f"[{ahora()}] [INFO]  Procesando: {', '.join(a.name for a in archivos)}")
+
             # BLOQUE 'TRY-EXCEPT': GESTIÓN DE ERRORES
-            # Si un archivo falla, capturamos el error aquí para que el script 
-            # siga intentándolo con los siguientes archivos.
+            # Si un lote falla, capturamos el error aquí para que el script 
+            # siga intentándolo con los siguientes.
             try:
-                # --- PASO A: EL PUENTE (Windows -> Contenedor) ---
-                # Windows no puede hablar directamente con HDFS.
-                # Copiamos el archivo físico dentro del contenedor 'namenode' (carpeta /tmp).
-                subprocess.run(f'docker cp "{archivo}" namenode:/tmp/{archivo.name}', shell=True, check=True, stderr=subprocess.PIPE)
-                
-                # --- PASO B: LA INGESTA (Contenedor -> HDFS) ---
-                # Una vez el archivo está en Linux (dentro del contenedor), usamos el cliente HDFS nativo.
-                # -put: Sube el archivo.
-                # -f: Fuerza la sobreescritura si ya existe.
-                subprocess.run(f"docker exec namenode hdfs dfs -put -f /tmp/{archivo.name} {destino}/", shell=True, check=True, stderr=subprocess.PIPE)
-                
-                # --- PASO C: LIMPIEZA (Housekeeping) ---
-                # Borramos el archivo temporal de /tmp para no llenar el disco del contenedor de basura.
-                # -u 0: Usamos usuario root para asegurar que tenemos permiso de borrarlo.
-                subprocess.run(f"docker exec -u 0 namenode rm /tmp/{archivo.name}", shell=True)
-                
+                # El puente (hdfs_io.subir_varios):
+                # A. Windows no puede hablar directamente con HDFS: copiamos los archivos
+                #    físicos dentro del contenedor 'namenode' (carpeta /tmp).
+                # B. Un solo 'hdfs dfs -put -f' (una JVM) los sube todos a su carpeta,
+                #    con el factor de replicación pedido (-D dfs.replication=N) si lo hay.
+                # C. Borramos los temporales de /tmp del contenedor.
+                with tramo("carga_lote", destino=destino):
+                    if codec:
+                        # Comprimiendo: cada archivo va en streaming por 'hdfs dfs -put -'
+                        # (sin copia en /tmp del contenedor: allí tendría que estar ya comprimido)
+                        for archivo in archivos:
+                            subir_webhdfs(hdfs, archivo, destino, tam_buffer, replicacion, codec)
+                    else:
+                        hdfs.subir_varios(archivos, destino, replicacion)
+                        for archivo in archivos:
+                            borrar_variantes(hdfs, destino, archivo.name)
+                    sumar(archivos=len(archivos))
                 print(f"[{ahora()}] [OK]    Carga exitosa -> {destino}")
 
-            except subprocess.CalledProcessError as e:
+            except OSError as e:
                 # Si algo falla (Docker apagado, red caída, etc.), mostramos el error limpio.
-                    mensaje = e.stderr.decode().strip() if e.stderr else "Error desconocido"
-                    print(f"[{ahora()}] [ERROR] Falló la ingesta de {archivo.name}")
-                    print(f"                      -> Detalles: {mensaje}")
+                print(f"[{ahora()}] [ERROR] Falló la ingesta de {', '.join(a.name for a in archivos)}")
+                print(f"                      -> Detalles: {e}")
+                fallidos += len(archivos)
 
     # --- FASE 2: VERIFICACIÓN Y EVIDENCIAS ---
     print("\n" + "-"*60)
     print(f"[{ahora()}] [INFO]  GENERANDO REPORTE DE EVIDENCIAS (HDFS)")
     print("-"*(60))
 
-    # Recorremos las rutas de destino para preguntar a Hadoop qué ha guardado
-    for ruta in DESTINOS.values():
-        try:
-            print(f"\n[CARPETA] {ruta}")
-            
-            # Ejecutamos 'du -h' (Disk Usage - Human Readable).
-            # Esto nos dice cuánto ocupa la carpeta en MB/GB directamente.
-            subprocess.run(f"docker exec namenode hdfs dfs -du -h {ruta}", shell=True, check=True)
-            
-        except subprocess.CalledProcessError:
-             print(f"[{ahora()}] [WARN]  Carpeta vacía o no existe en HDFS.")
-        except Exception as e:
-             print(f"[{ahora()}] [ERROR] Error calculando métricas: {e}")
+    # Recorremos las rutas de destino para preguntar a Hadoop qué ha guardado.
+    # Es el equivalente de 'hdfs dfs -du -h' (tamaño y espacio ocupado con las
+    # réplicas, en formato legible), pero con un solo listado por carpeta.
+    with tramo("verificacion"):
+        for ruta in DESTINOS.values():
+            try:
+                print(f"\n[CARPETA] {ruta}")
+                archivos = [e for e in ctx.hdfs.listar(ruta) if e["type"] == "FILE"]
+                if not archivos:
+                    print(f"[{ahora()}] [WARN]  Carpeta vacía o no existe en HDFS.")
+                for e in archivos:
+                    ocupado = e["length"] * max(e.get("replication", 1), 1)
+                    print(f"{legible(e['length']):<10} {legible(ocupado):<10} {ruta}/{e['pathSuffix']}")
+            except Exception as e:
+                print(f"[{ahora()}] [ERROR] Error calculando métricas: {e}")
 
-    # Cálculo final del tiempo de ejecución
-    fin = time.time()
+    # Tiempo de ejecución: lo que lleva abierto el tramo de la etapa
     print("-"*(60))
-    print(f"[{ahora()}] [METRICAS] Tiempo Total de Ingestion: {fin - inicio:.2f} segundos")
+    print(f"[{ahora()}] [METRICAS] Tiempo Total de Ingestion: {actual().transcurrido:.2f} segundos")
+    if fallidos:
+        print(f"[{ahora()}] [ERROR] {fallidos} archivos no se subieron completos a HDFS.")
+        actual().fallar(IOError(f"{fallidos} archivos no se subieron completos a HDFS"))
     
     print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE INGESTA DE DATOS")
     print("="*60 + "\n")
     
+@tramo("subida_webhdfs")
+def ingestar_webhdfs(tam_buffer, hilos, replicacion=None, ctx=None, codec=None):
+    """
+    Sube todos los archivos locales a HDFS por WebHDFS usando un pool de hilos
+    (subir_archivos). Al final mostramos el MB/s agregado de toda la carga.
+    Devuelve el número de archivos que no han quedado completos en HDFS.
+    """
+    # Emparejamos cada archivo local con su carpeta de destino (igual que en modo docker)
+    trabajos = trabajos_locales()
+
+    print(f"[{ahora()}] [INFO]  Subiendo {len(trabajos)} archivos por WebHDFS "
+          f"(hilos={hilos}, buffer={tam_buffer // 1024 // 1024} MB)")
+
+    # Acceso WebHDFS directo del contexto: si la etapa corre dentro de 90_run_all.py
+    # reutiliza las conexiones abiertas por las demás etapas.
+    hdfs = (ctx or Contexto()).acceso("webhdfs")
+    fallidos, total_bytes = subir_archivos(hdfs, trabajos, tam_buffer, hilos, replicacion, codec)
+
+    duracion = actual().transcurrido
+    print(f"[{ahora()}] [METRICAS] Throughput agregado WebHDFS: "
+          f"{total_bytes / 1024 / 1024 / max(duracion, 1e-9):.1f} MB/s ({total_bytes / 1024 / 1024:.1f} MB en {duracion:.2f} s)")
+    return len(fallidos)
+
+def subir_archivos(hdfs, trabajos, tam_buffer, hilos, replicacion=None, codec=None):
+    """
+    Sube los (archivo, destino) de 'trabajos' con un pool de hilos y el acceso 'hdfs'
+    (WebHDFS directo o puente docker). Los archivos pequeños se envían enteros en
+    streaming; los grandes se trocean en partes reanudables (ver sección 4) y se
+    ensamblan al final. Mostramos el MB/s de cada archivo o parte.
+    Devuelve (archivos que no han quedado completos en HDFS, bytes subidos).
+    """
+    total_bytes = 0
+    fallidos = set()
+    inicio = time.perf_counter()
+
+    # Estado de los archivos troceados: manifiesto, nº de partes, bytes subidos en
+    # esta ejecución e instante en que terminó su última parte.
+    troceados = {}
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = {}
+        for archivo, destino in trabajos:
+            if not por_partes(archivo, codec):
+                futuros[pool.submit(propagar(subir_webhdfs), hdfs, archivo, destino, tam_buffer, replicacion, codec)] = (archivo, destino, None)
+                continue
+
+            manifiesto = cargar_manifiesto(archivo, destino, TAM_PARTE)
+            pendientes = partes_pendientes(hdfs, archivo, destino, manifiesto)
+            guardar_manifiesto(archivo, manifiesto)
+            total_partes = math.ceil(manifiesto["tamano"] / TAM_PARTE)
+            troceados[archivo] = {"manifiesto": manifiesto, "destino": destino, "partes": total_partes,
+                                  "bytes": 0, "fin": 0.0}
+            print(f"[{ahora()}] [INFO]  {archivo.name}: {total_partes} partes de {TAM_PARTE // 1024 // 1024} MB, "
+                  f"{len(pendientes)} pendientes de subir")
+            for indice in pendientes:
+                futuros[pool.submit(propagar(subir_parte), hdfs, archivo, destino, indice, TAM_PARTE, tam_buffer, replicacion)] = (archivo, destino, indice)
+
+        for futuro in as_completed(futuros):
+            archivo, destino, indice = futuros[futuro]
+            try:
+                tam, segundos = futuro.result()
+                total_bytes += tam
+                mb_s = tam / 1024 / 1024 / max(segundos, 1e-9)
+                if indice is None:
+                    sumar(archivos=1)
+                    print(f"[{ahora()}] [OK]    {archivo.name} -> {destino} "
+                          f"({tam / 1024 / 1024:.1f} MB en {segundos:.2f} s, {mb_s:.1f} MB/s)")
+                else:
+                    # Checkpoint: la parte está subida y verificada, la anotamos en el manifiesto.
+                    # (as_completed entrega los resultados en este hilo, no hace falta bloquear)
+                    estado = troceados[archivo]
+                    estado["manifiesto"]["partes_ok"] = sorted({*estado["manifiesto"]["partes_ok"], indice})
+                    guardar_manifiesto(archivo, estado["manifiesto"])
+                    estado["bytes"] += tam
+                    estado["fin"] = time.perf_counter() - inicio
+                    print(f"[{ahora()}] [OK]    {archivo.name} parte {indice} ({mb_s:.1f} MB/s)")
+            except Exception as e:
+                # Si un archivo (o una parte) falla, el resto de subidas continúa
+                etiqueta = archivo.name if indice is None else f"{archivo.name} (parte {indice})"
+                print(f"[{ahora()}] [ERROR] Falló la ingesta de {etiqueta}")
+                print(f"                      -> Detalles: {e}")
+                fallidos.add(archivo)
+
+    # Ensamblado de los archivos troceados que tienen todas sus partes
+    for archivo, estado in troceados.items():
+        if len(estado["manifiesto"]["partes_ok"]) < estado["partes"]:
+            faltan = estado["partes"] - len(estado["manifiesto"]["partes_ok"])
+            print(f"[{ahora()}] [WARN]  {archivo.name}: faltan {faltan} partes. "
+                  f"Vuelve a ejecutar la ingesta para subir solo esas partes.")
+            fallidos.add(archivo)
+            continue
+        try:
+            ensamblar(hdfs, archivo, estado["destino"], estado["partes"])
+            borrar_variantes(hdfs, estado["destino"], archivo.name)
+            sumar(archivos=1)
+            (DIR_CHECKPOINTS / f"{archivo.name}.json").unlink(missing_ok=True)
+            segundos = max(estado["fin"], 1e-9)
+            print(f"[{ahora()}] [OK]    {archivo.name} -> {estado['destino']} "
+                  f"(ensamblado; {estado['bytes'] / 1024 / 1024:.1f} MB subidos en esta ejecución, "
+                  f"{estado['bytes'] / 1024 / 1024 / segundos:.1f} MB/s)")
+        except Exception as e:
+            print(f"[{ahora()}] [ERROR] Falló el ensamblado de {archivo.name}")
+            print(f"                      -> Detalles: {e}")
+            fallidos.add(archivo)
+
+    return fallidos, total_bytes
+
+
+@tramo("subida_streaming")
+def ingestar_streaming(replicacion=None, semilla=None, meta_bytes=None, ctx=None, codec=None):
+    """
+    Genera los datos del día y los escribe directamente en HDFS, sin pasar por data_local.
+    El generador es el de 10_generate_data.py (mismo código, misma semilla -> mismos bytes);
+    solo cambia a dónde van sus lotes: a un FlujoEscritura por archivo, cuyo hilo los
+    sube mientras el generador prepara el siguiente lote.
+    Devuelve el número de archivos que no han quedado completos en HDFS.
+    """
+    generador = cargar_etapa("10_generate_data.py")
+    hdfs = (ctx or Contexto()).hdfs
+    compresores = {}    # nombre en HDFS -> Compresor (para sus métricas)
+
+    def abrir(ruta):
+        destino = next(ruta_hdfs for clave, ruta_hdfs in DESTINOS.items() if clave in ruta.name)
+        print(f"[{ahora()}] [INFO]  {ruta.name} -> {destino} (streaming)")
+        if not codec:
+            borrar_variantes(hdfs, destino, ruta.name)
+            return FlujoEscritura(hdfs, f"{destino}/{ruta.name}", replicacion)
+        # Los lotes se comprimen en el hilo de subida, en paralelo con la generación
+        compresor = Compresor(codec)
+        compresores[ruta.name + compresor.extension] = compresor
+        borrar_variantes(hdfs, destino, ruta.name + compresor.extension)
+        return FlujoEscritura(hdfs, f"{destino}/{ruta.name}{compresor.extension}", replicacion,
+                              filtro=compresor.comprimir)
+
+    opciones = {"semilla": semilla, "abrir": abrir}
+    if meta_bytes:
+        opciones["meta_bytes"] = meta_bytes
+    try:
+        generador.generar_datos(**opciones)
+    except OSError as e:
+        # El archivo a medias se queda en su temporal: el nombre final nunca ve datos incompletos
+        print(f"[{ahora()}] [ERROR] Falló la ingesta en streaming")
+        print(f"                      -> Detalles: {e}")
+        actual().fallar(e)
+        return len(DESTINOS)
+    sumar(archivos=len(DESTINOS))
+    for nombre, compresor in compresores.items():
+        print(f"[{ahora()}] [METRICAS] {nombre}: {compresor.resumen()}")
+
+    print(f"[{ahora()}] [OK]    Carga en streaming completada en {actual().transcurrido:.2f} s "
+          f"(generación y subida solapadas, 0 bytes en disco local)")
+    return 0
+
 # ---------------------------------------------------------
 # PUNTO DE ENTRADA
 # ---------------------------------------------------------
 # Asegura que el script solo corre si se ejecuta directamente
 if __name__ == "__main__": 
-    ingestar()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingesta de datos locales a HDFS")
+    parser.add_argument("--modo", choices=["docker", "webhdfs", "streaming"], default=MODO_INGESTA,
+                        help="docker: puente docker cp + hdfs dfs -put | webhdfs: streaming directo | "
+                             "streaming: genera y sube a la vez, sin archivos locales")
+    parser.add_argument("--buffer-mb", type=int, default=TAM_BUFFER // 1024 // 1024,
+                        help="Tamaño de cada trozo enviado por WebHDFS (MB)")
+    parser.add_argument("--hilos", type=int, default=HILOS_SUBIDA,
+                        help="Archivos (o partes de los archivos grandes) subidos en paralelo")
+    parser.add_argument("--replicacion", type=int, default=REPLICACION,
+                        help="Factor de replicación de los archivos subidos (por defecto, el del clúster)")
+    parser.add_argument("--semilla", type=int, default=None,
+                        help="Modo streaming: semilla del generador (misma semilla -> mismos archivos)")
+    parser.add_argument("--meta-mb", type=int, default=None,
+                        help="Modo streaming: tamaño objetivo por familia en MB (por defecto, el de 10_generate_data.py)")
+    parser.add_argument("--codec", choices=list(CODECS), default=CODEC,
+                        help="Comprime los archivos al vuelo (por defecto, la variable CODEC_COMPRESION o sin compresión)")
+    args = parser.parse_args()
+    salir(ingestar, modo=args.modo, tam_buffer=args.buffer_mb * 1024 * 1024, hilos=args.hilos, replicacion=args.replicacion,
+          semilla=args.semilla, meta_bytes=args.meta_mb * 1024 * 1024 if args.meta_mb else None, codec=args.codec)
\ No newline at end of file
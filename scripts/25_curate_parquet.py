@@ -0,0 +1,218 @@
+# Importamos las librerías necesarias
+import argparse
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import polars as pl
+from contexto import Contexto
+from compresion import codec_de, nombre_logico, descomprimir
+from hdfs_io import legible
+from trazas import tramo, etapa, salir, actual, sumar
+
+# Función auxiliar (lambda) para obtener la hora exacta del momento.
+# Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN DE RUTAS
+# ---------------------------------------------------------
+# Partición del día que vamos a curar (la misma que acaba de ingerir 20; variable DT en un backfill)
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
+
+# Capa cruda (texto) -> capa curada (Parquet).
+# La capa curada va en su propia raíz y no en /data: se puede regenerar en cualquier
+# momento a partir de la cruda, así que ni se respalda (40) ni entra en el inventario
+# /data vs /backup (50).
+ORIGEN = "/data/{familia}/raw/dt={dt}"
+DESTINO = "/curated/{familia}/dt={dt}"
+
+# ---------------------------------------------------------
+# 2. ESQUEMA Y PARTICIONADO DE CADA FAMILIA
+# ---------------------------------------------------------
+# Columnas tipadas: la fecha pasa de texto ISO a Datetime y los campos que se
+# repiten mucho a Categorical (cada valor distinto se guarda una sola vez).
+FORMATO_FECHA = "%Y-%m-%dT%H:%M:%S%.f"
+
+# PARTICIONES: Columna por la que se sub-particiona cada familia dentro de dt=...
+#   logs -> "estado" (INFO, ALERTA, CRITICO, DEBUG): "eventos CRITICO por usuario"
+#           solo lee estado=CRITICO. También admite "hora" (hora=0..23).
+#   iot  -> "metrica" (temp, humedad, co2): "media de co2 por sensor" solo lee metrica=co2.
+# La columna de partición no se guarda dentro del Parquet: va en la ruta (estilo Hive).
+PARTICIONES = {"logs": "estado", "iot": "metrica"}
+
+# Filas por row group. Dentro de cada archivo las filas van ordenadas por fecha, así
+# las estadísticas min/max de cada row group permiten saltarse los que quedan fuera
+# de un rango de tiempo sin leerlos.
+FILAS_ROW_GROUP = 128 * 1024
+
+# Consultas de ejemplo que se lanzan contra la capa curada para comprobar cuánto
+# se salta cada una: (descripción, columna filtrada, valor, agrupación, agregado).
+CONSULTAS = {
+    "logs": ("eventos CRITICO por usuario", "estado", "CRITICO", "usuario", pl.len().alias("eventos")),
+    "iot": ("media de co2 por sensor", "metrica", "co2", "sensor_id", pl.col("valor").mean().alias("media")),
+}
+
+def escanear(familia, archivos, clave):
+    """
+    Plan perezoso (LazyFrame) sobre los archivos crudos de una familia, con las
+    columnas ya tipadas. No lee nada hasta que se ejecuta: Polars lo procesa a trozos.
+    """
+    if familia == "logs":
+        # logs_{DT}.log: fecha|usuario|accion|estado, sin cabecera
+        plan = pl.scan_csv(archivos, separator="|", has_header=False, quote_char=None,
+                           new_columns=["fecha", "usuario", "accion", "estado"],
+                           schema={"fecha": pl.String, "usuario": pl.String, "accion": pl.String, "estado": pl.String})
+        tipos = [pl.col("usuario", "accion", "estado").cast(pl.Categorical)]
+    else:
+        # iot_{DT}.jsonl: {"fecha", "sensor_id", "metrica", "valor"} por línea
+        plan = pl.scan_ndjson(archivos, schema={"fecha": pl.String, "sensor_id": pl.String,
+                                                "metrica": pl.String, "valor": pl.Float64})
+        tipos = [pl.col("sensor_id", "metrica").cast(pl.Categorical)]
+    plan = plan.with_columns(pl.col("fecha").str.to_datetime(FORMATO_FECHA, time_unit="us"), *tipos)
+    if clave == "hora":
+        plan = plan.with_columns(pl.col("fecha").dt.hour().alias("hora"))
+    return plan
+
+# ---------------------------------------------------------
+# 3. FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+def descargar(hdfs, ruta, destino):
+    """
+    Copia un archivo crudo de HDFS a disco local en streaming (descomprimiendo
+    los .gz/.zst de la ingesta comprimida). Polars escanea después esa copia.
+    """
+    codec = codec_de(ruta)
+    with hdfs.leer(ruta) as lector, open(destino, "wb") as f:
+        for trozo in descomprimir(lector, codec) if codec else lector:
+            f.write(trozo)
+
+def escribir_particiones(plan, clave, salida, nombre):
+    """
+    Escribe un Parquet por valor de la clave de partición (salida/clave=valor/...).
+    El texto crudo se parsea una sola vez: el plan tipado se vuelca primero en un
+    Parquet intermedio (sink_parquet, a trozos) y las particiones salen de él. Cada
+    una se filtra (Polars lee primero la columna de la clave y solo decodifica el
+    resto de columnas de las filas que pasan), se ordena por fecha y se vuelca con
+    sink_parquet: la memoria máxima es la de la partición más grande ya tipada
+    (columnar, mucho menos que el texto original), nunca la del archivo crudo entero.
+    Devuelve {valor: (filas, bytes del Parquet)}.
+    """
+    intermedio = salida.parent / f"{salida.name}_intermedio.parquet"
+    plan.sink_parquet(intermedio, compression="lz4", row_group_size=FILAS_ROW_GROUP)
+    try:
+        tipado = pl.scan_parquet(intermedio)
+        valores = tipado.select(pl.col(clave).unique()).collect()[clave].cast(pl.String).sort().to_list()
+        particiones = {}
+        for valor in valores:
+            carpeta = salida / f"{clave}={valor}"
+            carpeta.mkdir(parents=True)
+            archivo = carpeta / nombre
+            (tipado.filter(pl.col(clave).cast(pl.String) == valor)
+                   .drop(clave)
+                   .sort("fecha")
+                   .sink_parquet(archivo, compression="zstd", statistics=True, row_group_size=FILAS_ROW_GROUP))
+            particiones[valor] = (pl.scan_parquet(archivo).select(pl.len()).collect().item(), archivo.stat().st_size)
+    finally:
+        intermedio.unlink(missing_ok=True)
+    return particiones
+
+def publicar(hdfs, salida, destino):
+    """
+    Sube la capa curada a una carpeta temporal y la renombra al nombre final:
+    quien lea /curated nunca ve una partición a medio escribir.
+    """
+    temporal = f"{destino}._CURANDO_"
+    hdfs.borrar(temporal)
+    for carpeta in sorted(p for p in salida.iterdir() if p.is_dir()):
+        hdfs.crear_directorio(f"{temporal}/{carpeta.name}")
+        hdfs.subir_varios(sorted(carpeta.iterdir()), f"{temporal}/{carpeta.name}")
+    hdfs.borrar(destino)
+    hdfs.renombrar(temporal, destino)
+
+def probar_consulta(familia, salida, clave, particiones):
+    """
+    Lanza la consulta de ejemplo de la familia sobre la capa recién escrita y
+    estima qué parte de los datos lee gracias al particionado: el tamaño de los
+    Parquet de las particiones que deja pasar el filtro frente al total (Polars no
+    informa de los bytes leídos; dentro de esos archivos aún lee menos, solo las
+    columnas que usa la consulta).
+    """
+    descripcion, columna, valor, grupo, agregado = CONSULTAS[familia]
+    resultado = (pl.scan_parquet(salida / "**" / "*.parquet", hive_partitioning=True)
+                   .filter(pl.col(columna).cast(pl.String) == valor)
+                   .group_by(grupo).agg(agregado)
+                   .sort(agregado.meta.output_name(), descending=True)
+                   .head(3).collect())
+    total = sum(tam for _, tam in particiones.values())
+    leidos = particiones[valor][1] if columna == clave and valor in particiones else total
+    print(f"[{ahora()}] [METRICAS] Consulta '{descripcion}': particiones de {legible(leidos)} de {legible(total)} "
+          f"({100 * leidos / max(total, 1):.0f}%, estimación de lo que lee) | Top 3: {resultado.rows()}")
+
+# ---------------------------------------------------------
+# 4. FUNCIÓN PRINCIPAL
+# ---------------------------------------------------------
+@etapa("25_curate_parquet")
+def curar(dt=DT, particiones=None, ctx=None):
+    particiones = {**PARTICIONES, **(particiones or {})}
+    print(f"[{ahora()}] [INFO]  --> INICIO CURADO A PARQUET | FECHA={dt}")
+
+    # Acceso a HDFS del contexto (compartido con el resto de etapas en 90_run_all.py)
+    hdfs = (ctx or Contexto()).hdfs
+
+    for familia, clave in particiones.items():
+        origen = ORIGEN.format(familia=familia, dt=dt)
+        destino = DESTINO.format(familia=familia, dt=dt)
+        print(f"\n[{ahora()}] [INFO]  {familia.upper()}: {origen} -> {destino} (particionado por {clave})")
+
+        archivos = [e for e in hdfs.listar(origen) if e["type"] == "FILE" and not e["pathSuffix"].startswith(".")]
+        if not archivos:
+            print(f"[{ahora()}] [WARN]  No hay datos crudos para curar en {origen}.")
+            continue
+
+        # Todo el trabajo local (copia del crudo y Parquet) en una carpeta temporal
+        # que se borra al terminar, vaya bien o mal.
+        with tramo("curado", familia=familia, particion=clave), tempfile.TemporaryDirectory(prefix="curado_") as trabajo:
+            try:
+                trabajo = Path(trabajo)
+                crudos = []
+                for entrada in archivos:
+                    local = trabajo / nombre_logico(entrada["pathSuffix"])
+                    descargar(hdfs, f"{origen}/{entrada['pathSuffix']}", local)
+                    crudos.append(str(local))
+                bytes_crudos = sum(Path(c).stat().st_size for c in crudos)
+
+                salida = trabajo / "curado"
+                resultado = escribir_particiones(escanear(familia, crudos, clave), clave, salida,
+                                                 f"{familia}_{dt}.parquet")
+                filas = sum(n for n, _ in resultado.values())
+                bytes_parquet = sum(tam for _, tam in resultado.values())
+                sumar(filas=filas, particiones=len(resultado))
+
+                publicar(hdfs, salida, destino)
+            except (OSError, pl.exceptions.PolarsError) as e:
+                print(f"[{ahora()}] [ERROR] Falló el curado de {familia}")
+                print(f"                      -> Detalles: {e}")
+                actual().fallar(e)
+                continue
+
+            for valor, (n, tam) in resultado.items():
+                print(f"[{ahora()}] [OK]    {destino}/{clave}={valor}: {n:,} filas, {legible(tam)}")
+            print(f"[{ahora()}] [METRICAS] {familia}: {filas:,} filas | texto {legible(bytes_crudos)} -> "
+                  f"Parquet {legible(bytes_parquet)} ({bytes_crudos / max(bytes_parquet, 1):.1f}x) "
+                  f"en {actual().transcurrido:.2f} s")
+            probar_consulta(familia, salida, clave, resultado)
+
+    print(f"\n[{ahora()}] [INFO]  --> FIN DEL PROCESO DE CURADO")
+    print("="*60 + "\n")
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capa curada en Parquet a partir de las particiones crudas")
+    parser.add_argument("--dt", default=DT, help="Partición a curar (AAAA-MM-DD, por defecto hoy)")
+    parser.add_argument("--particion-logs", choices=["estado", "hora"], default=PARTICIONES["logs"],
+                        help="Sub-partición de los logs dentro de dt=...")
+    args = parser.parse_args()
+    salir(curar, dt=args.dt, particiones={"logs": args.particion_logs})
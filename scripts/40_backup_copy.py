@@ -1,7 +1,16 @@
 # 1. Importamos las librerías necesarias
-import subprocess
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import partial
+from pathlib import Path
 import time
+from contexto import Contexto
+from compresion import Compresor, CODECS, codec_de, variantes
+from trazas import tramo, etapa, salir, actual, sumar, propagar  # Tramos medidos y métricas (trazas.py)
 
 # ---------------------------------------------------------
 # 2. CONFIGURACIÓN GENERAL
@@ -9,79 +18,309 @@ import time
 
 # Calculamos la fecha de hoy
 # Esto sirve para buscar la carpeta de datos correspondiente al día actual.
-DT = datetime.now().strftime('%Y-%m-%d')
+# En un backfill (90_run_all.py --desde/--hasta) la fecha llega en la variable DT.
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
 
 # Lista de carpetas (familias) que queremos copiar.
 # El script recorrerá esta lista una por una.
 FAMILIAS = ["logs", "iot"]
 
+# MODO_BACKUP:
+#   "completo"    -> Copia todos los archivos de la partición, cambien o no.
+#   "incremental" -> Copia solo los archivos nuevos o modificados desde el último
+#                    backup correcto (según su manifiesto) o que falten en destino.
+MODO_BACKUP = "incremental"
+
+# MOTOR_COPIA:
+#   "docker"  -> Cada archivo se copia con 'hdfs dfs -cp' dentro del NameNode (por defecto).
+#                Los listados y la validación van por WebHDFS (hdfs_io.py), sin arrancar JVMs.
+#   "webhdfs" -> Cada archivo se copia en streaming (lectura -> escritura) por WebHDFS.
+#                Requiere que el host resuelva los nombres de los DataNodes (ver README).
+MOTOR_COPIA = "docker"
+
+# Motor de copia paralelo (al estilo de distcp): la lista de archivos de todas las
+# familias se reparte entre HILOS_COPIA trabajadores que copian a la vez.
+HILOS_COPIA = 4
+
+# Límite GLOBAL de ancho de banda en MB/s (None = sin límite), compartido por todos
+# los hilos, para que el backup no deje sin red a la ingesta de producción.
+LIMITE_MBPS = None
+
+# CODEC: Comprime al vuelo los archivos que llegan sin comprimir a /backup (x.log -> x.log.gz).
+# None = copia idéntica. Los que ya están comprimidos en /data se copian tal cual.
+# Al comprimir, los datos pasan por el host (lectura -> compresión -> escritura) con
+# cualquiera de los dos motores. Variable de entorno: CODEC_COMPRESION (90_run_all.py --codec).
+CODEC = os.environ.get("CODEC_COMPRESION") or None
+
+# Reintentos por archivo ante fallos transitorios, con espera exponencial (1s, 2s, 4s...)
+REINTENTOS = 3
+TAM_BUFFER = 8 * 1024 * 1024
+
+# Manifiestos del último backup correcto: uno por familia y fecha, con el
+# tamaño y la fecha de modificación que tenía cada archivo de origen al copiarse.
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+DIR_MANIFIESTOS = RAIZ_PROYECTO / ".cache" / "backup"
+
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
 ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-print(f"[{ahora()}] --> INICIO PROCESO DE BACKUP DT={DT}")
+# ---------------------------------------------------------
+# 3. FUNCIONES AUXILIARES: INVENTARIO Y MANIFIESTO
+# ---------------------------------------------------------
+def listar(hdfs, ruta):
+    """
+    Devuelve {'archivo': {'tam': bytes, 'mtime': ms}} de una carpeta HDFS.
+    Si la carpeta no existe devolvemos un diccionario vacío.
+    """
+    return {info["pathSuffix"]: {"tam": info["length"], "mtime": info["modificationTime"]}
+            for info in hdfs.listar(ruta) if info["type"] == "FILE"}
+
+def ruta_manifiesto(familia):
+    return DIR_MANIFIESTOS / f"manifest_{familia}_dt={DT}.json"
+
+def cargar_manifiesto(familia):
+    """Lee el manifiesto del último backup correcto (vacío si nunca lo hubo)."""
+    ruta = ruta_manifiesto(familia)
+    if ruta.exists():
+        return json.loads(ruta.read_text(encoding="utf-8"))
+    return {}
+
+def guardar_manifiesto(familia, origen):
+    """Guarda el estado del origen tras un backup correcto (escritura atómica)."""
+    DIR_MANIFIESTOS.mkdir(parents=True, exist_ok=True)
+    ruta = ruta_manifiesto(familia)
+    temporal = ruta.with_suffix(".tmp")
+    temporal.write_text(json.dumps(origen, indent=1), encoding="utf-8")
+    temporal.replace(ruta)
+
+def nombre_destino(nombre, codec):
+    """Nombre del archivo en /backup: con la extensión del códec si hay que comprimirlo."""
+    return nombre + CODECS[codec] if codec and not codec_de(nombre) else nombre
+
+def seleccionar_cambios(origen, destino, manifiesto, modo, codec=None):
+    """
+    Decide qué archivos copiar. Devuelve (a_copiar, omitidos), listas de nombres.
+    En modo incremental un archivo se omite solo si:
+      - el manifiesto lo registra con el mismo tamaño y fecha de modificación, y
+      - existe en destino (con el nombre que toca según el códec) y con el tamaño
+        que tenía al copiarse (por si alguien borró o tocó el backup).
+    """
+    a_copiar, omitidos = [], []
+    for nombre, info in sorted(origen.items()):
+        previo = manifiesto.get(nombre, {})
+        nombre_copia = nombre_destino(nombre, codec)
+        sin_cambios = (previo.get("tam") == info["tam"] and previo.get("mtime") == info["mtime"]
+                       and previo.get("destino", nombre) == nombre_copia
+                       and nombre_copia in destino and destino[nombre_copia]["tam"] == previo.get("tam_destino", info["tam"]))
+        if modo == "incremental" and sin_cambios:
+            omitidos.append(nombre)
+        else:
+            a_copiar.append(nombre)
+    return a_copiar, omitidos
 
 # ---------------------------------------------------------
-# 3. FUNCIÓN PRINCIPAL DE BACKUP
+# 4. MOTOR DE COPIA: LIMITADOR DE ANCHO DE BANDA Y REINTENTOS
 # ---------------------------------------------------------
-def backup():
-    inicio = time.time()
-    # Iniciamos un bucle: Repetimos el proceso para cada familia ("logs" y "iot")
-    for familia in FAMILIAS:
-        
-        # Construimos las rutas dinámicamente usando la fecha de hoy.
-        # src (Source/Origen): Donde están los datos ahora.
-        # dst (Destination/Destino): Donde queremos guardarlos.
-        src = f"/data/{familia}/raw/dt={DT}"
-        dst = f"/backup/{familia}/raw/dt={DT}"
-
-        print(f"\n[{ahora()}] Procesando: {familia.upper()}")
-        print(f"Origen:  {src}")
-        print(f"Destino: {dst}")
-
-        # INICIO DEL BLOQUE DE SEGURIDAD (TRY - EXCEPT)
-        # Intentamos ejecutar los comandos. Si alguno falla, saltamos al 'except'.
+class LimitadorAncho:
+    """
+    Limitador global de ancho de banda compartido por todos los hilos.
+    Cada consumo de n bytes reserva una franja de n/velocidad segundos en un
+    "reloj virtual"; si la franja empieza en el futuro, el hilo espera.
+    Así la media de todos los hilos juntos nunca supera el límite.
+    """
+    def __init__(self, mbps):
+        self.velocidad = mbps * 1024 * 1024 if mbps else None
+        self.libre = time.monotonic()
+        self.cerrojo = threading.Lock()
+
+    def consumir(self, n):
+        if not self.velocidad:
+            return
+        with self.cerrojo:
+            momento = time.monotonic()
+            inicio = max(momento, self.libre)
+            self.libre = inicio + n / self.velocidad
+        espera = inicio - momento
+        if espera > 0:
+            time.sleep(espera)
+
+def limitar(trozos, limitador):
+    """Deja pasar cada trozo de datos solo cuando el limitador lo permite."""
+    for trozo in trozos:
+        limitador.consumir(len(trozo))
+        yield trozo
+
+def copiar_docker(hdfs, origen, destino, tam, limitador):
+    # El 'hdfs dfs -cp' mueve los datos dentro del clúster y no podemos frenarlo
+    # a mitad: reservamos el tamaño completo del archivo antes de lanzarlo.
+    limitador.consumir(tam)
+    hdfs.copiar(origen, destino)
+
+def copiar_webhdfs(hdfs, origen, destino, tam, limitador):
+    # Lectura y escritura en streaming: el límite se aplica trozo a trozo
+    with hdfs.leer(origen, TAM_BUFFER) as lector:
+        hdfs.escribir(destino, limitar(lector, limitador), tam_buffer=TAM_BUFFER)
+
+MOTORES = {"docker": copiar_docker, "webhdfs": copiar_webhdfs}
+
+def copiar_comprimido(hdfs, origen, destino, tam, limitador, codec):
+    # Lectura en streaming, compresión por bloques en paralelo y escritura del .gz/.zst.
+    # El límite de ancho de banda se aplica a lo que se lee del clúster.
+    compresor = Compresor(codec)
+    with hdfs.leer(origen, TAM_BUFFER) as lector:
+        hdfs.escribir(destino, compresor.comprimir(limitar(lector, limitador)), tam_buffer=TAM_BUFFER)
+    print(f"[{ahora()}] [METRICAS] {destino}: {compresor.resumen()}")
+
+def copiar_con_reintentos(copiar, hdfs, origen, destino, tam, limitador, reintentos):
+    """
+    Copia un archivo reintentando ante fallos con espera exponencial.
+    Devuelve (segundos empleados, intentos). Si agota los reintentos relanza el error.
+    """
+    for intento in range(1, reintentos + 1):
+        inicio = time.perf_counter()
         try:
-            # --- PASO 1: COPIAR ---
-            # Ejecutamos el comando 'hdfs dfs -cp' dentro del contenedor Docker.
-            # -f: Sobrescribe si ya existe.
-            # check=True: Si el comando falla (da error), Python detiene esto y salta al 'except'.
-            # capture_output=True: Guarda el mensaje de respuesta por si necesitamos leerlo.
-            subprocess.run(f"docker exec namenode hdfs dfs -cp -f {src}/* {dst}", shell=True, check=True, capture_output=True)
-            print(f"[{ahora()}] Copia archivos {familia} OK.")
-
-            # --- PASO 2: VALIDAR ---
-            # Verificamos que la carpeta se haya creado realmente en el destino.
-            # El comando '-test -e' comprueba si existe una ruta.
-            # Si NO existe, devuelve error y Python salta al 'except'.
-            subprocess.run(f"docker exec namenode hdfs dfs -test -e {dst}", shell=True, check=True)
-            print(f"[{ahora()}] Validación OK: La ruta existe en destino.")
-
-        # --- GESTIÓN DE ERRORES ---
-        # Aquí caemos solo si algo salió mal en el bloque 'try' de arriba.
-        # subprocess.CalledProcessError:
-        # Es la "alarma" específica que salta cuando un comando de Linux falla (devuelve error).
-        # La variable 'e' captura toda la información del fallo (qué comando fue, qué error dio, etc.)
-        except subprocess.CalledProcessError as e:
-            
-            # Recuperamos el mensaje de error que nos dio el sistema (Docker/HDFS).
-            # .decode() convierte los bytes del sistema en texto legible.
-            mensaje = e.stderr.decode() if e.stderr else "Error validando ruta destino"
-            
-            # Analizamos qué pasó:
-            # Si el error dice "No such file", es que hoy no había datos para copiar.
-            # Esto es un aviso leve (WARNING), no un error grave.
-            if "No such file" in mensaje:
+            copiar(hdfs, origen, destino, tam, limitador)
+            return time.perf_counter() - inicio, intento
+        except OSError as e:  # ErrorHDFS, errores de red y de docker
+            if intento == reintentos:
+                raise
+            print(f"[{ahora()}] [REINTENTO] {origen} (intento {intento}/{reintentos}): {e}")
+            time.sleep(2 ** (intento - 1))
+
+# ---------------------------------------------------------
+# 5. FUNCIÓN PRINCIPAL DE BACKUP
+# ---------------------------------------------------------
+@etapa("40_backup_copy")
+def backup(modo=MODO_BACKUP, motor=MOTOR_COPIA, hilos=HILOS_COPIA, limite_mbps=LIMITE_MBPS, codec=CODEC, ctx=None):
+    print(f"[{ahora()}] --> INICIO PROCESO DE BACKUP DT={DT}")
+
+    # Acceso a HDFS del contexto (compartido con el resto de etapas en 90_run_all.py)
+    # con el camino de datos del motor elegido. Los metadatos (listados) los responde
+    # siempre el NameNode por WebHDFS, sin mover datos.
+    hdfs = (ctx or Contexto()).acceso(motor)
+    limitador = LimitadorAncho(limite_mbps)
+    bytes_copiados = 0
+    bytes_omitidos = 0
+
+    print(f"[{ahora()}] Modo de backup: {modo.upper()} | Motor: {motor} | Hilos: {hilos} | "
+          f"Límite: {f'{limite_mbps} MB/s' if limite_mbps else 'sin límite'} | Compresión: {codec or 'no'}")
+
+    # --- FASE 1: PLANIFICAR ---
+    # Recorremos las familias ("logs" y "iot") y decidimos qué archivos copiar
+    # comparando el origen con el manifiesto del último backup correcto y con
+    # lo que hay realmente en destino. Todas las copias van a una única lista.
+    tareas = []   # (familia, archivo, archivo en destino, tamaño)
+    estado = {}   # familia -> rutas, inventario de origen y archivos confirmados
+    with tramo("planificacion"):
+        for familia in FAMILIAS:
+        
+            # Construimos las rutas dinámicamente usando la fecha de hoy.
+            # src (Source/Origen): Donde están los datos ahora.
+            # dst (Destination/Destino): Donde queremos guardarlos.
+            src = f"/data/{familia}/raw/dt={DT}"
+            dst = f"/backup/{familia}/raw/dt={DT}"
+
+            print(f"\n[{ahora()}] Procesando: {familia.upper()}")
+            print(f"Origen:  {src}")
+            print(f"Destino: {dst}")
+
+            origen = listar(hdfs, src)
+            if not origen:
                 print(f"[{ahora()}] AVISO: No hay datos para copiar hoy.")
-            
-            # Si es cualquier otro error (ej: el sistema está caído), es grave (ERROR).
-            else:
-                print(f"[{ahora()}] ERROR: {mensaje.strip()}")
+                continue
+            a_copiar, omitidos = seleccionar_cambios(origen, listar(hdfs, dst), cargar_manifiesto(familia), modo, codec)
+            bytes_omitidos += sum(origen[n]["tam"] for n in omitidos)
+            print(f"[{ahora()}] Archivos a copiar: {len(a_copiar)} | Sin cambios (omitidos): {len(omitidos)}")
+
+            estado[familia] = {"src": src, "dst": dst, "origen": origen, "confirmados": set(omitidos)}
+            tareas += [(familia, nombre, nombre_destino(nombre, codec), origen[nombre]["tam"]) for nombre in a_copiar]
+        sumar(bytes_omitidos=bytes_omitidos)
+
+    # --- FASE 2: COPIAR EN PARALELO ---
+    # Los archivos se reparten entre los hilos del pool. Cada uno se copia con
+    # reintentos y el limitador global reparte el ancho de banda entre todos.
+    copiar = MOTORES[motor]
+    comprimir = partial(copiar_comprimido, codec=codec)
+    fallidos = 0
+    # La fase de copia es un tramo propio: su duración da el throughput agregado
+    # y recoge los bytes y las llamadas a HDFS de los hilos del pool.
+    with tramo("copia", archivos=len(tareas), hilos=hilos) as fase_copia:
+        if tareas:
+            print(f"\n[{ahora()}] Copiando {len(tareas)} archivos con {hilos} hilos...")
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                futuros = {
+                    pool.submit(propagar(copiar_con_reintentos), comprimir if nombre_copia != nombre else copiar, hdfs,
+                                f"{estado[familia]['src']}/{nombre}", f"{estado[familia]['dst']}/{nombre_copia}",
+                                tam, limitador, REINTENTOS): (familia, nombre, tam)
+                    for familia, nombre, nombre_copia, tam in tareas
+                }
+                for i, futuro in enumerate(as_completed(futuros), 1):
+                    familia, nombre, tam = futuros[futuro]
+
+                    # --- GESTIÓN DE ERRORES ---
+                    # Si un archivo agota sus reintentos lo contamos como fallido y seguimos
+                    # con el resto: no queda en el manifiesto y se copiará en la próxima ejecución.
+                    try:
+                        segundos, intentos = futuro.result()
+                    except OSError as e:
+                        print(f"[{ahora()}] [{i}/{len(tareas)}] ERROR {familia}/{nombre}: {e}")
+                        fallidos += 1
+                        sumar(archivos_fallidos=1)
+                        continue
+
+                    estado[familia]["confirmados"].add(nombre)
+                    bytes_copiados += tam
+                    sumar(archivos=1, bytes_copiados=tam)
+                    mb = tam / 1024 / 1024
+                    extra = f" tras {intentos} intentos" if intentos > 1 else ""
+                    print(f"[{ahora()}] [{i}/{len(tareas)}] {familia}/{nombre}: {mb:.1f} MB en {segundos:.2f} s "
+                          f"({mb / max(segundos, 1e-9):.1f} MB/s){extra}")
+        else:
+            print(f"\n[{ahora()}] Nada que copiar: el backup ya está al día.")
+    segundos_copia = fase_copia.segundos
+
+    # --- FASE 3: VALIDAR Y GUARDAR MANIFIESTO ---
+    for familia, datos in estado.items():
+        # Verificamos que la carpeta exista realmente en el destino
+        # (equivalente a 'hdfs dfs -test -e', pero con una consulta de metadatos).
+        if hdfs.existe(datos["dst"]):
+            print(f"[{ahora()}] Validación {familia} OK: La ruta existe en destino.")
+        else:
+            print(f"[{ahora()}] ERROR: Error validando ruta destino {datos['dst']}")
+            actual().fallar(FileNotFoundError(f"No existe {datos['dst']}"))
+            continue
+
+        # Guardamos en el manifiesto solo los archivos confirmados (copiados u omitidos),
+        # para que la próxima ejecución incremental sepa qué ha cambiado. De cada uno,
+        # además, su nombre y tamaño en destino (distintos si se comprimió).
+        # La versión del otro formato (x.log frente a x.log.gz) de un backup anterior sobra.
+        copias = listar(hdfs, datos["dst"])
+        manifiesto = {}
+        for n in sorted(datos["confirmados"]):
+            nombre_copia = nombre_destino(n, codec)
+            if nombre_copia not in copias:
+                continue
+            manifiesto[n] = {**datos["origen"][n], "destino": nombre_copia, "tam_destino": copias[nombre_copia]["tam"]}
+            for otra in variantes(n):
+                if otra != nombre_copia and otra in copias:
+                    hdfs.borrar(f"{datos['dst']}/{otra}")
+        guardar_manifiesto(familia, manifiesto)
 
-    fin = time.time()
-    duracion = fin - inicio
+    duracion = actual().transcurrido
+    mb_copiados = bytes_copiados / 1024 / 1024
     
+    # En modo incremental el tiempo depende solo del volumen que ha cambiado
     print(f"\n[METRICAS R7] Tiempo de Copia/Migración: {duracion:.2f} segundos")
+    print(f"[METRICAS R7] Datos copiados: {mb_copiados:.1f} MB | "
+          f"Datos omitidos (sin cambios): {bytes_omitidos / 1024 / 1024:.1f} MB")
+    print(f"[METRICAS R7] Throughput agregado: {mb_copiados / max(segundos_copia, 1e-9):.1f} MB/s "
+          f"({len(tareas) - fallidos}/{len(tareas)} archivos en {segundos_copia:.2f} s)")
+    if fallidos:
+        # La etapa queda fallida (el backup del día no está completo): en el DAG de
+        # 90_run_all.py no se audita un backup a medias y el backfill no marca la fecha.
+        print(f"[{ahora()}] ERROR: {fallidos} archivos no se pudieron copiar tras {REINTENTOS} intentos.")
+        actual().fallar(IOError(f"{fallidos} archivos no se pudieron copiar"))
     
     print(f"\n[{ahora()}] --> FIN DEL PROCESO DE BACKUP")
     print("="*60 + "\n")
@@ -90,4 +329,16 @@ def backup():
 # PUNTO DE ENTRADA
 # ---------------------------------------------------------
 if __name__ == "__main__":
-    backup()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backup de /data a /backup")
+    parser.add_argument("--modo", choices=["completo", "incremental"], default=MODO_BACKUP,
+                        help="completo: copia todo | incremental: solo archivos nuevos o modificados")
+    parser.add_argument("--motor", choices=list(MOTORES), default=MOTOR_COPIA,
+                        help="docker: 'hdfs dfs -cp' en el NameNode | webhdfs: streaming desde el host")
+    parser.add_argument("--hilos", type=int, default=HILOS_COPIA,
+                        help="Número de archivos que se copian a la vez")
+    parser.add_argument("--limite-mbps", type=float, default=LIMITE_MBPS,
+                        help="Límite global de ancho de banda en MB/s (por defecto sin límite)")
+    parser.add_argument("--codec", choices=list(CODECS), default=CODEC,
+                        help="Comprime al vuelo los archivos copiados (por defecto, la variable CODEC_COMPRESION o sin compresión)")
+    args = parser.parse_args()
+    salir(backup, modo=args.modo, motor=args.motor, hilos=args.hilos, limite_mbps=args.limite_mbps, codec=args.codec)
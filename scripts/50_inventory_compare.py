@@ -1,6 +1,19 @@
 # 1. Importamos las librerías necesarias
-import subprocess
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from pathlib import Path
+from contexto import Contexto
+from compresion import codec_de, nombre_logico, descomprimir
+import merkle  # Manifiestos Merkle de /data y /backup (modo --merkle)
+from trazas import tramo, etapa, salir, actual, sumar, propagar  # Tramos medidos y métricas (trazas.py)
 
 # ---------------------------------------------------------
 # 2. CONFIGURACION Y CONSTANTES
@@ -8,7 +21,8 @@ from datetime import datetime
 
 # Calculamos la fecha de hoy
 # Esto define qué carpeta del día vamos a auditar.
-DT = datetime.now().strftime('%Y-%m-%d')
+# En un backfill (90_run_all.py --desde/--hasta) la fecha llega en la variable DT.
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -20,116 +34,581 @@ FAMILIAS = ["logs", "iot"]
 # Ruta donde guardaremos el informe final dentro del clúster HDFS
 HDFS_DIR = f"/audit/inventory/dt={DT}"
 
+# MODO_CHECKSUM: Cómo obtenemos la huella del contenido de cada archivo.
+#   "hdfs"   -> getFileChecksum de HDFS (MD5 de los CRC de bloque). Lo calculan los
+#               DataNodes, no viaja el contenido por la red. Por el puente docker se
+#               pide con 'hdfs dfs -checksum' dentro del NameNode.
+#   "sha256" -> Hash SHA-256 calculado en streaming leyendo el archivo completo.
+#               De los archivos comprimidos (.gz/.zst) se calcula el del contenido descomprimido.
+#   "muestreo" -> Verificación probabilística: se leen rangos de bytes elegidos al azar,
+#               en los mismos offsets de /data y /backup, y se comparan sus hashes. Lee
+#               solo BYTES_MUESTRA por archivo y el reporte da la cota de confianza.
+MODO_CHECKSUM = "hdfs"
+
+# HILOS_HASH: Archivos cuyo checksum se calcula a la vez.
+# TAM_BUFFER: Tamaño de cada trozo leído en el modo sha256.
+HILOS_HASH = 4
+TAM_BUFFER = 8 * 1024 * 1024
+
+# MUESTREO (modo "muestreo"):
+#   BYTES_MUESTRA -> Bytes que se leen de cada lado por archivo (--muestra-mb).
+#   TAM_RANGO     -> Tamaño de cada rango. El archivo se divide en huecos de TAM_RANGO y
+#                    se eligen al azar BYTES_MUESTRA / TAM_RANGO de ellos, sin repetir.
+#   CONFIANZA     -> Nivel de confianza de la cota que se muestra en el reporte.
+#   HILOS_RANGOS  -> Archivos cuyos rangos se piden a la vez (lecturas pequeñas: mandan las latencias).
+# Los rangos cambian en cada ejecución (salvo con --semilla): día a día la parte
+# verificada de cada archivo va creciendo. No se guardan en la caché.
+BYTES_MUESTRA = 4 * 1024 * 1024
+TAM_RANGO = 64 * 1024
+CONFIANZA = 0.99
+HILOS_RANGOS = 8
+
+# Caché local de checksums: clave (modo, ruta, tamaño, fecha de modificación).
+# Si un archivo no ha cambiado desde la última auditoría, no se vuelve a leer.
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+RUTA_CACHE = RAIZ_PROYECTO / ".cache" / "checksums_inventario.json"
+
+# LOTE_CHECKSUMS: Parejas de archivos que acumulamos antes de calcular sus
+# checksums en paralelo. Acota la memoria aunque el histórico tenga millones de archivos.
+LOTE_CHECKSUMS = 256
+
+# MAX_EJEMPLOS: Nombres de archivos con discrepancias que se muestran en el veredicto
+# (el detalle completo está en las líneas de evidencia del reporte).
+MAX_EJEMPLOS = 20
+
+# LINEAS_VISTA_PREVIA: Líneas del reporte que se muestran por pantalla.
+LINEAS_VISTA_PREVIA = 200
+
+# Carpeta compartida con Jupyter (la misma que usan los scripts 30 y 60).
+# Dejamos aquí un resumen JSON del inventario para el histórico de auditorías del notebook.
+DIR_COMPARTIDO = RAIZ_PROYECTO / "docker" / "clusterA" / "notebooks" / "raw_audits"
+
 # ---------------------------------------------------------
-# 3. FUNCION AUXILIAR: LECTURA DE METADATOS
+# 3. FUNCIONES AUXILIARES: CHECKSUMS
 # ---------------------------------------------------------
-def get_hdfs_files(ruta):
-    """
-    Conecta con HDFS y obtiene el inventario de una carpeta.
-    Devuelve un diccionario: {'archivo.txt': 1024 bytes, 'otro.log': 500 bytes}
-    """
-    try:
-        # Comando HDFS: 'hdfs dfs -stat'
-        # %n = Nombre del archivo
-        # %b = Tamaño en bytes
-        cmd = f'docker exec namenode hdfs dfs -stat "%n %b" {ruta}/*'
-        
-        # subprocess.check_output: Ejecuta y captura el texto que responde la terminal.
-        # text=True: Nos devuelve un string (texto), no bytes.
-        out = subprocess.check_output(cmd, shell=True, text=True)
-        
-        # Convertimos la salida de texto plano en un diccionario Python.
-        # splitlines(): Divide por líneas.
-        # split(): Divide nombre y tamaño.
-        return {line.split()[0]: int(line.split()[1]) for line in out.splitlines()}
-        
-    except subprocess.CalledProcessError:
-        # Si la carpeta no existe (ej: fallo la carga ese día), devolvemos diccionario vacío.
-        return {}
+def cargar_cache():
+    """Lee la caché de checksums de disco (vacía si aún no existe)."""
+    if RUTA_CACHE.exists():
+        return json.loads(RUTA_CACHE.read_text(encoding="utf-8"))
+    return {}
+
+def guardar_cache(cache):
+    """Guarda la caché de checksums de forma atómica."""
+    RUTA_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    temporal = RUTA_CACHE.with_suffix(f".{os.getpid()}.tmp")  # Único por proceso: en un backfill corren varios
+    temporal.write_text(json.dumps(cache, indent=1), encoding="utf-8")
+    temporal.replace(RUTA_CACHE)
+
+def clave_cache(modo, ruta, info):
+    """Clave de la caché: si cambian el tamaño o la fecha, la entrada deja de valer."""
+    return f"{modo}|{ruta}|{info['tam']}|{info['mtime']}"
+
+def calcular_checksum(hdfs, ruta, modo, codec=None):
+    """
+    Calcula la huella del contenido de un archivo HDFS.
+    Con codec (modo sha256) el hash es el del contenido original, descomprimido en
+    streaming: así x.log y x.log.gz con los mismos datos tienen el mismo checksum.
+    Devuelve (checksum, segundos empleados).
+    """
+    inicio = time.perf_counter()
+    if modo == "hdfs":
+        # Ej: {'algorithm': 'MD5-of-0MD5-of-512CRC32C', 'bytes': '0000...', 'length': 28}
+        resultado = hdfs.checksum(ruta)
+        checksum = f"{resultado['algorithm']}:{resultado['bytes']}"
+    else:
+        # Leemos el archivo a trozos: nunca está entero en memoria.
+        sha = hashlib.sha256()
+        with hdfs.leer(ruta, TAM_BUFFER) as lector:
+            for trozo in descomprimir(lector, codec) if codec else lector:
+                sha.update(trozo)
+        checksum = f"SHA-256:{sha.hexdigest()}"
+    return checksum, time.perf_counter() - inicio
+
+def calcular_checksums(hdfs, archivos, modo, cache, hilos=HILOS_HASH):
+    """
+    Obtiene el checksum de varios archivos en paralelo.
+    archivos: {ruta_hdfs: info}. Devuelve {ruta_hdfs: (checksum, MB/s o None si vino de la caché)}.
+    """
+    resultados = {}
+    pendientes = {}
+    for ruta, info in archivos.items():
+        clave = clave_cache(modo, ruta, info)
+        if clave in cache:
+            sumar(checksums_cache=1)
+            resultados[ruta] = (cache[clave], None)
+        else:
+            pendientes[ruta] = info
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = {pool.submit(propagar(calcular_checksum), hdfs, ruta, modo, info.get("codec")): ruta
+                   for ruta, info in pendientes.items()}
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            info = pendientes[ruta]
+            try:
+                checksum, segundos = futuro.result()
+            except OSError as e:  # ErrorHDFS y errores de red
+                print(f"[{ahora()}] [ERROR] No se pudo calcular el checksum de {ruta}")
+                print(f"                      -> {e}")
+                continue
+            sumar(checksums_calculados=1)
+            cache[clave_cache(modo, ruta, info)] = checksum
+            resultados[ruta] = (checksum, info["tam"] / 1024 / 1024 / max(segundos, 1e-9))
+
+    return resultados
 
 # ---------------------------------------------------------
-# 4. FUNCION PRINCIPAL: EL INVENTARIO
+# 3.1. VERIFICACIÓN POR MUESTREO DE RANGOS
 # ---------------------------------------------------------
-def inventory():
-    
-    print(f"[{ahora()}] [INFO]  --> INICIO AUDITORÍA DE INVENTARIO | FECHA={DT}")
-    
-    # Creamos una lista para ir guardando las líneas del informe en memoria
-    reporte_lines = [f"INVENTARIO {DT}", "-"*20]
-
-    # Bucle Principal: Analizamos cada familia de datos (Logs y IoT)
-    for fam in FAMILIAS:
-        print(f"[{ahora()}] [INFO]  Analizando familia: {fam.upper()}...")
-        
-        # Definimos las rutas a comparar
-        path_src = f"/data/{fam}/raw/dt={DT}"   # Origen (Datos en crudo)
-        path_dst = f"/backup/{fam}/raw/dt={DT}" # Destino (Copia de seguridad)
-        
-        # Obtenemos los inventarios (Diccionarios con nombre y peso)
-        src = get_hdfs_files(path_src)
-        dst = get_hdfs_files(path_dst)
-
-        # Añadimos la evidencia cruda al reporte
-        reporte_lines.append(f"\n--- EVIDENCIAS {fam.upper()} ---")
-        
-        for arc, tam in src.items():
-            reporte_lines.append(f"ORIGEN:  {path_src}/{arc} ({tam} bytes)")
-        for arc, tam in dst.items():
-            reporte_lines.append(f"DESTINO: {path_dst}/{arc} ({tam} bytes)")
-        
-        # --- LOGICA DE COMPARACION ---
-        
-        # CASO 1: Archivos Perdidos (Missing Files)
-        # Usamos Teoría de Conjuntos (Sets).
-        # Restar conjuntos (A - B) nos da "lo que está en A pero falta en B".
-        missing = set(src.keys()) - set(dst.keys())
-        
-        # CASO 2: Corrupción de Datos (Bad Size)
-        # Si el archivo existe en ambos lados, pero pesan distinto, está corrupto.
-        # Recorremos solo los archivos que existen en 'src' y 'dst'.
-        bad_size = {f for f in src if f in dst and src[f] != dst[f]}
-
-        # Veredicto
-        if not missing and not bad_size:
-            msg = f"{fam}: OK (Integridad verificada)"
-            print(f"[{ahora()}] [OK]    {msg}")
-            reporte_lines.append(msg)
+# Si un archivo tiene n huecos de TAM_RANGO y leemos k distintos al azar, una
+# corrupción que afecte a una fracción p de los huecos pasa desapercibida con
+# probabilidad como mucho (1 - p)^k. Despejando, con la confianza C, si la muestra
+# sale limpia la parte corrupta del archivo es menor que 1 - (1 - C)^(1/k).
+# Ej: 4 MB en rangos de 64 KB -> k = 64 -> con un 99 % de confianza, menos del 7 %.
+# Un único hueco corrupto (p.ej. un bloque dañado) se detecta con probabilidad k/n.
+
+def elegir_rangos(tam, bytes_muestra, azar):
+    """
+    Elige los rangos (offset, longitud) que se leen de un archivo de 'tam' bytes.
+    Devuelve (rangos ordenados por offset, número total de huecos del archivo).
+    """
+    huecos = -(-tam // TAM_RANGO)
+    elegidos = azar.sample(range(huecos), min(huecos, max(1, bytes_muestra // TAM_RANGO)))
+    return [(i * TAM_RANGO, min(TAM_RANGO, tam - i * TAM_RANGO)) for i in sorted(elegidos)], huecos
+
+def cota_corrupcion(leidos, huecos, confianza=CONFIANZA):
+    """Fracción máxima del archivo que puede estar corrupta sin que la muestra lo vea."""
+    if leidos >= huecos:
+        return 0.0  # Se ha leído entero: no queda nada sin comprobar
+    return 1 - (1 - confianza) ** (1 / leidos)
+
+def hashes_rangos(hdfs, ruta, rangos):
+    """Hash de cada rango de un archivo. Todos se leen en una sola llamada (leer_rangos)."""
+    return [hashlib.sha256(trozo).digest() for trozo in hdfs.leer_rangos(ruta, rangos)]
+
+def comparar_muestras(hdfs, pares, bytes_muestra, azar, hilos=HILOS_RANGOS):
+    """
+    Compara por muestreo varias parejas (rel, info_src, info_dst) del mismo tamaño y
+    formato. Los rangos de cada archivo se leen juntos (un 'docker exec' por archivo
+    con el puente docker) y los archivos de todas las parejas, a la vez en un pool de hilos.
+    Devuelve {rel: {"rangos", "huecos", "bytes", "distintos": [offsets], "error"}}.
+    """
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = {}
+        for rel, info_src, info_dst in pares:
+            rangos, huecos = elegir_rangos(info_src["tam"], bytes_muestra, azar)
+            resultados[rel] = {"rangos": len(rangos), "huecos": huecos, "bytes": sum(l for _, l in rangos),
+                               "distintos": [], "error": None}
+            futuros[rel] = (rangos, pool.submit(propagar(hashes_rangos), hdfs, info_src["ruta"], rangos),
+                            pool.submit(propagar(hashes_rangos), hdfs, info_dst["ruta"], rangos))
+
+        for rel, (rangos, a, b) in futuros.items():
+            try:
+                for (offset, _), hash_src, hash_dst in zip(rangos, a.result(), b.result()):
+                    if hash_src != hash_dst:
+                        resultados[rel]["distintos"].append(offset)
+            except OSError as e:  # ErrorHDFS y errores de red
+                resultados[rel]["error"] = str(e)
+    sumar(rangos_muestreados=sum(r["rangos"] for r in resultados.values()))
+    return resultados
+
+def describir_muestra(ruta, info, muestra):
+    """Línea de evidencia del modo muestreo: cuánto se ha leído y la cota que deja (si la muestra sale limpia)."""
+    linea = (f"{ruta} ({info['tam']} bytes) muestreo={muestra['rangos']}/{muestra['huecos']} rangos "
+             f"({muestra['bytes']} bytes)")
+    if muestra["distintos"] or muestra["error"]:
+        return linea
+    cota = cota_corrupcion(muestra["rangos"], muestra["huecos"])
+    return f"{linea} -> corrupción < {100 * cota:.2f}% con {100 * CONFIANZA:.0f}% de confianza"
+
+def algoritmo(checksum):
+    """Parte del checksum que identifica el algoritmo (antes de los dos puntos)."""
+    return checksum.split(":", 1)[0]
+
+def describir(ruta, info, checksum):
+    """Línea de evidencia del reporte: tamaño, checksum y velocidad de cálculo."""
+    if checksum is None:
+        return f"{ruta} ({info['tam']} bytes) checksum=NO DISPONIBLE"
+    valor, mb_s = checksum
+    velocidad = "caché" if mb_s is None else f"{mb_s:.1f} MB/s"
+    return f"{ruta} ({info['tam']} bytes) checksum={valor} [{velocidad}]"
+
+# ---------------------------------------------------------
+# 4. RECORRIDO DEL NAMESPACE Y COMPARACIÓN EN STREAMING
+# ---------------------------------------------------------
+# En lugar de cargar los dos inventarios en diccionarios y restarlos como conjuntos,
+# recorremos /data y /backup en orden alfabético y los comparamos como dos listas
+# ordenadas (merge join). La memoria no depende del número total de archivos, solo
+# del de la carpeta más grande.
+# hdfs_io.listar() pide cada carpeta por páginas (LISTSTATUS_BATCH).
+#
+# Los archivos se emparejan por su nombre lógico, sin la extensión del códec
+# (compresion.py): logs.log en /data y logs.log.gz en /backup son el mismo archivo.
+
+def recorrer_ordenado(hdfs, raiz, relativa=()):
+    """
+    Recorre recursivamente 'raiz' y genera (partes de la ruta relativa, info) de
+    cada archivo. Ordenamos cada carpeta por nombre lógico y bajamos a las subcarpetas
+    en el momento, así los archivos salen ordenados por sus partes: ('dt=...', 'a.log').
+    info lleva la ruta real (con la extensión) y el códec del archivo.
+    """
+    carpeta = "/".join((raiz,) + relativa)
+    entradas = sorted(((entrada["pathSuffix"] if entrada["type"] == "DIRECTORY" else nombre_logico(entrada["pathSuffix"]),
+                        entrada) for entrada in hdfs.listar(carpeta)), key=lambda par: par[0])
+    for nombre, entrada in entradas:
+        partes = relativa + (nombre,)
+        if entrada["type"] == "DIRECTORY":
+            yield from recorrer_ordenado(hdfs, raiz, partes)
         else:
-            msg = f"{fam} ERROR -> Faltan: {missing}, Mal tamaño: {bad_size}"
-            print(f"[{ahora()}] [ERROR] Discrepancia detectada en {fam}")
-            print(f"                      -> Faltan: {missing}")
-            print(f"                      -> Corruptos: {bad_size}")
-            reporte_lines.append(msg)
+            yield partes, {"tam": entrada["length"], "mtime": entrada["modificationTime"],
+                           "ruta": f"{carpeta}/{entrada['pathSuffix']}", "codec": codec_de(entrada["pathSuffix"])}
 
+def diff_ordenado(origen, destino):
+    """
+    Merge join de dos recorridos ordenados. Genera tuplas (estado, partes, info_src, info_dst):
+      "falta" -> solo está en el origen
+      "sobra" -> solo está en el destino
+      "comun" -> está en ambos (falta comparar tamaño y checksum)
+    """
+    a = next(origen, None)
+    b = next(destino, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield "falta", a[0], a[1], None
+            a = next(origen, None)
+        elif a is None or b[0] < a[0]:
+            yield "sobra", b[0], None, b[1]
+            b = next(destino, None)
+        else:
+            yield "comun", a[0], a[1], b[1]
+            a = next(origen, None)
+            b = next(destino, None)
 
-    # --- GUARDAR REPORTE ---
-    print(f"[{ahora()}] [INFO]  Generando reporte final...")
-    
-    # Unimos todas las líneas en un solo bloque de texto
-    texto_final = "\n".join(reporte_lines)
-    nombre_reporte = f"reporte_inventario_dt={DT}.txt"
-    
-    # Pasamos directamente el reporte a HDFS desde la memoria RAM.
-    
-    # -i: Modo interactivo (permite recibir datos).
-    # -put - : El guion solo significa "lee de la entrada estándar (stdin)".
-    cmd_put = f"docker exec -i namenode hdfs dfs -put -f - {HDFS_DIR}/{nombre_reporte}"
-    
-    try:
-        # input=texto_final: Aquí inyectamos el texto al comando.
-        subprocess.run(cmd_put, shell=True, check=True, input=texto_final, text=True)
-        
-        print(f"[{ahora()}] [OK]    Reporte guardado en HDFS: {HDFS_DIR}/{nombre_reporte}")
-        
-        print("\n" + "-"*60)
-        print(f"[{ahora()}] [INFO]  VISTA PREVIA DEL REPORTE")
-        print("-"*(60))
-        print(texto_final)
-        print("-"*(60))
-        
-    except subprocess.CalledProcessError:
-        print(f"[{ahora()}] [FATAL] No se pudo guardar el reporte en HDFS.")
+def comparar(hdfs, raiz_src, raiz_dst, modo, cache, escribir, bytes_muestra=BYTES_MUESTRA, azar=None):
+    """
+    Compara dos árboles HDFS en una sola pasada y escribe las evidencias con 'escribir'.
+    Devuelve (contadores, ejemplos) con el número de archivos en cada situación y
+    algunos nombres de ejemplo de cada discrepancia.
+    En modo "muestreo" los contadores incluyen además los bytes comparados
+    (bytes_muestreados de bytes_verificables), la peor cota de corrupción (cota_maxima)
+    y las parejas cuya muestra no ha salido limpia (muestras_fallidas).
+    """
+    contadores = Counter()
+    ejemplos = {"faltan": [], "mal_tamano": [], "mal_checksum": []}
+    pendientes = []
+
+    def anotar(tipo, rel):
+        contadores[tipo] += 1
+        if len(ejemplos[tipo]) < MAX_EJEMPLOS:
+            ejemplos[tipo].append(rel)
+
+    def resolver_pendientes():
+        # Checksums del lote acumulado (en paralelo y reutilizando la caché).
+        # Si un lado está comprimido y el otro no (o con otro códec), sus bytes no se
+        # parecen en nada: esas parejas van directamente a SHA-256 del contenido.
+        # En modo muestreo, las parejas guardadas igual se comparan por rangos: sus
+        # bytes están en los mismos offsets.
+        rutas, rehacer, muestreo = {}, {}, []
+        for rel, info_src, info_dst in pendientes:
+            if info_src["codec"] != info_dst["codec"]:
+                destino = rehacer
+            elif modo == "muestreo":
+                muestreo.append((rel, info_src, info_dst))
+                continue
+            else:
+                destino = rutas
+            destino[info_src["ruta"]] = info_src
+            destino[info_dst["ruta"]] = info_dst
+        sums = calcular_checksums(hdfs, rutas, modo, cache)
+        muestras = comparar_muestras(hdfs, muestreo, bytes_muestra, azar or random.Random()) if muestreo else {}
+
+        # Los checksums nativos de HDFS solo son comparables si ambos lados usan el
+        # mismo algoritmo (depende del tamaño de bloque/CRC). Si no, pasamos a SHA-256.
+        for rel, info_src, info_dst in pendientes:
+            a, b = sums.get(info_src["ruta"]), sums.get(info_dst["ruta"])
+            if a and b and algoritmo(a[0]) != algoritmo(b[0]):
+                rehacer[info_src["ruta"]] = info_src
+                rehacer[info_dst["ruta"]] = info_dst
+        if rehacer:
+            sums.update(calcular_checksums(hdfs, rehacer, "sha256", cache))
+
+        for rel, info_src, info_dst in pendientes:
+            if rel in muestras:
+                muestra = muestras[rel]
+                contadores["bytes_muestreados"] += muestra["bytes"]
+                contadores["bytes_verificables"] += info_src["tam"]
+                contadores["cota_maxima"] = max(contadores["cota_maxima"],
+                                                cota_corrupcion(muestra["rangos"], muestra["huecos"]))
+                escribir(f"ORIGEN:  {describir_muestra(info_src['ruta'], info_src, muestra)}")
+                if muestra["error"]:
+                    escribir(f"DESTINO: {info_dst['ruta']} -> MUESTREO NO DISPONIBLE ({muestra['error']})")
+                    anotar("mal_checksum", rel)
+                    contadores["muestras_fallidas"] += 1
+                elif muestra["distintos"]:
+                    escribir(f"DESTINO: {info_dst['ruta']} -> RANGOS DISTINTOS en offsets {muestra['distintos'][:MAX_EJEMPLOS]}")
+                    anotar("mal_checksum", rel)
+                    contadores["muestras_fallidas"] += 1
+                else:
+                    escribir(f"DESTINO: {info_dst['ruta']} -> RANGOS IDÉNTICOS")
+                continue
+            a, b = sums.get(info_src["ruta"]), sums.get(info_dst["ruta"])
+            escribir(f"ORIGEN:  {describir(info_src['ruta'], info_src, a)}")
+            escribir(f"DESTINO: {describir(info_dst['ruta'], info_dst, b)}")
+            # Mismo tamaño pero distinto contenido: el caso que una comparación
+            # por tamaño nunca detectaría. Un checksum que no se pudo calcular
+            # también cuenta como discrepancia (no podemos certificar el archivo).
+            if a is None or b is None or a[0] != b[0]:
+                anotar("mal_checksum", rel)
+        pendientes.clear()
+
+    for estado, partes, info_src, info_dst in diff_ordenado(recorrer_ordenado(hdfs, raiz_src),
+                                                            recorrer_ordenado(hdfs, raiz_dst)):
+        rel = "/".join(partes)
+        contadores[estado] += 1
+
+        if estado == "falta":
+            # CASO 1: Archivo perdido (está en el origen y no en el destino)
+            escribir(f"ORIGEN:  {info_src['ruta']} ({info_src['tam']} bytes) -> FALTA EN DESTINO")
+            anotar("faltan", rel)
+        elif estado == "sobra":
+            escribir(f"DESTINO: {info_dst['ruta']} ({info_dst['tam']} bytes) -> NO EXISTE EN ORIGEN")
+        elif info_src["codec"] == info_dst["codec"] and info_src["tam"] != info_dst["tam"]:
+            # CASO 2: Corrupción de datos (existe en ambos lados pero pesan distinto).
+            # Solo vale si los dos están guardados igual: comprimido pesa menos y no es error.
+            escribir(f"ORIGEN:  {info_src['ruta']} ({info_src['tam']} bytes)")
+            escribir(f"DESTINO: {info_dst['ruta']} ({info_dst['tam']} bytes) -> MAL TAMAÑO")
+            anotar("mal_tamano", rel)
+        else:
+            # CASO 3: Mismo tamaño (o distinto formato) -> queda pendiente de comparar el checksum
+            pendientes.append((rel, info_src, info_dst))
+            if len(pendientes) >= LOTE_CHECKSUMS:
+                resolver_pendientes()
+
+    resolver_pendientes()
+    return contadores, ejemplos
+
+# ---------------------------------------------------------
+# 4.1. COMPARACIÓN POR MANIFIESTOS MERKLE
+# ---------------------------------------------------------
+# Con --merkle no se recorre archivo a archivo: cada capa se resume en un árbol de
+# hashes (merkle.py) que se guarda junto al reporte, en /audit/inventory/dt=.../.
+# El manifiesto de hoy parte del último guardado (solo se leen los archivos nuevos o
+# modificados) y la comparación solo baja por los subárboles que difieren.
+
+def cargar_manifiesto(hdfs, capa):
+    """Último manifiesto guardado de una capa (el de la fecha más reciente), o None."""
+    nombre = f"merkle_{capa.strip('/')}.json"
+    fechas = sorted((e["pathSuffix"] for e in hdfs.listar("/audit/inventory") if e["type"] == "DIRECTORY"),
+                    reverse=True)
+    for fecha in fechas:
+        ruta = f"/audit/inventory/{fecha}/{nombre}"
+        if hdfs.existe(ruta):
+            with hdfs.leer(ruta) as lector:
+                return json.loads(b"".join(lector))
+    return None
+
+def comparar_merkle(hdfs, raiz_src, raiz_dst, cache, escribir):
+    """
+    Compara dos capas por sus manifiestos Merkle. Devuelve (contadores, ejemplos) con
+    el mismo formato que comparar(), más los nodos comparados frente al total y los
+    archivos cuyo hash se ha tenido que calcular.
+    """
+    contadores = Counter()
+    ejemplos = {"faltan": [], "mal_tamano": [], "mal_checksum": []}
+    # Las hojas son el SHA-256 del contenido: es el único hash comparable entre capas
+    # con distinto códec o tamaño de bloque. Cada archivo se lee una sola vez (caché).
+    hashear = lambda archivos: {ruta: checksum for ruta, (checksum, _) in
+                                calcular_checksums(hdfs, archivos, "sha256", cache).items()}
+
+    manifiestos = []
+    for capa in (raiz_src, raiz_dst):
+        with tramo("manifiesto_merkle", capa=capa):
+            manifiesto, calculados = merkle.construir(hdfs, capa, DT, hashear, cargar_manifiesto(hdfs, capa))
+            sumar(archivos_hasheados=calculados)
+        contadores["hasheados"] += calculados
+        contadores["nodos_totales"] = max(contadores["nodos_totales"], merkle.contar_nodos(manifiesto))
+        escribir(f"MANIFIESTO {capa}: raíz={manifiesto['hash']} ({manifiesto['archivos']} archivos, "
+                 f"{calculados} hasheados, el resto reutilizado del manifiesto anterior)")
+        # Junto al reporte del inventario, para que el próximo solo relea lo que cambie
+        hdfs.escribir(f"{HDFS_DIR}/merkle_{capa.strip('/')}.json", json.dumps(manifiesto).encode())
+        manifiestos.append(manifiesto)
+    origen, destino = manifiestos
+
+    for estado, partes, hoja_src, hoja_dst in merkle.diferencias(origen, destino, contadores):
+        rel = "/".join(partes)
+        if estado == "falta":
+            contadores["falta"] += 1
+            contadores["faltan"] += 1
+            if len(ejemplos["faltan"]) < MAX_EJEMPLOS:
+                ejemplos["faltan"].append(rel)
+            escribir(f"ORIGEN:  {hoja_src['ruta']} ({hoja_src['tam']} bytes) -> FALTA EN DESTINO")
+        elif estado == "sobra":
+            contadores["sobra"] += 1
+            escribir(f"DESTINO: {hoja_dst['ruta']} ({hoja_dst['tam']} bytes) -> NO EXISTE EN ORIGEN")
+        else:
+            contadores["comun"] += 1
+            contadores["mal_checksum"] += 1
+            if len(ejemplos["mal_checksum"]) < MAX_EJEMPLOS:
+                ejemplos["mal_checksum"].append(rel)
+            escribir(f"ORIGEN:  {hoja_src['ruta']} ({hoja_src['tam']} bytes) checksum={hoja_src['hash']}")
+            escribir(f"DESTINO: {hoja_dst['ruta']} ({hoja_dst['tam']} bytes) checksum={hoja_dst['hash']} -> DISTINTO")
+    # Los archivos de los subárboles iguales están en los dos lados sin haberlos recorrido
+    contadores["comun"] += contadores["iguales"]
+    return contadores, ejemplos
+
+# ---------------------------------------------------------
+# 5. FUNCION PRINCIPAL: EL INVENTARIO
+# ---------------------------------------------------------
+@etapa("50_inventory_compare")
+def inventory(modo=MODO_CHECKSUM, historico=False, bytes_muestra=BYTES_MUESTRA, semilla=None, merkle=False, ctx=None):
+
+    # --merkle compara las capas completas (como --historico) por sus manifiestos; las hojas siempre son SHA-256
+    if merkle:
+        historico, modo = True, "sha256"
+    alcance = ("HISTÓRICO POR MANIFIESTOS MERKLE" if merkle else "HISTÓRICO COMPLETO") if historico else f"FECHA={DT}"
+    print(f"[{ahora()}] [INFO]  --> INICIO AUDITORÍA DE INVENTARIO | {alcance} | CHECKSUM={modo}")
+
+    # Acceso a HDFS del contexto (la sesión HTTP se reutiliza en todos los
+    # listados y checksums) y caché de checksums de auditorías anteriores
+    hdfs = (ctx or Contexto()).hdfs
+    cache = cargar_cache()
+
+    # Generador de los rangos del modo muestreo (con semilla, la muestra se repite)
+    azar = random.Random(semilla)
+
+    # Qué comparamos: el día de hoy familia a familia, o todo /data contra todo /backup
+    if merkle:
+        comparaciones = [("merkle", "/data", "/backup")]
+    elif historico:
+        comparaciones = [("historico", "/data", "/backup")]
+    else:
+        comparaciones = [(fam, f"/data/{fam}/raw/dt={DT}", f"/backup/{fam}/raw/dt={DT}") for fam in FAMILIAS]
+
+    # Familias con discrepancias: la etapa falla al final si hay alguna
+    # (después de guardar el reporte con sus evidencias).
+    con_errores = []
+
+    # Métricas por familia para el resumen JSON (histórico del notebook)
+    resumen = {"fecha": DT, "alcance": "merkle" if merkle else "historico" if historico else "dt", "checksum": modo,
+               "familias": {}}
+
+    # El reporte se escribe en un archivo temporal a medida que avanzamos,
+    # así su tamaño no ocupa memoria aunque el histórico sea enorme.
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as reporte:
+        escribir = lambda linea: reporte.write(linea + "\n")
+        escribir(f"INVENTARIO {DT}" + (" (MERKLE)" if merkle else " (HISTÓRICO)" if historico else ""))
+        escribir("-"*20)
+
+        # Bucle Principal: Analizamos cada familia de datos (Logs y IoT)
+        for etiqueta, path_src, path_dst in comparaciones:
+            print(f"[{ahora()}] [INFO]  Analizando: {etiqueta.upper()} ({path_src} vs {path_dst})...")
+            escribir(f"\n--- EVIDENCIAS {etiqueta.upper()} ---")
+
+            with tramo("comparacion", familia=etiqueta) as comparacion:
+                if merkle:
+                    contadores, ejemplos = comparar_merkle(hdfs, path_src, path_dst, cache, escribir)
+                else:
+                    contadores, ejemplos = comparar(hdfs, path_src, path_dst, modo, cache, escribir, bytes_muestra, azar)
+                sumar(archivos=contadores["falta"] + contadores["comun"] + contadores["sobra"],
+                      discrepancias=contadores["faltan"] + contadores["mal_tamano"] + contadores["mal_checksum"])
+            segundos = comparacion.segundos
+            print(f"[{ahora()}] [INFO]  {contadores['falta'] + contadores['comun']} archivos en origen, "
+                  f"{contadores['sobra'] + contadores['comun']} en destino ({segundos:.2f} s)")
+            resumen["familias"][etiqueta] = {
+                "archivos_origen": contadores["falta"] + contadores["comun"],
+                "archivos_destino": contadores["sobra"] + contadores["comun"],
+                "faltan": contadores["faltan"], "sobran": contadores["sobra"],
+                "mal_tamano": contadores["mal_tamano"], "mal_checksum": contadores["mal_checksum"],
+                "segundos": round(segundos, 3),
+            }
+            if merkle:
+                # Cuánto árbol se ha tenido que mirar frente a su tamaño total
+                resumen["familias"][etiqueta].update(nodos_comparados=contadores["nodos"],
+                                                     nodos_totales=contadores["nodos_totales"],
+                                                     archivos_hasheados=contadores["hasheados"])
+                msg = (f"{etiqueta}: {contadores['nodos']} de {contadores['nodos_totales']} nodos comparados "
+                       f"({100 * contadores['nodos'] / max(contadores['nodos_totales'], 1):.1f}%), "
+                       f"{contadores['iguales']} archivos iguales sin recorrerlos, "
+                       f"{contadores['hasheados']} archivos hasheados")
+                print(f"[{ahora()}] [METRICAS] {msg}")
+                escribir(msg)
+            if modo == "muestreo":
+                # Coste de lectura frente a un hash completo y garantía que deja la muestra.
+                # La cota solo vale si todos los rangos leídos coinciden: con uno distinto
+                # (o sin poder leerlos) ya hay corrupción confirmada, no una probabilidad.
+                muestreados, verificables = contadores["bytes_muestreados"], contadores["bytes_verificables"]
+                fallidas = contadores["muestras_fallidas"]
+                cota = None if fallidas else round(contadores["cota_maxima"], 6)
+                resumen["familias"][etiqueta].update(bytes_muestreados=muestreados, bytes_verificables=verificables,
+                                                     cota_corrupcion=cota, confianza=CONFIANZA)
+                msg = (f"{etiqueta}: muestreo de {muestreados / 1024 / 1024:.1f} MB de {verificables / 1024 / 1024:.1f} MB "
+                       f"({100 * muestreados / max(verificables, 1):.2f}% de la lectura de un hash completo, por lado). ")
+                if fallidas:
+                    msg += f"{fallidas} archivo(s) con rangos distintos o sin muestrear: no hay cota de confianza"
+                else:
+                    msg += (f"Con {100 * CONFIANZA:.0f}% de confianza, ningún archivo tiene más de un "
+                            f"{100 * cota:.2f}% de su contenido corrupto")
+                print(f"[{ahora()}] [METRICAS] {msg}")
+                escribir(msg)
+
+            # Veredicto
+            if not contadores["faltan"] and not contadores["mal_tamano"] and not contadores["mal_checksum"]:
+                msg = f"{etiqueta}: OK (Integridad verificada)"
+                print(f"[{ahora()}] [OK]    {msg}")
+                escribir(msg)
+            else:
+                msg = (f"{etiqueta} ERROR -> Faltan: {contadores['faltan']} {ejemplos['faltan']}, "
+                       f"Mal tamaño: {contadores['mal_tamano']} {ejemplos['mal_tamano']}, "
+                       f"Mal checksum: {contadores['mal_checksum']} {ejemplos['mal_checksum']}")
+                print(f"[{ahora()}] [ERROR] Discrepancia detectada en {etiqueta}")
+                print(f"                      -> Faltan: {contadores['faltan']} {ejemplos['faltan']}")
+                print(f"                      -> Corruptos (tamaño): {contadores['mal_tamano']} {ejemplos['mal_tamano']}")
+                print(f"                      -> Corruptos (checksum): {contadores['mal_checksum']} {ejemplos['mal_checksum']}")
+                escribir(msg)
+                con_errores.append(etiqueta)
+
+        # Guardamos la caché para que la próxima auditoría no relea lo que no cambió
+        guardar_cache(cache)
+
+        # --- GUARDAR RESUMEN PARA EL NOTEBOOK ---
+        DIR_COMPARTIDO.mkdir(parents=True, exist_ok=True)
+        ruta_resumen = DIR_COMPARTIDO / f"inventario_{resumen['alcance'] + '_' if historico else ''}dt={DT}.json"
+        ruta_resumen.write_text(json.dumps(resumen, indent=1), encoding="utf-8")
+        print(f"[{ahora()}] [OK]    Resumen guardado en disco: {ruta_resumen}")
+
+        # --- GUARDAR REPORTE ---
+        print(f"[{ahora()}] [INFO]  Generando reporte final...")
+        nombre_reporte = f"reporte_inventario_{resumen['alcance'] + '_' if historico else ''}dt={DT}.txt"
+
+        # Pasamos el reporte a HDFS en streaming, directamente desde el archivo temporal
+        # (por el puente docker equivale a 'hdfs dfs -put -f -' leyendo de la entrada estándar).
+        try:
+            reporte.flush()
+            reporte.seek(0)
+            hdfs.escribir(f"{HDFS_DIR}/{nombre_reporte}", reporte.buffer)
+
+            print(f"[{ahora()}] [OK]    Reporte guardado en HDFS: {HDFS_DIR}/{nombre_reporte}")
+
+            print("\n" + "-"*60)
+            print(f"[{ahora()}] [INFO]  VISTA PREVIA DEL REPORTE")
+            print("-"*(60))
+            reporte.seek(0)
+            for numero, linea in enumerate(reporte):
+                if numero == LINEAS_VISTA_PREVIA:
+                    print(f"... (reporte completo en {HDFS_DIR}/{nombre_reporte})")
+                    break
+                print(linea, end="")
+            print("-"*(60))
+
+        except OSError as e:
+            print(f"[{ahora()}] [FATAL] No se pudo guardar el reporte en HDFS.")
+            print(f"                      -> {e}")
+            actual().fallar(e)
     
+    if con_errores:
+        actual().fallar(ValueError(f"Discrepancias entre /data y /backup en {', '.join(con_errores)}"))
+
     print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE INVENTARIO")
     print("="*60 + "\n")
 
@@ -137,4 +616,18 @@ def inventory():
 # PUNTO DE ENTRADA
 # ---------------------------------------------------------
 if __name__ == "__main__":
-    inventory()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inventario y comparación /data vs /backup")
+    parser.add_argument("--checksum", choices=["hdfs", "sha256", "muestreo"], default=MODO_CHECKSUM,
+                        help="hdfs: getFileChecksum de HDFS | sha256: hash en streaming del contenido | "
+                             "muestreo: hash de rangos al azar en los mismos offsets")
+    parser.add_argument("--muestra-mb", type=float, default=BYTES_MUESTRA / 1024 / 1024,
+                        help="Modo muestreo: MB leídos de cada lado por archivo")
+    parser.add_argument("--semilla", type=int, default=None,
+                        help="Modo muestreo: semilla de los rangos elegidos (por defecto, distintos cada vez)")
+    parser.add_argument("--historico", action="store_true",
+                        help="Compara todo /data contra todo /backup en una sola pasada (todas las fechas)")
+    parser.add_argument("--merkle", action="store_true",
+                        help="Compara todo /data contra todo /backup por manifiestos Merkle (solo lo que cambió)")
+    args = parser.parse_args()
+    salir(inventory, modo=args.checksum, historico=args.historico, bytes_muestra=int(args.muestra_mb * 1024 * 1024),
+          semilla=args.semilla, merkle=args.merkle)
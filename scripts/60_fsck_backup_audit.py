@@ -1,7 +1,11 @@
 # Importamos las librerías necesarias
-import subprocess
+import argparse
+import os
 from datetime import datetime
 from pathlib import Path
+from contexto import Contexto
+from fsck_particiones import auditar_capa
+from trazas import tramo, etapa, salir, actual, sumar
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -27,80 +31,77 @@ DIR_COMPARTIDO = RAIZ_PROYECTO / "docker" / "clusterA" / "notebooks" / "raw_audi
 # Creamos la carpeta física si no existe (mkdir -p)
 DIR_COMPARTIDO.mkdir(parents=True, exist_ok=True)
 
-# Configuración de fecha y nombres de archivo
-DT = datetime.now().strftime('%Y-%m-%d')
+# Configuración de fecha y nombres de archivo.
+# La variable de entorno DT fija otra fecha (backfill de 90_run_all.py --desde/--hasta).
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
+# En el backfill solo se audita esa fecha (sin DT, toda la capa)
+FECHA_PARTICION = os.environ.get("DT")
 NOMBRE_ARCHIVO = f"fsck_backup_dt={DT}.txt"
 
+# Reporte estructurado (JSONL) que se genera junto al texto original
+NOMBRE_JSONL = NOMBRE_ARCHIVO.replace(".txt", ".jsonl")
+
 # Ruta completa en tu disco duro (Windows)
 RUTA_LOCAL_FINAL = DIR_COMPARTIDO / NOMBRE_ARCHIVO
+RUTA_LOCAL_JSONL = DIR_COMPARTIDO / NOMBRE_JSONL
 
 # Ruta destino dentro del sistema distribuido (HDFS)
 DESTINO_HDFS = f"/audit/fsck/dt={DT}"
 
 # ---------------------------------------------------------
-# 2. FUNCION AUXILIAR
-# ---------------------------------------------------------
-def run_silent(comando):
-    """
-    Ejecuta comandos silenciando la salida estándar (stdout) 
-    pero capturando errores (stderr) por si acaso.
-    """
-    subprocess.run(comando, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-# ---------------------------------------------------------
-# 3. FUNCIÓN PRINCIPAL DE AUDITORÍA
+# 2. FUNCIÓN PRINCIPAL DE AUDITORÍA
 # ---------------------------------------------------------
-def auditar():
+@etapa("60_fsck_backup_audit")
+def auditar(usar_cache=True, ctx=None):
 
     print(f"[{ahora()}] [INFO]  --> INICIO AUDITORÍA FSCK EN /backup | FECHA={DT}")
     print(f"[{ahora()}] [INFO]  Ruta local de evidencia: {RUTA_LOCAL_FINAL}")
 
     try:
+        # Acceso a HDFS del contexto (compartido con el resto de etapas en 90_run_all.py)
+        ctx = ctx or Contexto()
+        hdfs = ctx.hdfs
+
         # --- PASO 1: EJECUCIÓN DEL DIAGNÓSTICO (FSCK) ---
-        # Ejecutamos el comando hdfs fsck
-        # check=False Si fsck encuentra errores (corrupción), devuelve código de salida 1.
-        # No queremos que el script de Python falle si HDFS está "enfermo", queremos ver el reporte.
-        
-        fsck = subprocess.run(
-            "docker exec namenode hdfs fsck /backup -files -blocks -locations", 
-            shell=True, 
-            capture_output=True, # Capturamos el texto de respuesta en una variable
-            text=True,           # Lo tratamos como texto, no como bytes
-            check=False          # No lanzar error si fsck reporta problemas de salud
-        )
-        
-        # Guardamos el texto del reporte en una variable Python
-        reporte = fsck.stdout
-        print(f"[{ahora()}] [OK]    Diagnóstico finalizado.")
-        
+        # En lugar de un único 'fsck /backup -files -blocks -locations' sobre todo el
+        # histórico, pedimos un fsck por partición (dt=...) al NameNode, varios a la vez
+        # (fsck_particiones.py). Las particiones que no han cambiado desde su última
+        # auditoría limpia no se vuelven a auditar: su resultado sale de la caché local.
+        # Cada salida se lee en streaming, línea a línea, sin cargarla entera en memoria.
+        # Un HDFS "enfermo" (corrupción) no es un error: el estado va en el propio reporte.
+
         # --- PASO 2: GUARDADO LOCAL (PARA JUPYTER) ---
-        # Escribimos el reporte en la carpeta que Jupyter puede ver.
-        print(f"[{ahora()}] [INFO]  Guardando reporte localmente...")
-        RUTA_LOCAL_FINAL.write_text(reporte, encoding="utf-8")
+        # Los resultados de todas las particiones se unen en un solo reporte (texto
+        # original + JSONL estructurado) en la carpeta que Jupyter puede ver.
+        print(f"[{ahora()}] [INFO]  Guardando reporte localmente (texto + JSONL)...")
+        resumen, totales, particiones = auditar_capa(ctx, "/backup", RUTA_LOCAL_FINAL, RUTA_LOCAL_JSONL,
+                                                     usar_cache=usar_cache, fecha=FECHA_PARTICION)
+        sumar(archivos=totales["archivo"], bloques=totales["bloque"])
+        print(f"[{ahora()}] [METRICAS] fsck por particiones: {particiones['auditadas']} auditadas, "
+              f"{particiones['reutilizadas']} reutilizadas de la caché")
+        print(f"[{ahora()}] [OK]    Diagnóstico finalizado.")
         print(f"[{ahora()}] [OK]    Reporte fsck de /backup guardado en disco.")
         
         # --- PASO 3: SUBIDA A HDFS ---
         # Subimos el propio reporte de salud a HDFS para tener un histórico.
         print(f"[{ahora()}] [INFO]  Subiendo reporte fsck de /backup a HDFS...")
-        
-        # A. Copiamos de local -> Contenedor (/tmp)
-        run_silent(f'docker cp "{RUTA_LOCAL_FINAL}" namenode:/tmp/{NOMBRE_ARCHIVO}')
-        
-        # B. Movemos de Contenedor -> HDFS
-        # Creamos la carpeta destino primero (mkdir -p) por seguridad
-        run_silent(f"docker exec namenode hdfs dfs -mkdir -p {DESTINO_HDFS}")
-        run_silent(f"docker exec namenode hdfs dfs -put -f /tmp/{NOMBRE_ARCHIVO} {DESTINO_HDFS}/{NOMBRE_ARCHIVO}")
-        
-        # C. Limpiamos la basura del contenedor
-        # Usamos -u 0 (root) para asegurar permisos de borrado
-        run_silent(f"docker exec -u 0 namenode rm /tmp/{NOMBRE_ARCHIVO}")
+        with tramo("subida_evidencias"):
+            hdfs.crear_directorio(DESTINO_HDFS)
+
+            # Los dos reportes (texto + JSONL) suben en un solo lote:
+            # local -> contenedor (/tmp) -> HDFS, y limpieza de /tmp (ver hdfs_io.subir_varios)
+            hdfs.subir_varios([RUTA_LOCAL_FINAL, RUTA_LOCAL_JSONL], DESTINO_HDFS)
         
         # --- REPORTE FINAL ---
         print("\n" + "-"*60)
-        print(f"[{ahora()}] [OK]    Carga exitosa -> {DESTINO_HDFS}/{NOMBRE_ARCHIVO}")
+        print(f"[{ahora()}] [OK]    Carga exitosa -> {DESTINO_HDFS}/{NOMBRE_ARCHIVO} (+ {NOMBRE_JSONL})")
         print(f"[{ahora()}] [INFO]  RESUMEN DEL REPORTE GENERADO")
         print("-"*(60))
-        print(reporte) # mostramos el reporte fsck por pantalla 
+        # Mostramos solo el resumen (el detalle por bloque queda en los archivos)
+        print(f"Archivos: {totales['archivo']} (con problemas: {totales['archivo'] - totales['archivo_OK']}) | "
+              f"Bloques: {totales['bloque']} (con problemas: {totales['bloque'] - totales['bloque_OK']}) | "
+              f"Réplicas: {totales['replica']}")
+        print("\n".join(resumen.lineas))
         print("-"*(60))
         
         print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE AUDITORÍA SOBRE /backup")
@@ -108,9 +109,14 @@ def auditar():
         
     except Exception as e:
         print(f"[ERROR] Falló la auditoría: {e}")
+        actual().fallar(e)
 
 # ---------------------------------------------------------
 # PUNTO DE ENTRADA
 # ---------------------------------------------------------
 if __name__ == "__main__":
-    auditar()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Auditoría fsck de /backup por particiones")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Audita todas las particiones aunque no hayan cambiado desde la última auditoría limpia")
+    args = parser.parse_args()
+    salir(auditar, usar_cache=not args.sin_cache)
\ No newline at end of file
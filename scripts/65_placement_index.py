@@ -0,0 +1,174 @@
+# Importamos las librerías necesarias
+import argparse
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from contexto import Contexto, cargar_etapa
+from fsck_parser import parsear_fsck
+from hdfs_io import legible
+from trazas import tramo, etapa, salir, actual, sumar
+from ubicacion_bloques import IndiceUbicacion, nombres_docker
+
+# Función auxiliar (lambda) para obtener la hora exacta del momento.
+# Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN DE RUTAS Y ENTORNO
+# ---------------------------------------------------------
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+
+# Carpeta compartida con Jupyter: aquí dejan 30 y 60 sus reportes fsck en JSONL,
+# y aquí guardamos el índice y el informe de impacto.
+DIR_COMPARTIDO = RAIZ_PROYECTO / "docker" / "clusterA" / "notebooks" / "raw_audits"
+DIR_COMPARTIDO.mkdir(parents=True, exist_ok=True)
+
+# La variable de entorno DT fija otra fecha (backfill de 90_run_all.py --desde/--hasta).
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
+
+# Reportes fsck (-files -blocks -locations) de los que sale el índice: capa -> JSONL
+REPORTES_FSCK = {
+    "/data": DIR_COMPARTIDO / f"fsck_data_dt={DT}.jsonl",
+    "/backup": DIR_COMPARTIDO / f"fsck_backup_dt={DT}.jsonl",
+}
+
+# Índice bloque -> DataNodes e informe de sesgo / impacto
+RUTA_INDICE = DIR_COMPARTIDO / f"indice_bloques_dt={DT}.json"
+RUTA_INFORME = DIR_COMPARTIDO / f"impacto_nodos_dt={DT}.json"
+
+# Ruta destino dentro del sistema distribuido (HDFS)
+DESTINO_HDFS = f"/audit/ubicacion/dt={DT}"
+
+# Archivos afectados que se muestran por pantalla (el informe JSON los lleva todos)
+MAX_LISTADO = 10
+
+# ---------------------------------------------------------
+# 2. FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+def leer_jsonl(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            yield json.loads(linea)
+
+def construir_indice(hdfs):
+    """
+    Índice de /data y /backup. Lo normal es leerlo de los reportes JSONL que acaban
+    de escribir 30 y 60 (el NameNode no trabaja otra vez). Si falta el de una capa,
+    se pide su fsck directamente y se lee en streaming.
+    """
+    indice = IndiceUbicacion(fecha=DT, nombres=nombres_docker())
+    for capa, reporte in REPORTES_FSCK.items():
+        if reporte.exists():
+            print(f"[{ahora()}] [INFO]  {capa}: bloques del reporte fsck {reporte.name}")
+            indice.añadir_registros(leer_jsonl(reporte))
+            indice.fuentes.append(reporte.name)
+        else:
+            print(f"[{ahora()}] [WARN]  {capa}: no hay reporte {reporte.name}, se pide fsck -locations al NameNode")
+            with hdfs.fsck(capa) as lineas:
+                indice.añadir_registros(parsear_fsck(lineas))
+            indice.fuentes.append(f"fsck {capa}")
+    return indice
+
+def mostrar_sesgo(sesgo):
+    print(f"{'NODO':<40} {'BLOQUES':>8} {'TAMAÑO':>10} {'VS MEDIA':>9}")
+    for n in sesgo["nodos"]:
+        print(f"{n['nodo']:<40} {n['bloques']:>8} {legible(n['bytes']):>10} {n['desviacion']:>+8.0%}")
+    print(f"Media: {sesgo['media_bloques']:.1f} bloques por nodo | Coeficiente de variación: {sesgo['coef_variacion']:.2f}")
+
+def mostrar_impacto(impacto):
+    print(f"Bloques con réplica en esos nodos: {impacto['bloques_afectados']}")
+    print(f"  -> Perdidos (sin ninguna réplica viva): {impacto['bloques_perdidos']} "
+          f"({legible(impacto['bytes_perdidos'])}) en {len(impacto['archivos_perdidos'])} archivos")
+    print(f"  -> Sub-replicados: {impacto['bloques_subreplicados']} "
+          f"({impacto['bloques_una_replica']} con una sola réplica) en {len(impacto['archivos_subreplicados'])} archivos")
+    for estado, clave in (("MISSING", "archivos_perdidos"), ("UNDER_REPLICATED", "archivos_subreplicados")):
+        for ruta in impacto[clave][:MAX_LISTADO]:
+            print(f"     {estado:<16} {ruta}")
+        if len(impacto[clave]) > MAX_LISTADO:
+            print(f"     ... y {len(impacto[clave]) - MAX_LISTADO} más (ver {RUTA_INFORME.name})")
+
+# ---------------------------------------------------------
+# 3. FUNCIÓN PRINCIPAL
+# ---------------------------------------------------------
+@etapa("65_placement_index")
+def indexar(caen=None, ruta_indice=None, ctx=None):
+    """
+    Construye (o carga, con 'ruta_indice') el índice de ubicación de bloques y
+    predice el impacto de que caigan los nodos 'caen' (por defecto, los que apaga 70).
+    """
+    print(f"[{ahora()}] [INFO]  --> INICIO ÍNDICE DE UBICACIÓN DE BLOQUES | FECHA={DT}")
+    caen = caen or cargar_etapa("70_incident_simulation.py").NODOS_A_PARAR.split()
+
+    try:
+        ctx = ctx or Contexto()
+
+        # --- PASO 1: ÍNDICE BLOQUE -> NODOS ---
+        with tramo("indice") as paso:
+            if ruta_indice:
+                print(f"[{ahora()}] [INFO]  Cargando índice ya construido: {ruta_indice}")
+                indice = IndiceUbicacion.cargar(ruta_indice)
+            else:
+                indice = construir_indice(ctx.hdfs)
+                indice.guardar(RUTA_INDICE)
+            paso.atributos.update(bloques=len(indice.bloques), nodos=len(indice.nodos))
+        sumar(bloques=len(indice.bloques))
+        print(f"[{ahora()}] [OK]    Índice: {len(indice.bloques):,} bloques de {len(indice.rutas):,} archivos "
+              f"en {len(indice.nodos)} nodos ({paso.segundos:.2f} s)")
+
+        # --- PASO 2: REPARTO DE BLOQUES ENTRE NODOS ---
+        print("\n" + "-"*60)
+        print(f"[{ahora()}] [INFO]  REPARTO DE BLOQUES POR NODO")
+        print("-"*(60))
+        sesgo = indice.sesgo()
+        mostrar_sesgo(sesgo)
+
+        print(f"\n[{ahora()}] [INFO]  Orden de drenaje sugerido (primero los nodos cuya caída haría más daño):")
+        orden = indice.orden_drenaje()
+        for i, n in enumerate(orden, 1):
+            print(f"  {i}. {n['nodo']:<40} perdería {n['bloques_perdidos']} bloques, "
+                  f"{n['bloques_una_replica']} quedarían con una réplica ({n['bloques']} bloques)")
+
+        # --- PASO 3: PREDICCIÓN DEL FALLO ---
+        print("\n" + "-"*60)
+        print(f"[{ahora()}] [INFO]  PREDICCIÓN: CAÍDA SIMULTÁNEA DE {' '.join(caen)}")
+        print("-"*(60))
+        with tramo("prediccion", nodos=" ".join(caen)) as paso:
+            try:
+                impacto = indice.impacto(caen)
+            except ValueError as e:
+                print(f"[{ahora()}] [WARN]  {e}")
+                impacto = None
+            else:
+                paso.atributos.update({k: v for k, v in impacto.items() if not isinstance(v, list)})
+        if impacto:
+            mostrar_impacto(impacto)
+            print(f"[{ahora()}] [METRICAS] Predicción calculada en {paso.segundos * 1000:.1f} ms")
+
+        # --- PASO 4: GUARDADO Y SUBIDA A HDFS ---
+        with open(RUTA_INFORME, "w", encoding="utf-8") as f:
+            json.dump({"fecha": DT, "fuentes": indice.fuentes, "sesgo": sesgo, "orden_drenaje": orden,
+                       "prediccion": impacto}, f, indent=2, ensure_ascii=False)
+        with tramo("subida_evidencias"):
+            ctx.hdfs.crear_directorio(DESTINO_HDFS)
+            ctx.hdfs.subir_varios([RUTA_INFORME] + ([] if ruta_indice else [RUTA_INDICE]), DESTINO_HDFS)
+        print(f"\n[{ahora()}] [OK]    Índice e informe guardados -> {DESTINO_HDFS} (y en {DIR_COMPARTIDO.name})")
+
+    except Exception as e:
+        print(f"[{ahora()}] [ERROR] Falló el índice de ubicación de bloques: {e}")
+        actual().fallar(e)
+
+    print(f"[{ahora()}] [INFO]  --> FIN DEL ÍNDICE DE UBICACIÓN DE BLOQUES")
+    print("="*60 + "\n")
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice bloque -> DataNodes y predicción del impacto de una caída")
+    parser.add_argument("--caen", nargs="+", default=None,
+                        help="Nodos que caen (nombre del contenedor, ip o ip:puerto); por defecto los que apaga 70")
+    parser.add_argument("--indice", default=None,
+                        help="Responde con un índice ya construido (indice_bloques_dt=....json) sin leer los fsck")
+    args = parser.parse_args()
+    salir(indexar, caen=args.caen, ruta_indice=args.indice)
@@ -1,7 +1,12 @@
 # Importamos las librerías necesarias
 import subprocess
+import threading
 import time
 from datetime import datetime
+from contexto import Contexto, cargar_etapa
+from salud_cluster import esperar_estado
+from trazas import tramo, etapa, salir, propagar, EtapaFallida
+from ubicacion_bloques import IndiceUbicacion
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -13,74 +18,121 @@ ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 # Definimos los datanodes que vamos a tirar: los nombres exactos de los contenedores Docker que vamos a apagar.
 NODOS_A_PARAR = "clustera-dnnm-1 clustera-dnnm-2"
 
-print(f"[{ahora()}] [INFO]  --> INICIO SIMULACION DE FALLO")
+# Tiempo máximo que esperamos a que el NameNode refleje el fallo.
+# Ya no es una espera fija: salimos en cuanto el JMX muestra los nodos como muertos.
+TIEMPO_MAXIMO = 900 # 15 minutos
 
 # ---------------------------------------------------------
-# 2. EJECUCIÓN PARALELA (INGESTA)
+# FUNCIÓN PRINCIPAL DE LA SIMULACIÓN
 # ---------------------------------------------------------
-# - subprocess.run: Bloquea el script hasta que el comando termina.
-# - subprocess.Popen: Lanza el comando "en segundo plano" y deja que este script continúe inmediatamente.
-# Necesitamos esto para poder apagar los servidores MIENTRAS se están escribiendo datos.
-print(f"[{ahora()}] [INFO]  1. Arrancando ingesta de datos en segundo plano...")
-proceso_ingesta = subprocess.Popen("python ./20_ingest_hdfs.py", shell=True)
+@etapa("70_incident_simulation")
+def simular_fallo(ctx=None):
+    # Si nos llama 90_run_all.py recibimos su contexto (conexiones ya abiertas)
+    ctx = ctx or Contexto()
 
-# ---------------------------------------------------------
-# 3. VENTANA DE TIEMPO
-# ---------------------------------------------------------
-# Esperamos 5 segundos.
-# Esto da tiempo a que el script de ingesta conecte con HDFS y empiece a enviar paquetes de datos.
-print(f"[{ahora()}] [INFO]     Esperando 5s a que empiece el flujo de datos...")
-time.sleep(5)
+    print(f"[{ahora()}] [INFO]  --> INICIO SIMULACION DE FALLO")
 
-# ---------------------------------------------------------
-# 4. EL SABOTAJE (SIMULACIÓN DE CAÍDA)
-# ---------------------------------------------------------
-# Ejecutamos 'docker stop'. Esto detiene los contenedores seleccionados anteriormente.
-print(f"[{ahora()}] [WARN]  2. EJECUTANDO SABOTAJE: APAGANDO NODOS")
-print(f"[{ahora()}] [WARN]      Objetivos: {NODOS_A_PARAR}")
+    # Con el backend local no hay contenedores que apagar/arrancar ni JMX que sondear
+    if ctx.local:
+        print(f"[{ahora()}] [WARN]  Backend local ({ctx.raiz_local}): sin clúster, se omite esta etapa.")
+        return
 
-subprocess.run(f"docker stop {NODOS_A_PARAR}", shell=True)
+    # Antes de apagar nada: lo que predice el índice de ubicación de bloques de 65
+    # para esta misma caída, para contrastarlo con el fsck del final.
+    indexado = cargar_etapa("65_placement_index.py")
+    if indexado.RUTA_INDICE.exists():
+        print(f"[{ahora()}] [INFO]  0. Predicción del índice de bloques ({indexado.RUTA_INDICE.name}):")
+        with tramo("prediccion", nodos=NODOS_A_PARAR) as prediccion:
+            try:
+                impacto = IndiceUbicacion.cargar(indexado.RUTA_INDICE).impacto(NODOS_A_PARAR.split())
+            except ValueError as e:
+                print(f"[{ahora()}] [WARN]      {e}")
+            else:
+                prediccion.atributos.update({k: v for k, v in impacto.items() if not isinstance(v, list)})
+                indexado.mostrar_impacto(impacto)
 
-print(f"[{ahora()}] [WARN]      Nodos detenidos.")
+    # ---------------------------------------------------------
+    # 2. EJECUCIÓN PARALELA (INGESTA)
+    # ---------------------------------------------------------
+    # Importamos la etapa de ingesta (20) como módulo y la lanzamos en un hilo:
+    # - Llamar a la función directamente bloquearía este script hasta que la ingesta termine.
+    # - Un hilo la ejecuta "en segundo plano" y deja que este script continúe inmediatamente.
+    # Necesitamos esto para poder apagar los servidores MIENTRAS se están escribiendo datos.
+    # Al ser el mismo proceso no arrancamos otro intérprete de Python y la ingesta
+    # comparte el contexto (acceso a HDFS) de esta etapa. Con propagar() su tramo
+    # queda anidado dentro del de la simulación en la traza.
+    print(f"[{ahora()}] [INFO]  1. Arrancando ingesta de datos en segundo plano...")
+    ingesta = cargar_etapa("20_ingest_hdfs.py")
 
-# ---------------------------------------------------------
-# 5. SINCRONIZACIÓN
-# ---------------------------------------------------------
-# Ahora usamos .wait().
-# Esto le dice a Python: "Espera hasta que el proceso de ingesta termine".
-# La ingesta probablemente terminará con errores o timeouts debido al apagón.
-print(f"[{ahora()}] [INFO]  3. Esperando reacción del script de ingesta...")
-proceso_ingesta.wait()
+    def ingestar_durante_fallo():
+        # Aquí el fallo de la ingesta es el resultado esperado del sabotaje, no un error de esta etapa
+        try:
+            ingesta.ingestar(ctx=ctx)
+        except EtapaFallida as e:
+            print(f"[{ahora()}] [WARN]      La ingesta ha fallado durante el apagón (esperado) -> {e}")
 
-# ---------------------------------------------------------
-# 6. FASE DE ESPERA
-# ---------------------------------------------------------
-# Hadoop tarda un tiempo en reflejar en la auditoria fsck lo que está ocurriendo.
-# Damos 600 segundos (10 minutos) para asegurar que este proceso termine.
-TIEMPO_ESPERA = 600 # 10 minutos
-    
-print(f"[{ahora()}] [INFO]  4. Iniciando periodo de espera...")
-print(f"[{ahora()}] [WARN]      Esperando {TIEMPO_ESPERA} segundos ({TIEMPO_ESPERA//60} min) para reflejar el fallo en la auditoria.")
-print(f"[{ahora()}] [INFO]      (El NameNode está procesando el fallo..)")
-    
-    # Barra de progreso sencilla para no parecer que se ha colgado
-    # Dividimos la espera en bloques de 1 minuto para dar feedback
-for i in range(TIEMPO_ESPERA // 60):
-    time.sleep(60)
-    min_restantes = (TIEMPO_ESPERA // 60) - (i + 1)
-    print(f"[{ahora()}] [PROG]      ... Sistema procesando. Restan {min_restantes} min...")
-
-print(f"[{ahora()}] [OK]    Tiempo de espera finalizado.")
+    hilo_ingesta = threading.Thread(target=propagar(ingestar_durante_fallo), name="ingesta")
+    hilo_ingesta.start()
 
-# ---------------------------------------------------------
-# 7. AUDITORÍA FSCK
-# ---------------------------------------------------------
-# Una vez que todo ha terminado, lanzamos la auditoría.
-print("\n" + "-"*60)
-print(f"[{ahora()}] [INFO]  5. INICIANDO AUDITORÍA FSCK")
-print("-"*(60))
+    # ---------------------------------------------------------
+    # 3. VENTANA DE TIEMPO
+    # ---------------------------------------------------------
+    # Esperamos 5 segundos.
+    # Esto da tiempo a que el script de ingesta conecte con HDFS y empiece a enviar paquetes de datos.
+    print(f"[{ahora()}] [INFO]     Esperando 5s a que empiece el flujo de datos...")
+    time.sleep(5)
 
-subprocess.run("python ./30_fsck_data_audit.py", shell=True)
+    # ---------------------------------------------------------
+    # 4. EL SABOTAJE (SIMULACIÓN DE CAÍDA)
+    # ---------------------------------------------------------
+    # Ejecutamos 'docker stop'. Esto detiene los contenedores seleccionados anteriormente.
+    print(f"[{ahora()}] [WARN]  2. EJECUTANDO SABOTAJE: APAGANDO NODOS")
+    print(f"[{ahora()}] [WARN]      Objetivos: {NODOS_A_PARAR}")
 
-print(f"[{ahora()}] [INFO]  --> FIN DE LA SIMULACIÓN DE FALLO")
-print("="*60 + "\n")
\ No newline at end of file
+    subprocess.run(f"docker stop {NODOS_A_PARAR}", shell=True)
+
+    print(f"[{ahora()}] [WARN]      Nodos detenidos.")
+
+    # ---------------------------------------------------------
+    # 5. SINCRONIZACIÓN
+    # ---------------------------------------------------------
+    # Ahora usamos .join().
+    # Esto le dice a Python: "Espera hasta que el hilo de ingesta termine".
+    # La ingesta probablemente terminará con errores o timeouts debido al apagón.
+    print(f"[{ahora()}] [INFO]  3. Esperando reacción del script de ingesta...")
+    hilo_ingesta.join()
+
+    # ---------------------------------------------------------
+    # 6. FASE DE ESPERA (ADAPTATIVA)
+    # ---------------------------------------------------------
+    # Hadoop tarda un tiempo en reflejar en la auditoria fsck lo que está ocurriendo:
+    # el NameNode solo declara muerto un DataNode tras varios minutos sin latidos.
+    # En lugar de esperar siempre 10 minutos, sondeamos su JMX y seguimos en cuanto
+    # los nodos apagados aparecen como muertos (o se agota TIEMPO_MAXIMO).
+    print(f"[{ahora()}] [INFO]  4. Esperando a que el fallo sea visible en el NameNode...")
+    print(f"[{ahora()}] [INFO]      (El NameNode está procesando el fallo..)")
+
+    # El tramo de la espera guarda cuánto tardó el NameNode en ver el fallo
+    with tramo("espera_fallo_visible") as espera:
+        alcanzado, _ = esperar_estado("fallo_visible", nodos_caidos=len(NODOS_A_PARAR.split()),
+                                      tiempo_maximo=TIEMPO_MAXIMO, nombre_evidencia="salud_fallo", sesion=ctx.sesion)
+        espera.atributos["alcanzado"] = alcanzado
+
+    # ---------------------------------------------------------
+    # 7. AUDITORÍA FSCK
+    # ---------------------------------------------------------
+    # Una vez que todo ha terminado, lanzamos la auditoría.
+    print("\n" + "-"*60)
+    print(f"[{ahora()}] [INFO]  5. INICIANDO AUDITORÍA FSCK")
+    print("-"*(60))
+
+    cargar_etapa("30_fsck_data_audit.py").auditar(ctx=ctx)
+
+    print(f"[{ahora()}] [INFO]  --> FIN DE LA SIMULACIÓN DE FALLO")
+    print("="*60 + "\n")
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    salir(simular_fallo)
@@ -1,7 +1,9 @@
 # Importamos las librerías necesarias
 import subprocess
-import time
 from datetime import datetime
+from contexto import Contexto, cargar_etapa
+from salud_cluster import esperar_estado
+from trazas import tramo, etapa, salir
 
 # Función auxiliar (lambda) para obtener la hora exacta del momento.
 # Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
@@ -14,52 +16,71 @@ ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 # Es vital que sean los mismos para comprobar si el clúster recupera su estado original.
 NODOS = "clustera-dnnm-1 clustera-dnnm-2"
 
-print(f"[{ahora()}] [INFO]  --> INICIO RECUPERACIÓN DE SERVICIO (SELF-HEALING TEST)")
+# Tiempo máximo que esperamos a que el clúster se recupere.
+# Ya no es una espera fija: salimos en cuanto el JMX muestra el clúster sano.
+TIEMPO_MAXIMO = 900 # 15 minutos
 
 # ---------------------------------------------------------
-# 2. RESURRECCIÓN DE LA INFRAESTRUCTURA
+# FUNCIÓN PRINCIPAL DE LA RECUPERACIÓN
 # ---------------------------------------------------------
-# Usamos 'docker start' para encender de nuevo los contenedores apagados.
-print(f"[{ahora()}] [INFO]  1. Ejecutando arranque de emergencia en nodos caídos...")
+@etapa("80_recovery_restore")
+def recuperar(ctx=None):
+    # Si nos llama 90_run_all.py recibimos su contexto (conexiones ya abiertas)
+    ctx = ctx or Contexto()
 
-subprocess.run(f"docker start {NODOS}", shell=True)
+    print(f"[{ahora()}] [INFO]  --> INICIO RECUPERACIÓN DE SERVICIO (SELF-HEALING TEST)")
 
-# ---------------------------------------------------------
-# 3. FASE DE AUTOCURACIÓN (ESPERA PASIVA)
-# ---------------------------------------------------------
-# Hadoop tarda un tiempo en estabilizarse.
-# 1. Los DataNodes arrancan e informan al NameNode.
-# 2. El NameNode recibe el "Heartbeat" y ve que están vivos.
-# 3. Los DataNodes envían un "Block Report" (lista de datos que tienen).
-# 4. El NameNode re-balancea el sistema.
-#
-# Damos 600 segundos (10 minutos) para asegurar que este proceso termine.
-TIEMPO_ESPERA = 600 # 10 minutos
-    
-print(f"[{ahora()}] [INFO]  2. Iniciando periodo de estabilización...")
-print(f"[{ahora()}] [WARN]      Esperando {TIEMPO_ESPERA} segundos ({TIEMPO_ESPERA//60} min) para replicación de bloques.")
-print(f"[{ahora()}] [INFO]      (El NameNode está procesando 'Block Reports' y re-balanceando...)")
-    
-    # Barra de progreso sencilla para no parecer que se ha colgado
-    # Dividimos la espera en bloques de 1 minuto para dar feedback
-for i in range(TIEMPO_ESPERA // 60):
-    time.sleep(60)
-    min_restantes = (TIEMPO_ESPERA // 60) - (i + 1)
-    print(f"[{ahora()}] [PROG]      ... Sistema recuperándose. Restan {min_restantes} min...")
+    # Con el backend local no hay contenedores que apagar/arrancar ni JMX que sondear
+    if ctx.local:
+        print(f"[{ahora()}] [WARN]  Backend local ({ctx.raiz_local}): sin clúster, se omite esta etapa.")
+        return
 
-print(f"[{ahora()}] [OK]    Tiempo de espera finalizado.")
+    # ---------------------------------------------------------
+    # 2. RESURRECCIÓN DE LA INFRAESTRUCTURA
+    # ---------------------------------------------------------
+    # Usamos 'docker start' para encender de nuevo los contenedores apagados.
+    print(f"[{ahora()}] [INFO]  1. Ejecutando arranque de emergencia en nodos caídos...")
 
-# ---------------------------------------------------------
-# 4. VERIFICACIÓN FINAL
-# ---------------------------------------------------------
-# Volvemos a lanzar el comando FSCK.
-# Si la prueba ha sido un éxito, el reporte debería decir "Status: HEALTHY"
-# y "Missing blocks: 0".
-print("\n" + "-"*60)
-print(f"[{ahora()}] [INFO]  3. AUDITORÍA FINAL DE CONFIRMACIÓN (FSCK)")
-print("-"*(60))
+    subprocess.run(f"docker start {NODOS}", shell=True)
+
+    # ---------------------------------------------------------
+    # 3. FASE DE AUTOCURACIÓN (ESPERA ADAPTATIVA)
+    # ---------------------------------------------------------
+    # Hadoop tarda un tiempo en estabilizarse.
+    # 1. Los DataNodes arrancan e informan al NameNode.
+    # 2. El NameNode recibe el "Heartbeat" y ve que están vivos.
+    # 3. Los DataNodes envían un "Block Report" (lista de datos que tienen).
+    # 4. El NameNode re-balancea el sistema.
+    #
+    # En lugar de esperar siempre 10 minutos, sondeamos el JMX del NameNode y seguimos
+    # en cuanto no quedan nodos muertos ni bloques perdidos o sub-replicados.
+    print(f"[{ahora()}] [INFO]  2. Esperando a que el clúster se estabilice...")
+    print(f"[{ahora()}] [INFO]      (El NameNode está procesando 'Block Reports' y re-balanceando...)")
 
-subprocess.run("python ./30_fsck_data_audit.py", shell=True)
+    # El tramo de la espera guarda cuánto tardó la auto-curación
+    with tramo("espera_sano") as espera:
+        alcanzado, _ = esperar_estado("sano", tiempo_maximo=TIEMPO_MAXIMO, nombre_evidencia="salud_recuperacion",
+                                      sesion=ctx.sesion)
+        espera.atributos["alcanzado"] = alcanzado
 
-print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE RECUPERACIÓN")
-print("="*60 + "\n")
\ No newline at end of file
+    # ---------------------------------------------------------
+    # 4. VERIFICACIÓN FINAL
+    # ---------------------------------------------------------
+    # Volvemos a lanzar el comando FSCK.
+    # Si la prueba ha sido un éxito, el reporte debería decir "Status: HEALTHY"
+    # y "Missing blocks: 0".
+    print("\n" + "-"*60)
+    print(f"[{ahora()}] [INFO]  3. AUDITORÍA FINAL DE CONFIRMACIÓN (FSCK)")
+    print("-"*(60))
+
+    # (la etapa 30 se importa como módulo: sin arrancar otro intérprete de Python)
+    cargar_etapa("30_fsck_data_audit.py").auditar(ctx=ctx)
+
+    print(f"[{ahora()}] [INFO]  --> FIN DEL PROCESO DE RECUPERACIÓN")
+    print("="*60 + "\n")
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    salir(recuperar)
@@ -1,40 +1,448 @@
 # Importamos las librerías necesarias
+import argparse
+import inspect
+import json
+import os
 import subprocess
+import threading
 import time
+import traceback
 import sys
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timedelta
+from functools import partial
+from pathlib import Path
+from contexto import Contexto, cargar_etapa
+from salud_cluster import esperar_estado
+import trazas
+from trazas import tramo, propagar, EtapaFallida
 
 # Detectar comando de python según el sistema (python o python3)
 PYTHON_CMD = sys.executable
 
-SCRIPTS = [
-    "00_bootstrap.py",
-    "10_generate_data.py",
-    "20_ingest_hdfs.py",
-    "30_fsck_data_audit.py",
-    "40_backup_copy.py",
-    "50_inventory_compare.py",
-    "60_fsck_backup_audit.py",
-    "70_incident_simulation.py",
-    "80_recovery_restore.py"
-]
-
-def main():
-    print("--- ESPERANDO A QUE SE DESPLIEGUE CORRECTAMENTE EL SISTEMA HADOOP DOCKERIZADO ---")
-    time.sleep(10)
-    print("--- INICIANDO PIPELINE COMPLETO ---")
-    
-    for script in SCRIPTS:
+# Carpeta de los scripts (así el orquestador funciona desde cualquier directorio)
+DIR_SCRIPTS = Path(__file__).resolve().parent
+
+# ---------------------------------------------------------
+# 1. GRAFO DE DEPENDENCIAS (DAG)
+# ---------------------------------------------------------
+# Cada etapa declara de qué etapas depende. Una etapa arranca en cuanto todas
+# sus dependencias han terminado bien, así las que son independientes se solapan:
+#   - 00 (HDFS) y 10 (datos locales) no dependen entre sí.
+#   - La auditoría fsck de /data (30) puede correr a la vez que el backup (40) y que
+#     el curado a Parquet (25), que solo lee /data y escribe en /curated.
+#   - Tras el backup, el inventario (50) y la auditoría de /backup (60) van en paralelo.
+#   - La simulación de caída (70) apaga nodos: espera a que terminen todas las auditorías.
+# El orden del diccionario es un orden válido de ejecución (topológico).
+ETAPAS = {
+    "00_bootstrap.py": [],
+    "10_generate_data.py": [],
+    "20_ingest_hdfs.py": ["00_bootstrap.py", "10_generate_data.py"],
+    "25_curate_parquet.py": ["20_ingest_hdfs.py"],
+    "30_fsck_data_audit.py": ["20_ingest_hdfs.py"],
+    "40_backup_copy.py": ["20_ingest_hdfs.py"],
+    "50_inventory_compare.py": ["40_backup_copy.py"],
+    "60_fsck_backup_audit.py": ["40_backup_copy.py"],
+    "65_placement_index.py": ["30_fsck_data_audit.py", "60_fsck_backup_audit.py"],
+    "70_incident_simulation.py": ["25_curate_parquet.py", "30_fsck_data_audit.py", "50_inventory_compare.py",
+                                  "60_fsck_backup_audit.py", "65_placement_index.py"],
+    "80_recovery_restore.py": ["70_incident_simulation.py"],
+}
+
+# Función que expone cada script para ejecutarlo importado (modo "interno")
+FUNCIONES = {
+    "00_bootstrap.py": "crear_directorios_hdfs",
+    "10_generate_data.py": "generar_datos",
+    "20_ingest_hdfs.py": "ingestar",
+    "25_curate_parquet.py": "curar",
+    "30_fsck_data_audit.py": "auditar",
+    "40_backup_copy.py": "backup",
+    "50_inventory_compare.py": "inventory",
+    "60_fsck_backup_audit.py": "auditar",
+    "65_placement_index.py": "indexar",
+    "70_incident_simulation.py": "simular_fallo",
+    "80_recovery_restore.py": "recuperar",
+}
+
+# MODO_EJECUCION:
+#   "interno" -> Cada etapa se importa y se llama como función dentro de este mismo
+#                proceso. Todas comparten un Contexto (cliente WebHDFS y sesión HTTP),
+#                y cada librería pesada (polars, faker, numpy, requests) se importa una sola vez,
+#                cuando la primera etapa que la usa arranca.
+#   "proceso" -> Cada etapa se lanza como un intérprete de Python independiente
+#                (aislamiento total, pero cada una paga su arranque, imports y conexión).
+MODO_EJECUCION = "interno"
+
+# Número máximo de etapas ejecutándose a la vez
+MAX_PARALELO = 3
+
+# Tiempo máximo esperando a que el clúster esté listo antes de empezar
+TIEMPO_MAXIMO_ARRANQUE = 300
+
+# BACKFILL (--desde/--hasta): Reprocesa un rango de fechas pasadas.
+#   ETAPAS_BACKFILL     -> Etapas que se ejecutan por fecha: sin la simulación de caída
+#                          (70) ni la recuperación (80), que no dependen del día.
+#   MAX_FECHAS_PARALELO -> Fechas procesándose a la vez (--paralelo-fechas); cada una
+#                          ejecuta a su vez hasta MAX_PARALELO etapas en paralelo.
+#   MARCA_BACKFILL      -> Marca que se escribe cuando todas las etapas de una fecha
+#                          terminan bien: al relanzar el rango, esas fechas se saltan.
+ETAPAS_BACKFILL = [s for s in ETAPAS if s not in ("70_incident_simulation.py", "80_recovery_restore.py")]
+MAX_FECHAS_PARALELO = 2
+MARCA_BACKFILL = "/audit/backfill/dt={fecha}/_SUCCESS"
+
+# Evita que las líneas de dos etapas paralelas se mezclen a mitad.
+# Reentrante: en modo "interno" el propio print() vuelve a tomarlo (SalidaEtiquetada).
+cerrojo_salida = threading.RLock()
+
+# ---------------------------------------------------------
+# 2. EJECUCIÓN DE UNA ETAPA
+# ---------------------------------------------------------
+def ejecutar_etapa(script, inicio_pipeline, ctx=None, fecha=None):
+    """
+    Lanza un script y reenvía su salida en directo, con el número de etapa delante
+    para distinguir las etapas que corren en paralelo.
+    Con 'fecha' (backfill) la etapa trabaja sobre ese día (variable DT) y la fecha
+    también va en la etiqueta.
+    Devuelve (ok, segundo de inicio, segundo de fin) relativos al inicio del pipeline.
+    """
+    etiqueta = f"{fecha} {script[:2]}" if fecha else script[:2]
+    inicio = time.perf_counter() - inicio_pipeline
+    with cerrojo_salida:
+        print(f"\n>>> EJECUTANDO: {script}" + (f" (dt={fecha})" if fecha else ""))
+
+    # La etapa hereda la traza del pipeline: sus tramos cuelgan del tramo "pipeline"
+    entorno = {**os.environ, "TRAZA_ID": trazas.TRAZA}
+    if trazas.actual():
+        entorno["TRAZA_PADRE"] = trazas.actual().id
+    if fecha:
+        entorno["DT"] = fecha
+
+    # -u: salida sin buffer, para ver cada línea según se produce
+    proceso = subprocess.Popen([PYTHON_CMD, "-u", f"./{script}"], cwd=DIR_SCRIPTS, env=entorno,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8")
+    for linea in proceso.stdout:
+        with cerrojo_salida:
+            print(f"[{etiqueta}] {linea}", end="")
+    ok = proceso.wait() == 0
+    return ok, inicio, time.perf_counter() - inicio_pipeline
+
+class SalidaEtiquetada:
+    """
+    Sustituye a sys.stdout en el modo "interno": cada hilo de etapa tiene su
+    etiqueta ([20], [30]...) y sus líneas salen enteras y con la etiqueta delante,
+    igual que cuando cada etapa era un proceso aparte. Los hilos auxiliares que
+    lanzan las propias etapas (pools de subida, ingesta de 70...) escriben sin etiqueta.
+    """
+    def __init__(self, original):
+        self.original = original
+        self.local = threading.local()
+
+    def etiquetar(self, etiqueta):
+        self.local.etiqueta = etiqueta
+        self.local.pendiente = ""
+
+    def write(self, texto):
+        etiqueta = getattr(self.local, "etiqueta", None)
+        if etiqueta is None:
+            with cerrojo_salida:
+                return self.original.write(texto)
+        self.local.pendiente += texto
+        *lineas, self.local.pendiente = self.local.pendiente.split("\n")
+        if lineas:
+            with cerrojo_salida:
+                self.original.write("".join(f"[{etiqueta}] {linea}\n" for linea in lineas))
+        return len(texto)
+
+    def vaciar(self):
+        if getattr(self.local, "pendiente", ""):
+            self.write("\n")
+        self.local.etiqueta = None
+
+    def flush(self):
+        self.original.flush()
+
+    def __getattr__(self, nombre):
+        return getattr(self.original, nombre)
+
+def ejecutar_etapa_interna(script, inicio_pipeline, ctx):
+    """
+    Ejecuta una etapa importando su script y llamando a su función principal (FUNCIONES).
+    Si la función acepta 'ctx', recibe el contexto compartido del pipeline.
+    Una excepción no capturada o un tramo de la etapa marcado como fallido (EtapaFallida)
+    cuentan como fallo, igual que un código de salida distinto de 0.
+    Devuelve (ok, segundo de inicio, segundo de fin) relativos al inicio del pipeline.
+    """
+    inicio = time.perf_counter() - inicio_pipeline
+    with cerrojo_salida:
         print(f"\n>>> EJECUTANDO: {script}")
-        try:
-            # check=True detiene todo si un script falla
-            subprocess.run([PYTHON_CMD, f"./{script}"], check=True)
-            time.sleep(1) # Pequeña pausa visual
-        except subprocess.CalledProcessError:
-            print(f"!!! ERROR CRÍTICO EN {script}. DETENIENDO PIPELINE.")
-            break
-            
+
+    salida = sys.stdout
+    salida.etiquetar(script[:2])
+    try:
+        funcion = getattr(cargar_etapa(script), FUNCIONES[script])
+        if "ctx" in inspect.signature(funcion).parameters:
+            funcion(ctx=ctx)
+        else:
+            funcion()
+        ok = True
+    except EtapaFallida as e:
+        print(f"!!! ETAPA FALLIDA: {e}")
+        ok = False
+    except Exception:
+        print(traceback.format_exc(), end="")
+        ok = False
+    finally:
+        salida.vaciar()
+    return ok, inicio, time.perf_counter() - inicio_pipeline
+
+# ---------------------------------------------------------
+# 3. INFORME DE RUTA CRÍTICA
+# ---------------------------------------------------------
+def ruta_critica(tiempos):
+    """
+    Cadena de dependencias cuya suma de duraciones es la más larga: es la que
+    marca el tiempo total del pipeline (acelerar otra etapa no lo reduce).
+    Devuelve (lista de etapas, segundos).
+    """
+    mejor = {}
+    for script, dependencias in ETAPAS.items():
+        if script not in tiempos:
+            continue
+        inicio, fin = tiempos[script]
+        previa = max((d for d in dependencias if d in mejor), key=lambda d: mejor[d][1], default=None)
+        cadena, acumulado = mejor[previa] if previa else ([], 0.0)
+        mejor[script] = (cadena + [script], acumulado + (fin - inicio))
+    return max(mejor.values(), key=lambda x: x[1], default=([], 0.0))
+
+def informe(tiempos, estados, total):
+    print("\n" + "-"*60)
+    print("--- INFORME DE TIEMPOS ---")
+    print("-"*(60))
+    print(f"{'ETAPA':<28} {'ESTADO':<8} {'INICIO':>8} {'FIN':>8} {'DURACIÓN':>9}")
+    for script in ETAPAS:
+        if script in tiempos:
+            inicio, fin = tiempos[script]
+            print(f"{script:<28} {estados[script]:<8} {inicio:>7.1f}s {fin:>7.1f}s {fin - inicio:>8.1f}s")
+        else:
+            print(f"{script:<28} {estados.get(script, 'OMITIDA'):<8}")
+
+    cadena, segundos = ruta_critica(tiempos)
+    suma = sum(fin - inicio for inicio, fin in tiempos.values())
+    print(f"\nRuta crítica ({segundos:.1f} s): {' -> '.join(s[:2] for s in cadena)}")
+    print(f"Tiempo total: {total:.1f} s | Suma de etapas: {suma:.1f} s | Ahorro por paralelismo: {suma - total:.1f} s")
+
+# ---------------------------------------------------------
+# 4. PLANIFICADOR
+# ---------------------------------------------------------
+def main(max_paralelo=MAX_PARALELO, modo=MODO_EJECUCION, backend=None, puerto_metricas=None, streaming=False,
+         codec=None, desde=None, hasta=None, max_fechas=MAX_FECHAS_PARALELO, forzar=False):
+    # El backend de HDFS se pasa por variable de entorno: así lo heredan también
+    # las etapas lanzadas como procesos independientes (modo "proceso").
+    if backend:
+        os.environ["HDFS_BACKEND"] = backend
+    # Igual con la ingesta en streaming: la propia 20 genera los datos y los sube
+    if streaming:
+        os.environ["MODO_INGESTA"] = "streaming"
+    # Y con el códec de compresión de la ingesta (20) y del backup (40)
+    if codec:
+        os.environ["CODEC_COMPRESION"] = codec
+    # Un único contexto para todo el pipeline: la sesión HTTP del sondeo es la misma
+    # que después usarán las etapas para hablar con WebHDFS.
+    ctx = Contexto(backend=backend or os.environ.get("HDFS_BACKEND", "webhdfs"))
+
+    # Endpoint /metrics para que Prometheus lo sondee mientras corre el pipeline
+    if puerto_metricas:
+        trazas.servir_metricas(puerto_metricas)
+        print(f"--- MÉTRICAS EN http://localhost:{puerto_metricas}/metrics ---")
+
+    if ctx.local:
+        print(f"--- BACKEND LOCAL ({ctx.raiz_local}): SIN CLÚSTER, NO SE ESPERA AL NAMENODE ---")
+    else:
+        # En lugar de una espera fija, preguntamos al NameNode hasta que esté operativo
+        # (fuera de safe mode y con DataNodes vivos).
+        print("--- ESPERANDO A QUE SE DESPLIEGUE CORRECTAMENTE EL SISTEMA HADOOP DOCKERIZADO ---")
+        listo, _ = esperar_estado("disponible", tiempo_maximo=TIEMPO_MAXIMO_ARRANQUE, intervalo_inicial=2,
+                                  sesion=ctx.sesion)
+        if not listo:
+            print("!!! ERROR CRÍTICO: EL CLÚSTER NO ESTÁ DISPONIBLE. DETENIENDO PIPELINE.")
+            return False
+    if desde:
+        return backfill(ctx, desde, hasta or desde, max_fechas, max_paralelo, streaming, forzar)
+    print(f"--- INICIANDO PIPELINE COMPLETO (hasta {max_paralelo} etapas en paralelo, modo {modo}) ---")
+
+    ejecutar = ejecutar_etapa
+    if modo == "interno":
+        ejecutar = ejecutar_etapa_interna
+        sys.stdout = SalidaEtiquetada(sys.stdout)
+
+    pendientes, estados = preparar(ETAPAS, streaming)
+    tiempos = {}      # script -> (inicio, fin)
+    en_curso = {}     # futuro -> script
+
+    # Tramo raíz de la traza: las etapas (hilos del pool o procesos) cuelgan de él.
+    # Al cerrarse se exportan las métricas a disco.
+    with tramo("pipeline", modo=modo, paralelo=max_paralelo) as pipeline:
+        ejecutar_dag(ejecutar, ctx, max_paralelo, pendientes, estados, tiempos, en_curso)
+        pipeline.atributos["estados"] = dict(estados)
+
+    informe(tiempos, estados, pipeline.segundos)
+    print(f"\nTraza: {trazas.RUTA_TRAZAS} (traza {trazas.TRAZA})")
+    print(f"Métricas: {trazas.RUTA_METRICAS}")
     print("\n--- PIPELINE FINALIZADO ---")
+    return todo_bien(pendientes, estados)
+
+def preparar(etapas, streaming=False):
+    """Etapas pendientes con sus dependencias y estados iniciales de una ejecución."""
+    pendientes = {script: ETAPAS[script] for script in etapas}
+    estados = {}      # script -> OK | ERROR | OMITIDA | STREAM
+    if streaming:
+        # 10 no se ejecuta (20 genera en streaming) y 20 solo necesita las carpetas de 00
+        del pendientes["10_generate_data.py"]
+        pendientes["20_ingest_hdfs.py"] = ["00_bootstrap.py"]
+        estados["10_generate_data.py"] = "STREAM"
+    return pendientes, estados
+
+def todo_bien(pendientes, estados):
+    """True si no queda ninguna etapa sin lanzar y todas terminaron bien (u omitidas por el streaming)."""
+    return not pendientes and all(estado in ("OK", "STREAM") for estado in estados.values())
+
+def ejecutar_dag(ejecutar, ctx, max_paralelo, pendientes, estados, tiempos, en_curso, prefijo=""):
+    """
+    Lanza las etapas según el DAG hasta que no queda ninguna pendiente ni en curso.
+    'prefijo' se antepone a los mensajes (la fecha, en un backfill).
+    """
+    inicio_pipeline = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_paralelo) as pool:
+            while pendientes or en_curso:
+                # Lanzamos las etapas cuyas dependencias ya terminaron bien.
+                # Si una dependencia falló, la etapa (y en cascada sus dependientes) se omite.
+                for script, dependencias in list(pendientes.items()):
+                    if any(estados.get(d) in ("ERROR", "OMITIDA") for d in dependencias):
+                        estados[script] = "OMITIDA"
+                        del pendientes[script]
+                        print(f"!!! OMITIDA {prefijo}{script}: depende de una etapa que no terminó bien.")
+                    elif all(estados.get(d) == "OK" for d in dependencias) and len(en_curso) < max_paralelo:
+                        en_curso[pool.submit(propagar(ejecutar), script, inicio_pipeline, ctx)] = script
+                        del pendientes[script]
+
+                if not en_curso:
+                    break
+
+                # Esperamos a que termine al menos una etapa
+                terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    script = en_curso.pop(futuro)
+                    ok, inicio, fin = futuro.result()
+                    tiempos[script] = (inicio, fin)
+                    estados[script] = "OK" if ok else "ERROR"
+                    with cerrojo_salida:
+                        if ok:
+                            print(f"\n<<< TERMINADA: {prefijo}{script} ({fin - inicio:.1f} s)")
+                        else:
+                            print(f"\n!!! ERROR CRÍTICO EN {prefijo}{script}. SE OMITEN LAS ETAPAS QUE DEPENDEN DE ÉL.")
+    finally:
+        # Devolvemos la salida estándar original
+        if isinstance(sys.stdout, SalidaEtiquetada):
+            sys.stdout = sys.stdout.original
+
+# ---------------------------------------------------------
+# 5. BACKFILL DE UN RANGO DE FECHAS
+# ---------------------------------------------------------
+# Cada script toma su fecha de la variable de entorno DT (por defecto, hoy). Aquí
+# el DAG se ejecuta una vez por cada día del rango, con DT=<fecha>. Las etapas se
+# lanzan siempre como procesos: importadas en este proceso, todas las fechas
+# compartirían la misma fecha del módulo.
+
+def procesar_fecha(ctx, fecha, max_paralelo, streaming, forzar):
+    """
+    Ejecuta las etapas del backfill para una fecha. Si ya tiene la marca de éxito
+    (y no se pide --forzar) no hace nada. Devuelve (estado, segundos, estados de las etapas).
+    """
+    marca = MARCA_BACKFILL.format(fecha=fecha)
+    if not forzar and ctx.hdfs.existe(marca):
+        with cerrojo_salida:
+            print(f"\n=== dt={fecha}: YA PROCESADA ({marca}), SE OMITE ===")
+        return "HECHA", 0.0, {}
+
+    pendientes, estados = preparar(ETAPAS_BACKFILL, streaming)
+    tiempos = {}
+    with tramo("fecha", dt=fecha) as tramo_fecha:
+        ejecutar_dag(partial(ejecutar_etapa, fecha=fecha), ctx, max_paralelo, pendientes, estados, tiempos, {},
+                     prefijo=f"[dt={fecha}] ")
+        ok = todo_bien(pendientes, estados)
+        if ok:
+            # La marca solo se escribe cuando todo ha ido bien: así un relanzamiento
+            # repite las fechas que fallaron y salta las demás.
+            ctx.hdfs.crear_directorio(marca.rsplit("/", 1)[0])
+            ctx.hdfs.escribir(marca, json.dumps({"fecha": fecha, "terminado": datetime.now().isoformat(timespec="seconds"),
+                                                 "etapas": estados, "traza": trazas.TRAZA}).encode())
+        else:
+            tramo_fecha.estado = "error"
+    return ("OK" if ok else "ERROR"), tramo_fecha.segundos, estados
+
+def backfill(ctx, desde, hasta, max_fechas=MAX_FECHAS_PARALELO, max_paralelo=MAX_PARALELO, streaming=False,
+             forzar=False):
+    fechas = [(desde + timedelta(days=i)).isoformat() for i in range((hasta - desde).days + 1)]
+    print(f"--- INICIANDO BACKFILL {fechas[0]} -> {fechas[-1]} ({len(fechas)} fechas, hasta {max_fechas} a la vez "
+          f"y {max_paralelo} etapas en paralelo por fecha, modo proceso) ---")
+
+    resultados = {}
+    with tramo("backfill", desde=fechas[0], hasta=fechas[-1], paralelo_fechas=max_fechas) as pipeline:
+        with ThreadPoolExecutor(max_workers=max_fechas, thread_name_prefix="backfill") as pool:
+            futuros = {pool.submit(propagar(procesar_fecha), ctx, fecha, max_paralelo, streaming, forzar): fecha
+                       for fecha in fechas}
+            for futuro, fecha in futuros.items():
+                resultados[fecha] = futuro.result()
+
+    print("\n" + "-"*60)
+    print("--- INFORME DEL BACKFILL ---")
+    print("-"*(60))
+    print(f"{'FECHA':<12} {'ESTADO':<8} {'DURACIÓN':>9}  ETAPAS CON PROBLEMAS")
+    for fecha, (estado, segundos, estados) in resultados.items():
+        problemas = [s for s, e in estados.items() if e in ("ERROR", "OMITIDA")]
+        duracion = f"{segundos:>8.1f}s" if estado != "HECHA" else f"{'-':>9}"
+        print(f"{fecha:<12} {estado:<8} {duracion}  {', '.join(problemas)}")
+    cuenta = {e: sum(r[0] == e for r in resultados.values()) for e in ("OK", "HECHA", "ERROR")}
+    print(f"\nFechas procesadas: {cuenta['OK']} | Ya hechas (omitidas): {cuenta['HECHA']} | Con errores: {cuenta['ERROR']}")
+    print(f"Tiempo total: {pipeline.segundos:.1f} s")
+    print(f"\nTraza: {trazas.RUTA_TRAZAS} (traza {trazas.TRAZA})")
+    print(f"Métricas: {trazas.RUTA_METRICAS}")
+    print("\n--- BACKFILL FINALIZADO ---")
+    return cuenta["ERROR"] == 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Orquestador del pipeline completo")
+    parser.add_argument("--paralelo", type=int, default=MAX_PARALELO,
+                        help="Número máximo de etapas ejecutándose a la vez (1 = secuencial)")
+    parser.add_argument("--modo", choices=["interno", "proceso"], default=MODO_EJECUCION,
+                        help="interno: etapas importadas en este proceso con conexiones compartidas | "
+                             "proceso: un intérprete de Python por etapa")
+    parser.add_argument("--backend", choices=["webhdfs", "local"], default=None,
+                        help="webhdfs: clúster dockerizado | local: un directorio local hace de HDFS "
+                             "(por defecto, la variable HDFS_BACKEND o webhdfs)")
+    parser.add_argument("--puerto-metricas", type=int, default=None,
+                        help="Sirve las métricas de Prometheus en http://localhost:<puerto>/metrics")
+    parser.add_argument("--streaming", action="store_true",
+                        help="La ingesta (20) genera los datos y los sube a la vez, sin archivos locales "
+                             "(no se ejecuta 10)")
+    parser.add_argument("--codec", choices=["gzip", "zstd"], default=None,
+                        help="Comprime al vuelo los archivos en la ingesta y el backup (por defecto, sin compresión)")
+    parser.add_argument("--desde", "--from", dest="desde", type=date.fromisoformat, default=None,
+                        help="Backfill: primera fecha a reprocesar (AAAA-MM-DD)")
+    parser.add_argument("--hasta", "--to", dest="hasta", type=date.fromisoformat, default=None,
+                        help="Backfill: última fecha a reprocesar, incluida (por defecto, la de --desde)")
+    parser.add_argument("--paralelo-fechas", type=int, default=MAX_FECHAS_PARALELO,
+                        help="Backfill: número máximo de fechas procesándose a la vez")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Backfill: reprocesa también las fechas que ya tienen la marca _SUCCESS")
+    args = parser.parse_args()
+    if args.hasta and not args.desde:
+        parser.error("--hasta necesita --desde")
+    if args.desde and args.hasta and args.hasta < args.desde:
+        parser.error("--hasta no puede ser anterior a --desde")
+    ok = main(max_paralelo=args.paralelo, modo=args.modo, backend=args.backend, puerto_metricas=args.puerto_metricas,
+              streaming=args.streaming, codec=args.codec, desde=args.desde, hasta=args.hasta,
+              max_fechas=args.paralelo_fechas, forzar=args.forzar)
+    # Código de salida para cron/CI: 1 si alguna etapa (o fecha del backfill) falló o se omitió
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,275 @@
+# Importamos las librerías necesarias
+import argparse
+import csv
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+import requests
+from contexto import Contexto, cargar_etapa
+from salud_cluster import esperar_estado, leer_metricas, guardar_linea_tiempo
+from trazas import EtapaFallida
+
+# Función auxiliar (lambda) para obtener la hora exacta del momento.
+# Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN DEL BENCHMARK
+# ---------------------------------------------------------
+# Para cada factor de replicación repetimos el ciclo completo de 70 + 80:
+#   ingesta -> caída de nodos durante la ingesta -> detección -> recuperación
+# y medimos:
+#   - Throughput de la ingesta con fallo (MB/s que llegan realmente a HDFS)
+#   - Tiempo de detección: desde el apagado hasta que el NameNode da los nodos por muertos
+#   - Re-replicación: con los nodos aún caídos, cuántos bloques sub-replicados copia el
+#     NameNode a los nodos vivos y a qué ritmo (bloques/s), durante VENTANA_RERREPLICACION
+#   - Tiempo de recuperación: desde el arranque hasta que el clúster vuelve a estar sano
+#
+# ¡ATENCIÓN! El benchmark borra y vuelve a cargar la partición de hoy en /data
+# (los datos locales de 10_generate_data.py deben existir).
+
+DT = datetime.now().strftime('%Y-%m-%d')
+
+# Factores de replicación a comparar (el clúster tiene 4 DataNodes)
+FACTORES = [1, 2, 3, 4]
+
+# Factor de replicación del clúster (hdfs-site.xml). Al terminar dejamos los datos con él.
+FACTOR_POR_DEFECTO = 3
+
+# Mismos nodos que apaga 70_incident_simulation.py
+NODOS_A_PARAR = "clustera-dnnm-1 clustera-dnnm-2"
+
+# Segundos que dejamos correr la ingesta antes de apagar los nodos
+ESPERA_INICIO_INGESTA = 5
+
+# Tiempo máximo de cada espera (detección y recuperación)
+TIEMPO_MAXIMO = 900
+
+# Re-replicación con los nodos caídos: segundos que observamos UnderReplicatedBlocks
+# después de que el NameNode dé los nodos por muertos, y cada cuánto lo sondeamos.
+# (Con 2 de 4 nodos caídos solo pueden volver a su factor los bloques con replicación
+# 2 o menos: para replicación 3 y 4 no hay nodos vivos suficientes.)
+VENTANA_RERREPLICACION = 120
+INTERVALO_RERREPLICACION = 5
+
+# Rutas de la partición de hoy (por WebHDFS solo leemos metadatos: tamaño de lo que ha llegado a HDFS)
+RUTAS_DATOS = [f"/data/logs/raw/dt={DT}", f"/data/iot/raw/dt={DT}"]
+
+# Rutas locales
+DIR_SCRIPTS = Path(__file__).resolve().parent
+LOCAL_DIR = DIR_SCRIPTS.parents[1] / "data_local" / DT
+DIR_COMPARTIDO = DIR_SCRIPTS.parent / "docker" / "clusterA" / "notebooks" / "raw_audits"
+RUTA_RESULTADOS = DIR_COMPARTIDO / f"benchmark_replicacion_dt={DT}.csv"
+
+MB = 1024 * 1024
+
+# ---------------------------------------------------------
+# 2. FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+def run_silent(comando):
+    """Ejecuta un comando sin mostrar su salida (el benchmark imprime su propio resumen)."""
+    return subprocess.run(comando, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def bytes_en_hdfs(hdfs):
+    """Bytes que hay realmente en la partición de hoy de /data."""
+    total = 0
+    for ruta in RUTAS_DATOS:
+        resumen = hdfs.resumen(ruta)
+        total += resumen["length"] if resumen else 0
+    return total
+
+def vaciar(hdfs, ruta):
+    """Borra el contenido de una carpeta de HDFS (sin papelera), dejando la carpeta."""
+    for entrada in list(hdfs.listar(ruta)):
+        hdfs.borrar(f"{ruta}/{entrada['pathSuffix']}")
+
+def maximo(linea_tiempo, *metricas):
+    """Valor máximo de la suma de varias métricas a lo largo de una línea temporal de sondeos."""
+    return max((sum(p.get(m, 0) or 0 for m in metricas) for p in linea_tiempo if "error" not in p), default=0)
+
+def medir_rerreplicacion(ctx, factor, ventana):
+    """
+    Con los nodos todavía caídos (el NameNode ya los ha dado por muertos), sigue cómo
+    baja UnderReplicatedBlocks mientras el NameNode copia las réplicas que faltan a
+    los nodos vivos. Sondea cada INTERVALO_RERREPLICACION s durante 'ventana' s o
+    hasta que no queda ningún bloque sub-replicado.
+    Devuelve (pico de sub-replicados, bloques re-replicados desde el pico, segundos).
+    """
+    linea_tiempo = []
+    inicio = time.monotonic()
+    while True:
+        transcurrido = time.monotonic() - inicio
+        punto = {"instante": ahora(), "segundos": round(transcurrido, 1)}
+        try:
+            punto.update(leer_metricas(ctx.sesion))
+        except (requests.RequestException, ValueError) as e:
+            punto["error"] = str(e)
+        linea_tiempo.append(punto)
+        if punto.get("UnderReplicatedBlocks") == 0 or transcurrido >= ventana:
+            break
+        time.sleep(min(INTERVALO_RERREPLICACION, ventana - transcurrido))
+
+    validos = [p for p in linea_tiempo if "UnderReplicatedBlocks" in p]
+    guardar_linea_tiempo(f"salud_rerreplicacion_rf{factor}", "rerreplicacion", bool(validos), linea_tiempo)
+    if not validos:
+        return 0, 0, 0.0
+    # El contador puede subir al principio (el NameNode aún está procesando los nodos
+    # muertos): medimos desde su pico hasta el mínimo que alcanza después.
+    pico = max(validos, key=lambda p: p["UnderReplicatedBlocks"])
+    despues = validos[validos.index(pico):]
+    minimo = min(despues, key=lambda p: p["UnderReplicatedBlocks"])
+    return (pico["UnderReplicatedBlocks"], pico["UnderReplicatedBlocks"] - minimo["UnderReplicatedBlocks"],
+            minimo["segundos"] - pico["segundos"])
+
+def medir_factor(ctx, factor, tiempo_maximo, ventana=VENTANA_RERREPLICACION):
+    """Ejecuta el ciclo completo para un factor de replicación y devuelve su fila de resultados."""
+    nodos_caidos = len(NODOS_A_PARAR.split())
+    print("\n" + "-"*60)
+    print(f"[{ahora()}] [INFO]  FACTOR DE REPLICACIÓN = {factor}")
+    print("-"*(60))
+
+    # --- PASO 0: PUNTO DE PARTIDA ---
+    # Todos los nodos arriba, clúster sano y partición de hoy vacía.
+    run_silent(f"docker start {NODOS_A_PARAR}")
+    esperar_estado("sano", tiempo_maximo=tiempo_maximo, sesion=ctx.sesion)
+    for ruta in RUTAS_DATOS:
+        vaciar(ctx.hdfs, ruta)
+
+    # --- PASO 1: INGESTA CON FALLO ---
+    # Lanzamos la ingesta en un hilo (mismo proceso y mismo contexto) con el factor
+    # pedido y apagamos los nodos a mitad. Si la ingesta falla (su tramo acaba fallido
+    # aunque capture los errores: EtapaFallida), su código de salida es 1, como el del script.
+    print(f"[{ahora()}] [INFO]  1. Ingesta con replicación {factor} y caída de {NODOS_A_PARAR}...")
+    ingesta = cargar_etapa("20_ingest_hdfs.py")
+    resultado = {"codigo": 0}
+
+    def ingestar():
+        try:
+            ingesta.ingestar(replicacion=factor, ctx=ctx)
+        except EtapaFallida as e:
+            print(f"[{ahora()}] [WARN]  La ingesta terminó con archivos sin subir: {e}")
+            resultado["codigo"] = 1
+        except Exception as e:
+            print(f"[{ahora()}] [ERROR] La ingesta terminó con error: {e}")
+            resultado["codigo"] = 1
+
+    inicio = time.perf_counter()
+    hilo = threading.Thread(target=ingestar, name=f"ingesta_rf{factor}")
+    hilo.start()
+    time.sleep(ESPERA_INICIO_INGESTA)
+    run_silent(f"docker stop {NODOS_A_PARAR}")
+    instante_caida = time.perf_counter()
+    hilo.join()
+    codigo_ingesta = resultado["codigo"]
+    segundos_ingesta = time.perf_counter() - inicio
+    mb_ingestados = bytes_en_hdfs(ctx.hdfs) / MB
+    print(f"[{ahora()}] [OK]    Ingesta terminada: {mb_ingestados:.1f} MB en {segundos_ingesta:.2f} s")
+
+    # --- PASO 2: DETECCIÓN DEL FALLO ---
+    print(f"[{ahora()}] [INFO]  2. Esperando a que el NameNode detecte la caída...")
+    detectado, linea_fallo = esperar_estado("fallo_visible", nodos_caidos=nodos_caidos, tiempo_maximo=tiempo_maximo,
+                                            nombre_evidencia=f"salud_fallo_rf{factor}", sesion=ctx.sesion)
+    segundos_deteccion = time.perf_counter() - instante_caida
+
+    # --- PASO 2.1: RE-REPLICACIÓN CON LOS NODOS CAÍDOS ---
+    print(f"[{ahora()}] [INFO]  2.1. Midiendo la re-replicación con los nodos caídos ({ventana} s)...")
+    subreplicados, rerreplicados, segundos_rerreplicacion = (medir_rerreplicacion(ctx, factor, ventana) if detectado
+                                                              else (0, 0, 0.0))
+    print(f"[{ahora()}] [OK]    {rerreplicados} de {subreplicados} bloques sub-replicados re-replicados "
+          f"en {segundos_rerreplicacion:.0f} s")
+
+    # --- PASO 3: RECUPERACIÓN ---
+    print(f"[{ahora()}] [INFO]  3. Arrancando los nodos y esperando a la auto-curación...")
+    run_silent(f"docker start {NODOS_A_PARAR}")
+    instante_arranque = time.perf_counter()
+    recuperado, linea_recuperacion = esperar_estado("sano", tiempo_maximo=tiempo_maximo,
+                                                    nombre_evidencia=f"salud_recuperacion_rf{factor}", sesion=ctx.sesion)
+    segundos_recuperacion = time.perf_counter() - instante_arranque
+
+    # Bloques pendientes de curar: el máximo de sub-replicados + perdidos que llegó a ver el NameNode
+    bloques_pendientes = maximo(linea_fallo[-1:] + linea_recuperacion, "UnderReplicatedBlocks", "MissingBlocks")
+
+    return {
+        "factor_replicacion": factor,
+        "mb_ingestados": round(mb_ingestados, 1),
+        "segundos_ingesta": round(segundos_ingesta, 2),
+        "mb_s_ingesta_con_fallo": round(mb_ingestados / max(segundos_ingesta, 1e-9), 2),
+        "codigo_salida_ingesta": codigo_ingesta,
+        "fallo_detectado": detectado,
+        "segundos_deteccion": round(segundos_deteccion, 1),
+        "bloques_subreplicados": subreplicados,
+        "bloques_rerreplicados": rerreplicados,
+        "segundos_rerreplicacion": round(segundos_rerreplicacion, 1),
+        "bloques_rerreplicados_s": round(rerreplicados / segundos_rerreplicacion, 2) if segundos_rerreplicacion else 0.0,
+        "bloques_pendientes": bloques_pendientes,
+        "recuperado": recuperado,
+        "segundos_recuperacion": round(segundos_recuperacion, 1),
+    }
+
+# ---------------------------------------------------------
+# 3. FUNCIÓN PRINCIPAL
+# ---------------------------------------------------------
+def benchmark(factores=FACTORES, tiempo_maximo=TIEMPO_MAXIMO, ventana=VENTANA_RERREPLICACION, ctx=None):
+
+    print(f"[{ahora()}] [INFO]  --> INICIO BENCHMARK DE REPLICACIÓN | FACTORES={factores}")
+
+    if not LOCAL_DIR.exists():
+        print(f"[{ahora()}] [WARN]  No se encontraron datos locales en: {LOCAL_DIR}")
+        print(f"[{ahora()}] [INFO]  Ejecuta antes 10_generate_data.py. Abortando.")
+        return
+
+    ctx = ctx or Contexto()
+    if ctx.local:
+        print(f"[{ahora()}] [WARN]  Backend local: no hay clúster que apagar ni JMX que sondear. Abortando.")
+        return
+
+    resultados = []
+    try:
+        for factor in factores:
+            resultados.append(medir_factor(ctx, factor, tiempo_maximo, ventana))
+    finally:
+        # Pase lo que pase, dejamos los nodos arrancados y los datos con el factor del clúster
+        run_silent(f"docker start {NODOS_A_PARAR}")
+        for ruta in RUTAS_DATOS:
+            if ctx.hdfs.existe(ruta):
+                ctx.hdfs.replicacion(ruta, FACTOR_POR_DEFECTO)
+
+    if not resultados:
+        return
+
+    # --- TABLA DE RESULTADOS ---
+    # Un CSV (legible por máquina) en la carpeta compartida con Jupyter
+    DIR_COMPARTIDO.mkdir(parents=True, exist_ok=True)
+    with open(RUTA_RESULTADOS, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=list(resultados[0]))
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+    print("\n" + "-"*60)
+    print(f"[{ahora()}] [INFO]  RESULTADOS (guardados en {RUTA_RESULTADOS})")
+    print("-"*(60))
+    print(f"{'RF':>3} | {'Ingesta MB/s':>12} | {'Detección s':>11} | {'Re-replicados':>13} | {'Bloques/s':>9} | {'Curación s':>10}")
+    for fila in resultados:
+        rerreplicados = f"{fila['bloques_rerreplicados']}/{fila['bloques_subreplicados']}"
+        print(f"{fila['factor_replicacion']:>3} | {fila['mb_s_ingesta_con_fallo']:>12} | {fila['segundos_deteccion']:>11} | "
+              f"{rerreplicados:>13} | "
+              f"{fila['bloques_rerreplicados_s']:>9} | {fila['segundos_recuperacion'] if fila['recuperado'] else '-':>10}")
+
+    print(f"\n[{ahora()}] [INFO]  --> FIN DEL BENCHMARK DE REPLICACIÓN")
+    print("="*60 + "\n")
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de caída y re-replicación por factor de replicación")
+    parser.add_argument("--factores", type=int, nargs="+", default=FACTORES,
+                        help="Factores de replicación a comparar (por defecto 1 2 3 4)")
+    parser.add_argument("--tiempo-maximo", type=int, default=TIEMPO_MAXIMO,
+                        help="Segundos máximos de cada espera (detección y recuperación)")
+    parser.add_argument("--ventana-rerreplicacion", type=int, default=VENTANA_RERREPLICACION,
+                        help="Segundos que se mide la re-replicación con los nodos caídos")
+    args = parser.parse_args()
+    benchmark(factores=args.factores, tiempo_maximo=args.tiempo_maximo, ventana=args.ventana_rerreplicacion)
@@ -0,0 +1,366 @@
+# Importamos las librerías necesarias
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from contexto import Contexto, cargar_etapa
+
+# Función auxiliar (lambda) para obtener la hora exacta del momento.
+# Se usará en los 'print' para saber a qué hora ocurrió cada paso (Logs).
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN DEL BENCHMARK
+# ---------------------------------------------------------
+# Mide el rendimiento del código de las etapas sin clúster, sobre el backend
+# local de hdfs_io.py (un directorio temporal hace de HDFS):
+#   - Generador (10):   MB/s escritos por generar_archivo()
+#   - Ingesta (20):     MB/s subidos en streaming por subir_webhdfs()
+#   - Backup (40):      MB/s copiados por el motor de copia con sus hilos
+#   - Inventario (50):  segundos del merge join + checksums con 10k/100k/1M archivos
+#                       (namespace sintético en memoria: no se crean archivos reales)
+#   - fsck (30/60):     MB/s y líneas/s del parser sobre un reporte sintético grande
+#
+# Cada ejecución se guarda como JSON (versión de git, parámetros y métricas) y se
+# compara con una referencia fija: si una métrica empeora más que la tolerancia, el
+# script termina con código 1 para que la regresión no pase desapercibida. La
+# referencia solo cambia con --guardar-referencia, así que una ejecución lenta no se
+# convierte en la nueva base y las regresiones no se van acumulando sin avisar.
+
+# Volumen de datos del generador, la ingesta y el backup (MB por familia)
+MB_DATOS = 32
+
+# Número de archivos de cada árbol (/data y /backup) en la prueba del inventario
+ARCHIVOS_INVENTARIO = [10_000, 100_000, 1_000_000]
+ARCHIVOS_POR_CARPETA = 1000
+
+# Reporte fsck sintético: archivos, bloques por archivo y réplicas por bloque
+ARCHIVOS_FSCK = 50_000
+BLOQUES_POR_ARCHIVO = 2
+REPLICAS_POR_BLOQUE = 3
+
+# Repeticiones de cada escenario (se guarda la mediana)
+REPETICIONES = 3
+
+# Empeoramiento máximo admitido respecto a la referencia (0.2 = 20%)
+TOLERANCIA = 0.20
+
+ESCENARIOS = ["generador", "ingesta", "backup", "inventario", "fsck"]
+
+SEMILLA = 42
+MB = 1024 * 1024
+
+# Resultados (uno por ejecución). La caché no se versiona: cada máquina tiene su histórico.
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+DIR_RESULTADOS = RAIZ_PROYECTO / ".cache" / "benchmark"
+
+# Referencia fija con la que se compara: se crea con la primera ejecución y después
+# solo se sustituye de forma explícita (--guardar-referencia)
+RUTA_REFERENCIA = DIR_RESULTADOS / "referencia.json"
+
+# ---------------------------------------------------------
+# 2. FUNCIONES AUXILIARES
+# ---------------------------------------------------------
+def metrica(valor, unidad, mejor):
+    """Registro de una métrica. 'mejor' indica si es mejor un valor "mayor" (MB/s) o "menor" (segundos)."""
+    return {"valor": round(valor, 3), "unidad": unidad, "mejor": mejor}
+
+def mediana(medir, repeticiones):
+    """Ejecuta 'medir' varias veces y devuelve la mediana de lo que devuelve."""
+    return statistics.median(medir() for _ in range(repeticiones))
+
+def version_git():
+    """Commit actual (con '-dirty' si hay cambios sin confirmar), o 'desconocida' fuera de git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_PROYECTO,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        cambios = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ_PROYECTO,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+    return f"{commit}-dirty" if cambios else commit
+
+class NamespaceSintetico:
+    """
+    Árbol /data y /backup en memoria con el mismo interfaz de metadatos que hdfs_io
+    (listar y checksum). Permite medir el inventario con millones de archivos sin
+    crearlos: cada carpeta tiene ARCHIVOS_POR_CARPETA archivos ordenados por nombre.
+    En /backup falta el primer archivo, así el diff también recorre ese caso.
+    """
+    def __init__(self, archivos, por_carpeta=ARCHIVOS_POR_CARPETA):
+        self.archivos = archivos
+        self.por_carpeta = por_carpeta
+
+    def listar(self, ruta):
+        raiz, _, carpeta = ruta.strip("/").partition("/")
+        if not carpeta:
+            for i in range(-(-self.archivos // self.por_carpeta)):
+                yield {"pathSuffix": f"part={i:05d}", "type": "DIRECTORY", "length": 0, "modificationTime": 0}
+            return
+        i = int(carpeta.split("=")[1])
+        primero = i * self.por_carpeta
+        for j in range(primero, min(primero + self.por_carpeta, self.archivos)):
+            if raiz == "backup" and j == 0:
+                continue
+            yield {"pathSuffix": f"f{j:07d}.log", "type": "FILE", "length": 1024 + j % 512, "modificationTime": j}
+
+    def checksum(self, ruta):
+        # Mismo nombre relativo -> mismo checksum en /data y en /backup
+        relativa = ruta.split("/", 2)[2]
+        return {"algorithm": "MD5", "bytes": f"{zlib.crc32(relativa.encode()):08x}", "length": 16}
+
+def lineas_fsck_sintetico(archivos, bloques=BLOQUES_POR_ARCHIVO, replicas=REPLICAS_POR_BLOQUE):
+    """Reporte fsck con el formato de Hadoop (-files -blocks -locations) y todos los bloques sanos."""
+    lineas = ["FSCK started by hdadmin (auth:SIMPLE) from /172.18.0.2 for path /data at Mon Jan 01 00:00:00 UTC 2024\n",
+              "/data <dir>\n"]
+    tam = bloques * 64 * MB
+    for i in range(archivos):
+        ruta = f"/data/logs/raw/dt=2024-01-01/f{i:07d}.log"
+        lineas.append(f"{ruta} {tam} bytes, replicated: replication={replicas}, {bloques} block(s):  OK\n")
+        for b in range(bloques):
+            nodos = ", ".join(f"DatanodeInfoWithStorage[172.18.0.{3 + (i + b + r) % 4}:9866,DS-{r},DISK]"
+                              for r in range(replicas))
+            lineas.append(f"{b}. BP-1-172.18.0.2-1:blk_{1073741825 + i * bloques + b}_{1001 + i * bloques + b} "
+                          f"len={64 * MB} Live_repl={replicas}  [{nodos}]\n")
+        lineas.append("\n")
+    lineas += [l + "\n" for l in [
+        "Status: HEALTHY", " Number of data-nodes:\t4", " Number of racks:\t\t1", "",
+        "Replicated Blocks:", f" Total size:\t{archivos * tam} B", f" Total files:\t{archivos}",
+        f" Total blocks (validated):\t{archivos * bloques} (avg. block size {64 * MB} B)",
+        " Missing blocks:\t\t0", " Corrupt blocks:\t\t0", "",
+        "The filesystem under path '/data' is HEALTHY"]]
+    return lineas
+
+# ---------------------------------------------------------
+# 3. ESCENARIOS
+# ---------------------------------------------------------
+# Cada escenario llama al mismo código que usa su etapa y devuelve {nombre: métrica}.
+
+def medir_generador(trabajo, mb, repeticiones):
+    generador = cargar_etapa("10_generate_data.py")
+    usuarios, sensores = generador.crear_catalogos(SEMILLA)
+    base_us = generador.instante_base_us(SEMILLA)
+    catalogos = {"logs": usuarios, "iot": sensores}
+
+    def medir():
+        rng = generador.np.random.default_rng(SEMILLA)
+        escritos, inicio = 0, time.perf_counter()
+        for familia, (_, _, extension) in generador.FAMILIAS.items():
+            bytes_familia, _ = generador.generar_archivo(trabajo / f"{familia}.{extension}", familia, mb * MB,
+                                                         rng, catalogos[familia], base_us, mostrar_progreso=False)
+            escritos += bytes_familia
+        return escritos / MB / (time.perf_counter() - inicio)
+
+    return {"generador_mb_s": metrica(mediana(medir, repeticiones), "MB/s", "mayor")}
+
+def medir_ingesta(hdfs, archivos, repeticiones):
+    ingesta = cargar_etapa("20_ingest_hdfs.py")
+    total = sum(a.stat().st_size for a in archivos)
+
+    def medir():
+        inicio = time.perf_counter()
+        for archivo in archivos:
+            ingesta.subir_webhdfs(hdfs, archivo, "/data/benchmark", ingesta.TAM_BUFFER)
+        return total / MB / (time.perf_counter() - inicio)
+
+    return {"ingesta_mb_s": metrica(mediana(medir, repeticiones), "MB/s", "mayor")}
+
+def medir_backup(hdfs, repeticiones):
+    copia = cargar_etapa("40_backup_copy.py")
+    origen = {e["pathSuffix"]: e["length"] for e in hdfs.listar("/data/benchmark")}
+    limitador = copia.LimitadorAncho(None)
+
+    def copiar(nombre):
+        copia.copiar_con_reintentos(copia.copiar_webhdfs, hdfs, f"/data/benchmark/{nombre}",
+                                    f"/backup/benchmark/{nombre}", origen[nombre], limitador, 1)
+
+    def medir():
+        hdfs.crear_directorio("/backup/benchmark")
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=copia.HILOS_COPIA) as pool:
+            list(pool.map(copiar, origen))
+        return sum(origen.values()) / MB / (time.perf_counter() - inicio)
+
+    return {"backup_mb_s": metrica(mediana(medir, repeticiones), "MB/s", "mayor")}
+
+def medir_inventario(tamanos, repeticiones):
+    inventario = cargar_etapa("50_inventory_compare.py")
+    resultados = {}
+    for archivos in tamanos:
+        namespace = NamespaceSintetico(archivos)
+
+        def medir():
+            inicio = time.perf_counter()
+            contadores, _ = inventario.comparar(namespace, "/data", "/backup", "hdfs", {}, lambda linea: None)
+            assert contadores["comun"] == archivos - 1 and contadores["falta"] == 1, contadores
+            return time.perf_counter() - inicio
+
+        # Con un millón de archivos una sola pasada ya da una medida estable
+        segundos = mediana(medir, repeticiones if archivos < 1_000_000 else 1)
+        print(f"[{ahora()}] [INFO]      {archivos:>9,} archivos: {segundos:.2f} s ({archivos / segundos:,.0f} archivos/s)")
+        resultados[f"inventario_{archivos}_s"] = metrica(segundos, "s", "menor")
+    return resultados
+
+def medir_fsck(trabajo, archivos, repeticiones):
+    from fsck_parser import volcar_fsck
+    lineas = lineas_fsck_sintetico(archivos)
+    tam = sum(len(l) for l in lineas) / MB
+
+    def medir():
+        inicio = time.perf_counter()
+        volcar_fsck(iter(lineas), trabajo / "fsck.txt", trabajo / "fsck.jsonl")
+        return time.perf_counter() - inicio
+
+    segundos = mediana(medir, repeticiones)
+    return {"fsck_mb_s": metrica(tam / segundos, "MB/s", "mayor"),
+            "fsck_lineas_s": metrica(len(lineas) / segundos, "líneas/s", "mayor")}
+
+# ---------------------------------------------------------
+# 4. COMPARACIÓN CON LA REFERENCIA
+# ---------------------------------------------------------
+def comparar(actual, referencia, tolerancia):
+    """
+    Compara las métricas comunes. Devuelve la lista de regresiones:
+    (nombre, valor de referencia, valor actual, cambio relativo).
+    """
+    regresiones = []
+    print(f"{'Métrica':<26} | {'Referencia':>12} | {'Actual':>12} | {'Cambio':>8}")
+    for nombre, m in actual["metricas"].items():
+        anterior = referencia["metricas"].get(nombre)
+        if not anterior or not anterior["valor"]:
+            continue
+        cambio = (m["valor"] - anterior["valor"]) / anterior["valor"]
+        # Un cambio positivo es bueno en MB/s y malo en segundos
+        empeora = -cambio if m["mejor"] == "mayor" else cambio
+        marca = "  <-- REGRESIÓN" if empeora > tolerancia else ""
+        print(f"{nombre:<26} | {anterior['valor']:>12.3f} | {m['valor']:>12.3f} | {cambio:>+8.1%}{marca}")
+        if marca:
+            regresiones.append((nombre, anterior["valor"], m["valor"], cambio))
+    return regresiones
+
+# ---------------------------------------------------------
+# 5. FUNCIÓN PRINCIPAL
+# ---------------------------------------------------------
+def benchmark(escenarios=ESCENARIOS, mb=MB_DATOS, archivos_inventario=ARCHIVOS_INVENTARIO,
+              archivos_fsck=ARCHIVOS_FSCK, repeticiones=REPETICIONES, tolerancia=TOLERANCIA, referencia=None,
+              guardar_referencia=False):
+    """
+    Ejecuta los escenarios pedidos, guarda el JSON y devuelve la lista de regresiones.
+    Compara con `referencia` o, si no se indica, con la referencia fija (RUTA_REFERENCIA).
+    """
+    print(f"[{ahora()}] [INFO]  --> INICIO BENCHMARK DEL PIPELINE | ESCENARIOS={escenarios}")
+    referencia = Path(referencia) if referencia else RUTA_REFERENCIA
+
+    metricas = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark_pipeline_") as tmp:
+        trabajo = Path(tmp)
+        # HDFS de mentira en el directorio temporal: no hace falta clúster
+        hdfs = Contexto(backend="local", raiz_local=trabajo / "hdfs").hdfs
+        locales = trabajo / "data_local"
+        locales.mkdir()
+
+        # La ingesta y el backup necesitan los archivos del generador: si no se pide
+        # medirlo, lo ejecutamos igualmente (una vez) para tener datos.
+        if "generador" in escenarios or {"ingesta", "backup"} & set(escenarios):
+            print(f"[{ahora()}] [INFO]  Generador: {mb} MB por familia...")
+            medido = medir_generador(locales, mb, repeticiones if "generador" in escenarios else 1)
+            if "generador" in escenarios:
+                metricas.update(medido)
+        if "ingesta" in escenarios or "backup" in escenarios:
+            print(f"[{ahora()}] [INFO]  Ingesta en streaming al HDFS local...")
+            medido = medir_ingesta(hdfs, sorted(locales.iterdir()), repeticiones if "ingesta" in escenarios else 1)
+            if "ingesta" in escenarios:
+                metricas.update(medido)
+        if "backup" in escenarios:
+            print(f"[{ahora()}] [INFO]  Backup /data -> /backup...")
+            metricas.update(medir_backup(hdfs, repeticiones))
+        if "inventario" in escenarios:
+            print(f"[{ahora()}] [INFO]  Inventario (merge join + checksums) sobre namespace sintético...")
+            metricas.update(medir_inventario(archivos_inventario, repeticiones))
+        if "fsck" in escenarios:
+            print(f"[{ahora()}] [INFO]  Parser de fsck: reporte sintético de {archivos_fsck:,} archivos...")
+            metricas.update(medir_fsck(trabajo, archivos_fsck, repeticiones))
+
+    resultado = {
+        "version": version_git(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "parametros": {"mb": mb, "archivos_inventario": archivos_inventario, "archivos_fsck": archivos_fsck,
+                       "repeticiones": repeticiones},
+        "metricas": metricas,
+    }
+
+    DIR_RESULTADOS.mkdir(parents=True, exist_ok=True)
+    ruta = DIR_RESULTADOS / f"benchmark_{datetime.now():%Y%m%dT%H%M%S}_{resultado['version']}.json"
+    ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print("\n" + "-"*60)
+    print(f"[{ahora()}] [INFO]  RESULTADOS (guardados en {ruta})")
+    print("-"*(60))
+    for nombre, m in metricas.items():
+        print(f"{nombre:<26} {m['valor']:>14} {m['unidad']}")
+
+    regresiones = []
+    if referencia and referencia.exists():
+        datos_referencia = json.loads(referencia.read_text(encoding="utf-8"))
+        print(f"\n[{ahora()}] [INFO]  Comparando con {referencia.name} (versión {datos_referencia.get('version')}, "
+              f"tolerancia {tolerancia:.0%})")
+        if datos_referencia.get("parametros") != resultado["parametros"]:
+            print(f"[{ahora()}] [WARN]  La referencia se midió con otros parámetros: la comparación es orientativa.")
+        regresiones = comparar(resultado, datos_referencia, tolerancia)
+        if regresiones:
+            print(f"[{ahora()}] [ERROR] {len(regresiones)} métrica(s) empeoran más de un {tolerancia:.0%}.")
+        else:
+            print(f"[{ahora()}] [OK]    Sin regresiones respecto a la referencia.")
+    else:
+        print(f"\n[{ahora()}] [INFO]  Sin referencia con la que comparar ({referencia}).")
+
+    # La referencia fija solo se escribe si no existe o si se pide explícitamente:
+    # una ejecución con regresiones no pasa a ser la base de las siguientes
+    if guardar_referencia or not RUTA_REFERENCIA.exists():
+        RUTA_REFERENCIA.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[{ahora()}] [OK]    Esta ejecución queda como referencia en {RUTA_REFERENCIA}.")
+
+    print(f"\n[{ahora()}] [INFO]  --> FIN DEL BENCHMARK DEL PIPELINE")
+    print("="*60 + "\n")
+    return regresiones
+
+# ---------------------------------------------------------
+# PUNTO DE ENTRADA
+# ---------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de rendimiento del pipeline sobre un HDFS local")
+    parser.add_argument("--escenarios", nargs="+", choices=ESCENARIOS, default=ESCENARIOS,
+                        help="Escenarios a medir (por defecto todos)")
+    parser.add_argument("--mb", type=int, default=MB_DATOS,
+                        help="MB por familia para el generador, la ingesta y el backup")
+    parser.add_argument("--archivos-inventario", type=int, nargs="+", default=ARCHIVOS_INVENTARIO,
+                        help="Número de archivos de cada árbol en la prueba del inventario")
+    parser.add_argument("--archivos-fsck", type=int, default=ARCHIVOS_FSCK,
+                        help="Archivos del reporte fsck sintético")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES,
+                        help="Repeticiones de cada escenario (se guarda la mediana)")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Empeoramiento máximo admitido respecto a la referencia (0.2 = 20%%)")
+    parser.add_argument("--referencia", default=None,
+                        help="JSON de resultados con el que comparar (por defecto, la referencia fija "
+                             ".cache/benchmark/referencia.json)")
+    parser.add_argument("--guardar-referencia", action="store_true",
+                        help="Sustituye la referencia fija por esta ejecución (p. ej. tras aceptar un cambio)")
+    args = parser.parse_args()
+    if args.referencia and not Path(args.referencia).exists():
+        parser.error(f"no existe la referencia {args.referencia}")
+    regresiones = benchmark(escenarios=args.escenarios, mb=args.mb, archivos_inventario=args.archivos_inventario,
+                            archivos_fsck=args.archivos_fsck, repeticiones=args.repeticiones,
+                            tolerancia=args.tolerancia, referencia=args.referencia,
+                            guardar_referencia=args.guardar_referencia)
+    sys.exit(1 if regresiones else 0)
@@ -0,0 +1,162 @@
+# Compresión en streaming por bloques paralelos (usada por 20 y 40)
+#
+# Los .log separados por tuberías y los .jsonl de IoT son muy repetitivos, y con
+# replicación 3 cada byte crudo se guarda tres veces en el clúster. Aquí los
+# comprimimos al vuelo, mientras viajan hacia HDFS, sin archivos intermedios:
+#
+#   - El flujo de entrada se corta en bloques de TAM_BLOQUE bytes y cada bloque se
+#     comprime en un hilo del pool (zlib y zstandard sueltan el GIL al comprimir).
+#   - Cada bloque es un miembro gzip (o una trama zstd) completo. Concatenados en
+#     orden forman un archivo válido: 'gzip -d', 'zstd -d', 'hdfs dfs -text' o
+#     Spark lo leen como uno solo (igual que la salida de pigz).
+#   - Como mucho hay 2 x hilos bloques en vuelo: la memoria está acotada.
+#
+# Códecs:
+#   "gzip" -> Librería estándar (zlib). Extensión .gz.
+#   "zstd" -> Paquete opcional 'zstandard' (pip install zstandard). Extensión .zst.
+#
+# Uso:
+#   compresor = Compresor("gzip")
+#   hdfs.escribir(ruta + compresor.extension, compresor.comprimir(trozos))
+#   print(compresor.ratio, compresor.cpu_segundos)
+
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from trazas import sumar
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+# Extensión de cada códec: el inventario (50) la usa para emparejar x.log con x.log.gz
+CODECS = {"gzip": ".gz", "zstd": ".zst"}
+
+# Nivel por defecto: compromiso entre ratio y CPU (gzip 1-9, zstd 1-22)
+NIVELES = {"gzip": 6, "zstd": 3}
+
+# Tamaño de cada bloque comprimido por separado y número de hilos compresores
+TAM_BLOQUE = 4 * 1024 * 1024
+HILOS_COMPRESION = 4
+
+def codec_de(nombre):
+    """Códec de un archivo según su extensión (None si no está comprimido)."""
+    return next((codec for codec, extension in CODECS.items() if nombre.endswith(extension)), None)
+
+def nombre_logico(nombre):
+    """Nombre sin la extensión del códec: 'logs.log.gz' -> 'logs.log'."""
+    codec = codec_de(nombre)
+    return nombre[:-len(CODECS[codec])] if codec else nombre
+
+def variantes(nombre):
+    """Todos los nombres con los que puede estar guardado un archivo: x.log, x.log.gz, x.log.zst."""
+    logico = nombre_logico(nombre)
+    return [logico, *(logico + extension for extension in CODECS.values())]
+
+def importar_zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("El códec zstd necesita el paquete 'zstandard' (pip install zstandard)") from e
+    return zstandard
+
+# ---------------------------------------------------------
+# 2. COMPRESIÓN POR BLOQUES EN PARALELO
+# ---------------------------------------------------------
+class Compresor:
+    """
+    Compresor de un archivo. Acumula sus estadísticas: bytes de entrada y de salida
+    (ratio) y segundos de CPU gastados por los hilos que comprimen.
+    """
+    def __init__(self, codec, nivel=None, hilos=HILOS_COMPRESION, tam_bloque=TAM_BLOQUE):
+        if codec not in CODECS:
+            raise ValueError(f"Códec desconocido: {codec} (usa {', '.join(CODECS)})")
+        self.codec = codec
+        self.extension = CODECS[codec]
+        self.nivel = nivel or NIVELES[codec]
+        self.hilos = hilos
+        self.tam_bloque = tam_bloque
+        self.bytes_entrada = 0
+        self.bytes_salida = 0
+        self.cpu_segundos = 0.0
+        if codec == "zstd":
+            self.zstd = importar_zstd()
+
+    @property
+    def ratio(self):
+        """Bytes originales por byte guardado (4.0 = ocupa la cuarta parte)."""
+        return self.bytes_entrada / max(self.bytes_salida, 1)
+
+    def resumen(self):
+        """Línea de métricas del archivo: tamaños, ratio y coste de CPU."""
+        mb_entrada, mb_salida = self.bytes_entrada / 1024 / 1024, self.bytes_salida / 1024 / 1024
+        return (f"{mb_entrada:.1f} MB -> {mb_salida:.1f} MB (ratio {self.ratio:.2f}x) | "
+                f"CPU de compresión {self.cpu_segundos:.2f} s ({mb_entrada / max(self.cpu_segundos, 1e-9):.1f} MB/s por núcleo)")
+
+    def _comprimir_bloque(self, bloque):
+        # CPU del hilo que comprime (no el tiempo real, que incluye esperas)
+        cpu = time.thread_time()
+        if self.codec == "gzip":
+            # wbits=31 -> miembro gzip; sin fecha en la cabecera: mismo bloque, mismos bytes
+            compresor = zlib.compressobj(self.nivel, zlib.DEFLATED, 31)
+            salida = compresor.compress(bloque) + compresor.flush()
+        else:
+            salida = self.zstd.ZstdCompressor(level=self.nivel).compress(bloque)
+        return salida, time.thread_time() - cpu
+
+    def comprimir(self, trozos):
+        """
+        Generador: recibe trozos de datos de cualquier tamaño y entrega los bloques
+        comprimidos en el mismo orden, mientras los siguientes se comprimen en paralelo.
+        """
+        with ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix=f"compresion_{self.codec}") as pool:
+            en_vuelo = deque()
+            pendiente = bytearray()
+
+            def entregar():
+                salida, cpu = en_vuelo.popleft().result()
+                self.bytes_salida += len(salida)
+                self.cpu_segundos += cpu
+                sumar(bytes_comprimidos=len(salida), cpu_compresion_segundos=cpu)
+                return salida
+
+            for trozo in trozos:
+                self.bytes_entrada += len(trozo)
+                sumar(bytes_sin_comprimir=len(trozo))
+                pendiente += trozo
+                while len(pendiente) >= self.tam_bloque:
+                    en_vuelo.append(pool.submit(self._comprimir_bloque, bytes(pendiente[:self.tam_bloque])))
+                    del pendiente[:self.tam_bloque]
+                    if len(en_vuelo) >= 2 * self.hilos:
+                        yield entregar()
+            if pendiente or not self.bytes_entrada:
+                # El último bloque (o uno vacío: un archivo vacío comprimido sigue siendo válido)
+                en_vuelo.append(pool.submit(self._comprimir_bloque, bytes(pendiente)))
+            while en_vuelo:
+                yield entregar()
+
+# ---------------------------------------------------------
+# 3. DESCOMPRESIÓN EN STREAMING
+# ---------------------------------------------------------
+def descomprimir(trozos, codec):
+    """
+    Generador: descomprime un flujo gzip o zstd formado por varios miembros/tramas
+    seguidos (como los que escribe Compresor) y entrega el contenido original.
+    """
+    if codec == "gzip":
+        nuevo = lambda: zlib.decompressobj(31)
+    else:
+        zstd = importar_zstd()
+        nuevo = lambda: zstd.ZstdDecompressor().decompressobj()
+    descompresor = nuevo()
+    for trozo in trozos:
+        while trozo:
+            datos = descompresor.decompress(trozo)
+            if datos:
+                yield datos
+            if descompresor.eof:
+                # Fin de un miembro: lo que sobra es el principio del siguiente
+                trozo = descompresor.unused_data
+                descompresor = nuevo()
+            else:
+                trozo = b""
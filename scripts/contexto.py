@@ -0,0 +1,126 @@
+# Configuración compartida del pipeline y conexiones perezosas
+#
+# Cuando 90_run_all.py ejecuta las etapas dentro del mismo proceso, todas
+# comparten un único Contexto: la misma configuración de conexión, un solo
+# acceso a HDFS (hdfs_io.py) y una sola sesión HTTP (con sus conexiones ya abiertas).
+# Cuando un script se ejecuta por separado crea su propio Contexto.
+#
+# Las librerías pesadas (requests) no se importan hasta que alguien pide el
+# acceso a HDFS o la sesión: las etapas que no hablan con HDFS (generación de
+# datos...) no pagan ese coste.
+#
+# Backend de HDFS (variables de entorno, para no tener que pasarlo a cada script):
+#   HDFS_BACKEND=webhdfs  -> Clúster real (por defecto).
+#   HDFS_BACKEND=local    -> Un directorio local hace de HDFS (HDFS_RAIZ_LOCAL), sin clúster.
+#   HDFS_DATOS=docker     -> Los datos se mueven por el puente docker (por defecto).
+#   HDFS_DATOS=webhdfs    -> Los datos viajan por WebHDFS directo (el host debe resolver los DataNodes).
+#
+# Uso:
+#   from contexto import Contexto
+#   ctx = ctx or Contexto()
+#   ctx.hdfs.listar("/data")
+
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN POR DEFECTO
+# ---------------------------------------------------------
+# Conexión WebHDFS (misma que en 00_bootstrap.py)
+HDFS_URL = "http://localhost:9870"
+HDFS_USER = "hdadmin"
+
+DIR_SCRIPTS = Path(__file__).resolve().parent
+
+BACKEND = os.environ.get("HDFS_BACKEND", "webhdfs")
+DATOS = os.environ.get("HDFS_DATOS", "docker")
+RAIZ_LOCAL = Path(os.environ.get("HDFS_RAIZ_LOCAL", DIR_SCRIPTS.parent / ".cache" / "hdfs_local"))
+
+# Conexiones HTTP keep-alive que la sesión mantiene abiertas con el NameNode.
+# Cubre los hilos de copia/checksum de 40 y 50 y las etapas que corren en paralelo.
+TAM_POOL_HTTP = 16
+
+# ---------------------------------------------------------
+# 2. CONTEXTO
+# ---------------------------------------------------------
+class Contexto:
+    """
+    Configuración de conexión y recursos compartidos entre etapas.
+    La sesión y los accesos a HDFS se crean la primera vez que se usan (y una sola
+    vez, aunque varias etapas los pidan a la vez desde hilos distintos).
+    """
+    def __init__(self, hdfs_url=HDFS_URL, hdfs_user=HDFS_USER, backend=BACKEND, datos=DATOS, raiz_local=RAIZ_LOCAL):
+        self.hdfs_url = hdfs_url
+        self.hdfs_user = hdfs_user
+        self.backend = backend
+        self.datos = datos
+        self.raiz_local = Path(raiz_local)
+        self._sesion = None
+        self._accesos = {}
+        self._cerrojo = threading.Lock()
+
+    @property
+    def local(self):
+        """True si HDFS es un directorio local (no hay clúster, ni JMX, ni contenedores)."""
+        return self.backend == "local"
+
+    @property
+    def sesion(self):
+        """Sesión HTTP (requests) reutilizada por todas las peticiones WebHDFS, fsck y JMX."""
+        with self._cerrojo:
+            if self._sesion is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                self._sesion = requests.Session()
+                self._sesion.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=TAM_POOL_HTTP))
+            return self._sesion
+
+    @property
+    def hdfs(self):
+        """Acceso a HDFS con el camino de datos por defecto del contexto."""
+        return self.acceso()
+
+    def acceso(self, datos=None):
+        """
+        Acceso a HDFS (hdfs_io) con un camino de datos concreto: "docker" o "webhdfs".
+        Los metadatos van siempre por la sesión compartida. En el backend local da igual.
+        """
+        datos = datos or self.datos
+        sesion = None if self.local else self.sesion
+        with self._cerrojo:
+            if datos not in self._accesos:
+                from hdfs_io import crear_backend
+                self._accesos[datos] = crear_backend(self.backend, self.hdfs_url, self.hdfs_user, sesion,
+                                                     datos, self.raiz_local)
+            return self._accesos[datos]
+
+# ---------------------------------------------------------
+# 3. CARGA DE ETAPAS
+# ---------------------------------------------------------
+# Las etapas paralelas de 90_run_all.py pueden pedir el mismo script a la vez: sin
+# cerrojo, un hilo vería en sys.modules un módulo a medio ejecutar (sin sus funciones).
+# Es reentrante porque un script puede cargar otro mientras se importa.
+_CERROJO_ETAPAS = threading.RLock()
+
+def cargar_etapa(script):
+    """
+    Importa un script del pipeline (p.ej. "20_ingest_hdfs.py") como módulo.
+    Los nombres empiezan por número y no se pueden importar con 'import', así
+    que lo hacemos con importlib. El módulo se guarda en sys.modules: cada
+    script se importa una sola vez aunque lo usen varias etapas.
+    """
+    nombre = "etapa_" + Path(script).stem
+    with _CERROJO_ETAPAS:
+        if nombre not in sys.modules:
+            spec = importlib.util.spec_from_file_location(nombre, DIR_SCRIPTS / script)
+            modulo = importlib.util.module_from_spec(spec)
+            sys.modules[nombre] = modulo
+            try:
+                spec.loader.exec_module(modulo)
+            except BaseException:
+                del sys.modules[nombre]
+                raise
+        return sys.modules[nombre]
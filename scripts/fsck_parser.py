@@ -0,0 +1,229 @@
+# Parser incremental de la salida de 'hdfs fsck <ruta> -files -blocks -locations'
+#
+# Con muchos archivos la salida de fsck ocupa cientos de MB. En lugar de cargarla
+# entera en un string y pasarle expresiones regulares, la leemos línea a línea y
+# vamos generando registros tipados (archivo, bloque, réplica y resumen final).
+# La memoria es constante: solo guardamos el archivo que se está leyendo.
+#
+# Uso:
+#   from fsck_parser import parsear_fsck
+#   for registro in parsear_fsck(lineas):
+#       ...
+#   resumen, totales = volcar_fsck(proceso.stdout, ruta_txt, ruta_jsonl)
+
+import json
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+# ---------------------------------------------------------
+# 1. REGISTROS
+# ---------------------------------------------------------
+# Cada registro lleva un campo 'tipo' para poder escribirse como una línea JSONL.
+
+@dataclass
+class Archivo:
+    ruta: str
+    tam: int
+    replicacion: int          # Factor de replicación pedido (0 si es erasure coding)
+    bloques: int
+    estado: str = "OK"        # OK | UNDER_REPLICATED | MISSING | CORRUPT
+    bloques_perdidos: int = 0
+    bloques_corruptos: int = 0
+    bloques_subreplicados: int = 0
+    tipo: str = "archivo"
+
+@dataclass
+class Bloque:
+    ruta: str
+    indice: int
+    pool: str
+    bloque: str
+    tam: int
+    replicas_vivas: int
+    estado: str = "OK"        # OK | UNDER_REPLICATED | MISSING | CORRUPT
+    replicas: list = field(default_factory=list)   # ["ip:puerto", ...]
+    tipo: str = "bloque"
+
+@dataclass
+class Replica:
+    ruta: str
+    bloque: str
+    ip: str
+    puerto: int
+    almacenamiento: str       # Identificador del volumen (DS-...)
+    medio: str                # DISK, SSD, ARCHIVE...
+    tipo: str = "replica"
+
+@dataclass
+class Resumen:
+    ruta: str = ""
+    estado: str = ""          # HEALTHY | CORRUPT (línea 'Status:')
+    contadores: dict = field(default_factory=dict)
+    lineas: list = field(default_factory=list)     # Texto del resumen tal cual, para mostrarlo
+    tipo: str = "resumen"
+
+# ---------------------------------------------------------
+# 2. PATRONES DE LA SALIDA DE FSCK
+# ---------------------------------------------------------
+# /data/logs/raw/dt=.../logs.log 536870912 bytes, replicated: replication=3, 8 block(s):  OK
+RE_ARCHIVO = re.compile(
+    r"^(?P<ruta>/.*?) (?P<tam>\d+) bytes, "
+    r"(?:replicated: replication=(?P<rep>\d+)|erasure-coded: policy=\S+), "
+    r"(?P<bloques>\d+) block\(s\):\s*(?P<resto>.*)$")
+
+# 0. BP-...:blk_1073741825_1001 len=67108864 Live_repl=3  [DatanodeInfoWithStorage[...], ...]
+RE_BLOQUE = re.compile(
+    r"^(?P<indice>\d+)\. (?P<pool>BP-[^:]+):(?P<bloque>blk_-?\d+)_\d+ len=(?P<tam>\d+)(?P<resto>.*)$")
+RE_VIVAS = re.compile(r"Live_repl=(\d+)")
+RE_REPLICA = re.compile(r"DatanodeInfoWithStorage\[([^:\]]+):(\d+),([^,\]]+),(\w+)\]")
+
+# Contadores del resumen: ' Corrupt blocks:		0' o ' Under-replicated blocks:	0 (0.0 %)'
+RE_CONTADOR = re.compile(r"^\s*([A-Za-z][\w .()/-]*?):\s+(-?\d+(?:\.\d+)?)")
+RE_ESTADO_FINAL = re.compile(r"^The filesystem under path '(.*)' is (\w+)")
+
+# Secciones del resumen: los contadores de erasure coding llevan el prefijo 'ec_'
+SECCIONES = {"Replicated Blocks:": "", "Erasure Coded Block Groups:": "ec_"}
+
+# Prioridad de estados: nos quedamos con el más grave
+GRAVEDAD = {"OK": 0, "UNDER_REPLICATED": 1, "MISSING": 2, "CORRUPT": 3}
+
+def clave(texto):
+    """'Under-replicated blocks' -> 'under_replicated_blocks'"""
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+def empeorar(actual, nuevo):
+    return nuevo if GRAVEDAD[nuevo] > GRAVEDAD[actual] else actual
+
+def estado_problema(detalle):
+    """
+    Estado de las líneas de problemas que fsck escribe aparte para cada archivo:
+      '<ruta>: CORRUPT blockpool ...', '<ruta>: MISSING 1 blocks of total size ...'
+      '<ruta>:  Under replicated BP-...'
+    """
+    detalle = detalle.strip()
+    if detalle.startswith("CORRUPT"):
+        return "CORRUPT"
+    if detalle.startswith("MISSING"):
+        return "MISSING"
+    if detalle.startswith("Under replicated"):
+        return "UNDER_REPLICATED"
+    return "OK"
+
+# ---------------------------------------------------------
+# 3. PARSER
+# ---------------------------------------------------------
+def parsear_fsck(lineas):
+    """
+    Generador: consume la salida de fsck línea a línea y produce registros.
+    Orden de salida: los bloques y réplicas de un archivo según aparecen, y el
+    registro Archivo cuando termina (ya con su estado final). El Resumen va al final.
+    """
+    actual = None            # Archivo que se está leyendo
+    resumen = None           # Se crea al llegar a 'Status:'
+    prefijo = ""
+
+    for linea in lineas:
+        linea = linea.rstrip("\n")
+
+        # --- PARTE FINAL: RESUMEN ---
+        if resumen is not None:
+            resumen.lineas.append(linea)
+            final = RE_ESTADO_FINAL.match(linea)
+            if final:
+                resumen.ruta, resumen.estado = final.group(1), final.group(2)
+            elif linea.strip() in SECCIONES:
+                prefijo = SECCIONES[linea.strip()]
+            else:
+                contador = RE_CONTADOR.match(linea)
+                if contador:
+                    valor = contador.group(2)
+                    resumen.contadores[prefijo + clave(contador.group(1))] = float(valor) if "." in valor else int(valor)
+            continue
+
+        if linea.startswith("Status:"):
+            if actual:
+                yield actual
+                actual = None
+            resumen = Resumen(estado=linea.split(":", 1)[1].strip(), lineas=[linea])
+            continue
+
+        # --- NUEVO ARCHIVO ---
+        cabecera = RE_ARCHIVO.match(linea)
+        if cabecera:
+            if actual:
+                yield actual
+            actual = Archivo(ruta=cabecera.group("ruta"), tam=int(cabecera.group("tam")),
+                             replicacion=int(cabecera.group("rep") or 0), bloques=int(cabecera.group("bloques")))
+            actual.estado = estado_problema(cabecera.group("resto"))
+            continue
+
+        if actual is None:
+            continue     # Cabecera de fsck, directorios (<dir>), líneas en blanco...
+
+        # --- BLOQUE DEL ARCHIVO ACTUAL ---
+        bloque = RE_BLOQUE.match(linea)
+        if bloque:
+            resto = bloque.group("resto")
+            vivas = RE_VIVAS.search(resto)
+            registro = Bloque(ruta=actual.ruta, indice=int(bloque.group("indice")), pool=bloque.group("pool"),
+                              bloque=bloque.group("bloque"), tam=int(bloque.group("tam")),
+                              replicas_vivas=int(vivas.group(1)) if vivas else 0)
+            if "MISSING" in resto:
+                registro.estado = "MISSING"
+                actual.bloques_perdidos += 1
+            elif "CORRUPT" in resto.upper():
+                registro.estado = "CORRUPT"
+                actual.bloques_corruptos += 1
+            elif actual.replicacion and registro.replicas_vivas < actual.replicacion:
+                registro.estado = "UNDER_REPLICATED"
+                actual.bloques_subreplicados += 1
+            actual.estado = empeorar(actual.estado, registro.estado)
+
+            replicas = [Replica(ruta=actual.ruta, bloque=registro.bloque, ip=ip, puerto=int(puerto),
+                                almacenamiento=almacenamiento, medio=medio)
+                        for ip, puerto, almacenamiento, medio in RE_REPLICA.findall(resto)]
+            registro.replicas = [f"{r.ip}:{r.puerto}" for r in replicas]
+            yield registro
+            yield from replicas
+            continue
+
+        # --- LÍNEAS DE PROBLEMAS DEL ARCHIVO ACTUAL ---
+        if linea.startswith(actual.ruta + ": "):
+            actual.estado = empeorar(actual.estado, estado_problema(linea[len(actual.ruta) + 2:]))
+
+    if actual:
+        yield actual
+    if resumen:
+        yield resumen
+
+# ---------------------------------------------------------
+# 4. VOLCADO: TEXTO ORIGINAL + REPORTE ESTRUCTURADO
+# ---------------------------------------------------------
+def volcar_fsck(lineas, ruta_txt, ruta_jsonl):
+    """
+    Recorre la salida de fsck una sola vez y escribe a la vez:
+      - ruta_txt:   el texto original, tal cual (evidencia y compatibilidad con el notebook).
+      - ruta_jsonl: un registro JSON por línea (archivos, bloques y resumen).
+        Las réplicas ya van dentro de su bloque ("ip:puerto"), así el reporte es compacto.
+    Devuelve (Resumen, Counter con los registros por tipo y estado).
+    """
+    totales = Counter()
+    resumen = Resumen()
+    with open(ruta_txt, "w", encoding="utf-8") as txt, open(ruta_jsonl, "w", encoding="utf-8") as salida:
+
+        def copiar(lineas):
+            for linea in lineas:
+                txt.write(linea)
+                yield linea
+
+        for registro in parsear_fsck(copiar(lineas)):
+            totales[registro.tipo] += 1
+            if registro.tipo == "replica":
+                continue
+            if registro.tipo == "resumen":
+                resumen = registro
+            else:
+                totales[f"{registro.tipo}_{registro.estado}"] += 1
+            salida.write(json.dumps(asdict(registro), ensure_ascii=False) + "\n")
+    return resumen, totales
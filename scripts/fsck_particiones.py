@@ -0,0 +1,376 @@
+# Auditoría fsck por particiones con caché de huellas (usada por 30 y 60)
+#
+# 'hdfs fsck /data -files -blocks -locations' recorre todo el histórico en cada
+# auditoría: el coste crece con cada día guardado. Aquí la capa se divide en
+# unidades (cada partición dt=... de cada familia) y:
+#
+#   1. De cada partición se calcula una huella con su listado (nombres, tamaños,
+#      fechas de modificación, replicación y tamaño de bloque) y con la ubicación de
+#      los bloques de cada archivo (GETFILEBLOCKLOCATIONS: DataNodes de cada réplica
+#      y marca de corrupto). Solo metadatos, todo lo responde el NameNode.
+#   2. Si la huella coincide con la de la última auditoría limpia (HEALTHY y sin
+#      archivos con problemas) y el clúster no tiene bloques perdidos, corruptos ni
+#      sub-replicados ni nodos muertos (JMX, salud_cluster.py), la partición no se
+#      vuelve a auditar: se reutiliza su resultado guardado en la caché local.
+#   3. El resto se audita con un fsck por partición, varias a la vez (HILOS_FSCK).
+#   4. Los resultados se unen en un solo reporte con el mismo formato que el fsck
+#      de toda la capa: los archivos y bloques de cada partición y un resumen final
+#      con los contadores sumados. El notebook y fsck_parser.py lo leen igual.
+#
+# Con 'fecha' (backfill, variable DT) solo se auditan las particiones dt=<fecha>: el
+# reporte de ese día y su fila del histórico describen esa fecha, no toda la capa.
+# Varias fechas del backfill comparten la caché de la capa a la vez, así que su
+# índice se actualiza con un cerrojo (archivo creado en exclusiva): cada proceso
+# relee el índice del disco y solo aplica sus propios cambios.
+#
+# El cuerpo guardado lleva las réplicas de cada bloque (-locations), que 65 usa para
+# su índice: si el balanceador o una re-replicación mueve una réplica, la huella
+# cambia y la partición se audita de nuevo. Además, en cuanto el NameNode ve
+# cualquier problema (p.ej. tras la caída de 70), se auditan todas las particiones.
+#
+# Uso:
+#   resumen, totales, estadisticas = auditar_capa(ctx, "/data", ruta_txt, ruta_jsonl)
+#   resumen, totales, estadisticas = auditar_capa(ctx, "/data", ruta_txt, ruta_jsonl, fecha="2026-02-05")
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from fsck_parser import parsear_fsck, volcar_fsck, clave, RE_CONTADOR, RE_ESTADO_FINAL, SECCIONES
+from salud_cluster import leer_metricas, sano
+from trazas import tramo, sumar, propagar
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+# Particiones auditadas a la vez (cada fsck es una petición al NameNode)
+HILOS_FSCK = 4
+
+# Prefijo de las carpetas que forman una partición
+PREFIJO_PARTICION = "dt="
+
+# Caché local: por capa, un índice JSON y el cuerpo del fsck de cada partición limpia
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+DIR_CACHE = RAIZ_PROYECTO / ".cache" / "fsck"
+
+# Cerrojo del índice de la caché: espera máxima y antigüedad a partir de la cual se
+# da por abandonado (un proceso que murió sin soltarlo)
+ESPERA_CERROJO = 120
+CADUCIDAD_CERROJO = 300
+
+# Contadores del resumen que no se suman entre particiones: se toma el mayor
+MAXIMOS = {"number_of_data_nodes", "number_of_racks", "default_replication_factor"}
+
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 2. PARTICIONES Y HUELLAS
+# ---------------------------------------------------------
+def unidades(hdfs, ruta):
+    """
+    Unidades de auditoría de una capa: cada carpeta dt=... (se audita con todo lo
+    que tenga dentro) y cada archivo suelto que no esté en ninguna partición.
+    """
+    for entrada in hdfs.listar(ruta):
+        hija = f"{ruta}/{entrada['pathSuffix']}"
+        if entrada["type"] != "DIRECTORY":
+            yield hija
+        elif entrada["pathSuffix"].startswith(PREFIJO_PARTICION):
+            yield hija
+        else:
+            yield from unidades(hdfs, hija)
+
+def huella(hdfs, unidad):
+    """
+    Huella del listado (recursivo) de una unidad y de las réplicas de sus bloques:
+    cambia si cambia cualquier archivo o se mueve, se pierde o se corrompe una réplica.
+    None si no se pudo calcular (la unidad se audita y no entra en la caché).
+    """
+    sha = hashlib.sha256()
+    try:
+        estado = hdfs.estado(unidad)
+        if estado is None:
+            raise FileNotFoundError(f"{unidad}: no existe")
+        pendientes = [(unidad, estado)]
+        while pendientes:
+            ruta, e = pendientes.pop()
+            sha.update(f"{ruta}|{e['type']}|{e['length']}|{e['modificationTime']}|"
+                       f"{e.get('replication')}|{e.get('blockSize')}\n".encode())
+            if e["type"] == "DIRECTORY":
+                pendientes.extend((f"{ruta}/{h['pathSuffix']}", h) for h in hdfs.listar(ruta))
+                continue
+            for b in hdfs.ubicaciones(ruta):
+                sha.update(f"  {b['offset']}|{b['length']}|{','.join(sorted(b['names']))}|"
+                           f"{b.get('corrupt', False)}\n".encode())
+    except IOError as e:  # Borrada a mitad del listado, o error del NameNode
+        print(f"[{ahora()}] [WARN]  No se pudo calcular la huella de {unidad} ({e}): se audita de nuevo.")
+        return None
+    return sha.hexdigest()
+
+def cluster_sano(ctx):
+    """True si el NameNode no ve problemas de bloques ni nodos muertos (siempre con backend local)."""
+    if ctx.local:
+        return True
+    try:
+        return sano(leer_metricas(ctx.sesion))
+    except Exception:  # Sin JMX no podemos asegurar nada: se audita todo
+        return False
+
+def de_la_fecha(unidad, fecha):
+    """True si la unidad es la partición dt=<fecha> de alguna familia."""
+    return unidad.rsplit("/", 1)[-1] == f"{PREFIJO_PARTICION}{fecha}"
+
+# ---------------------------------------------------------
+# 3. CACHÉ DE PARTICIONES LIMPIAS
+# ---------------------------------------------------------
+@contextmanager
+def cerrojo(ruta, espera=ESPERA_CERROJO, caducidad=CADUCIDAD_CERROJO):
+    """
+    Cerrojo entre procesos: el que consigue crear 'ruta' en exclusiva (O_EXCL) lo
+    tiene hasta que la borra. Uno más antiguo que 'caducidad' se da por abandonado.
+    """
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta) > caducidad:
+                    os.unlink(ruta)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TimeoutError(f"No se pudo tomar el cerrojo {ruta} en {espera} s")
+            time.sleep(0.1)
+    try:
+        os.write(descriptor, str(os.getpid()).encode())
+        os.close(descriptor)
+        yield
+    finally:
+        Path(ruta).unlink(missing_ok=True)
+
+class CacheFsck:
+    """
+    Índice {unidad: {"huella", "fecha", "resumen": [líneas]}} de las particiones cuya
+    última auditoría fue limpia, y el cuerpo de su fsck (archivos y bloques) en un
+    archivo por partición. Los cambios se apuntan aparte y cerrar() los aplica sobre
+    el índice del disco, bajo el cerrojo: otro proceso puede haberlo cambiado.
+    """
+    def __init__(self, capa):
+        self.carpeta = DIR_CACHE / capa.strip("/")
+        self.ruta_indice = self.carpeta / "indice.json"
+        self.indice = self._leer()
+        self.cambios = {}                       # unidad -> entrada nueva, o None si se olvida
+
+    def _leer(self):
+        return json.loads(self.ruta_indice.read_text(encoding="utf-8")) if self.ruta_indice.exists() else {}
+
+    def cuerpo(self, unidad):
+        return self.carpeta / (hashlib.sha1(unidad.encode()).hexdigest()[:16] + ".txt")
+
+    def vigente(self, unidad, huella_actual):
+        entrada = self.indice.get(unidad)
+        return (huella_actual is not None and entrada is not None and entrada["huella"] == huella_actual
+                and self.cuerpo(unidad).exists())
+
+    def guardar(self, unidad, huella_actual, cuerpo, resumen):
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        temporal = self.cuerpo(unidad).with_suffix(f".{os.getpid()}.tmp")
+        temporal.write_bytes(Path(cuerpo).read_bytes())
+        temporal.replace(self.cuerpo(unidad))
+        self.cambios[unidad] = {"huella": huella_actual, "fecha": datetime.now().isoformat(timespec="seconds"),
+                                "resumen": resumen.lineas}
+
+    def olvidar(self, unidad):
+        self.cambios[unidad] = None
+
+    def cerrar(self, vigentes, alcance=lambda unidad: True):
+        """
+        Aplica los cambios sobre el índice del disco y lo guarda de forma atómica,
+        quitando las particiones de 'alcance' (lo auditado) que ya no existen.
+        """
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        with cerrojo(self.ruta_indice.with_suffix(".lock")):
+            self.indice = self._leer()
+            for unidad in set(self.indice) - set(vigentes):
+                if alcance(unidad):
+                    self.cambios.setdefault(unidad, None)
+            for unidad, entrada in self.cambios.items():
+                if entrada is not None:
+                    self.indice[unidad] = entrada
+                elif self.indice.pop(unidad, None) is not None:
+                    self.cuerpo(unidad).unlink(missing_ok=True)
+            temporal = self.ruta_indice.with_suffix(f".{os.getpid()}.tmp")
+            temporal.write_text(json.dumps(self.indice, indent=1), encoding="utf-8")
+            temporal.replace(self.ruta_indice)
+        self.cambios = {}
+
+# ---------------------------------------------------------
+# 4. FSCK DE UNA PARTICIÓN
+# ---------------------------------------------------------
+def auditar_unidad(hdfs, unidad, destino):
+    """
+    fsck de una unidad. Guarda en 'destino' las líneas de sus archivos y bloques
+    (sin la cabecera ni el resumen) y devuelve (Resumen, hay archivos con problemas).
+    """
+    resumen, problemas = None, False
+    with tramo("fsck", ruta=unidad), hdfs.fsck(unidad) as lineas, open(destino, "w", encoding="utf-8") as cuerpo:
+
+        def copiar(lineas):
+            en_cuerpo = True
+            for linea in lineas:
+                if linea.startswith("Status:"):
+                    en_cuerpo = False
+                elif en_cuerpo and not linea.startswith(("FSCK started by", "Connecting to namenode")):
+                    cuerpo.write(linea)
+                yield linea
+
+        for registro in parsear_fsck(copiar(lineas)):
+            if registro.tipo == "resumen":
+                resumen = registro
+            elif registro.tipo == "archivo" and registro.estado != "OK":
+                problemas = True
+    if resumen is None:
+        raise OSError(f"fsck de {unidad} terminó sin resumen")
+    return resumen, problemas
+
+# ---------------------------------------------------------
+# 5. UNIÓN DE LOS RESÚMENES
+# ---------------------------------------------------------
+def contadores_de(lineas):
+    """Contadores de un resumen en texto (mismas claves que fsck_parser.Resumen.contadores)."""
+    contadores, prefijo = {}, ""
+    for linea in lineas:
+        if linea.strip() in SECCIONES:
+            prefijo = SECCIONES[linea.strip()]
+            continue
+        contador = RE_CONTADOR.match(linea)
+        if contador:
+            valor = contador.group(2)
+            contadores[prefijo + clave(contador.group(1))] = float(valor) if "." in valor else int(valor)
+    return contadores
+
+def sumar_contadores(resumenes):
+    """
+    Suma los contadores de varias particiones. Los que describen el clúster (nodos,
+    racks, replicación por defecto) se toman del mayor, y las medias se ponderan
+    por el número de bloques de cada partición.
+    """
+    total, pesos = {}, {}
+    for lineas in resumenes:
+        contadores = contadores_de(lineas)
+        bloques = contadores.get("total_blocks_validated", 0)
+        for nombre, valor in contadores.items():
+            if nombre in MAXIMOS:
+                total[nombre] = max(total.get(nombre, 0), valor)
+            elif "average" in nombre:
+                total[nombre] = total.get(nombre, 0) + valor * bloques
+                pesos[nombre] = pesos.get(nombre, 0) + bloques
+            else:
+                total[nombre] = total.get(nombre, 0) + valor
+    for nombre, peso in pesos.items():
+        total[nombre] = round(total[nombre] / peso, 3) if peso else 0.0
+    return total
+
+def lineas_resumen(plantilla, contadores, capa, estado, segundos):
+    """
+    Resumen de la capa con el formato de fsck: se toma el de una partición como
+    plantilla y se cambia cada número por el total (sin los porcentajes, que ya no valen).
+    """
+    prefijo = ""
+    for linea in plantilla:
+        if linea.startswith("Status:"):
+            yield f"Status: {estado}"
+            continue
+        if linea.strip() in SECCIONES:
+            prefijo = SECCIONES[linea.strip()]
+        contador = RE_CONTADOR.match(linea)
+        if contador and prefijo + clave(contador.group(1)) in contadores:
+            valor = contadores[prefijo + clave(contador.group(1))]
+            unidad = " B" if linea[contador.end(2):].startswith(" B") else ""
+            yield linea[:contador.start(2)] + f"{valor}{unidad}"
+        elif linea.startswith("FSCK ended at"):
+            yield f"FSCK ended at {datetime.now().strftime('%a %b %d %H:%M:%S %Z %Y')} in {int(segundos * 1000)} milliseconds"
+        elif RE_ESTADO_FINAL.match(linea):
+            yield f"The filesystem under path '{capa}' is {estado}"
+        else:
+            yield linea
+
+# ---------------------------------------------------------
+# 6. AUDITORÍA DE UNA CAPA
+# ---------------------------------------------------------
+def auditar_capa(ctx, capa, ruta_txt, ruta_jsonl, hilos=HILOS_FSCK, usar_cache=True, fecha=None):
+    """
+    Audita 'capa' partición a partición y escribe el reporte unido (texto + JSONL,
+    como volcar_fsck). Con 'fecha' solo las particiones dt=<fecha>.
+    Devuelve (Resumen, totales, {"auditadas", "reutilizadas"}).
+    """
+    hdfs = ctx.hdfs
+    inicio = time.perf_counter()
+    cache = CacheFsck(capa)
+
+    # Saltarse particiones solo es seguro si el NameNode no ve ningún problema
+    reutilizar = usar_cache and cluster_sano(ctx)
+    if usar_cache and not reutilizar:
+        print(f"[{ahora()}] [WARN]  El clúster tiene bloques con problemas o nodos caídos: se auditan todas las particiones.")
+
+    lista = sorted(unidades(hdfs, capa))
+    if fecha:
+        lista = [u for u in lista if de_la_fecha(u, fecha)]
+        if not lista:
+            raise FileNotFoundError(f"No hay particiones {PREFIJO_PARTICION}{fecha} en {capa}")
+    if not lista:
+        # Capa vacía: un único fsck de la carpeta (deja el resumen con los contadores a 0)
+        with tramo("fsck", ruta=capa), hdfs.fsck(capa) as lineas:
+            resumen, totales = volcar_fsck(lineas, ruta_txt, ruta_jsonl)
+        return resumen, totales, {"auditadas": 0, "reutilizadas": 0}
+
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="huellas") as pool:
+        huellas = dict(zip(lista, pool.map(propagar(lambda unidad: huella(hdfs, unidad)), lista)))
+    pendientes = [u for u in lista if not (reutilizar and cache.vigente(u, huellas[u]))]
+    print(f"[{ahora()}] [INFO]  {len(lista)} particiones en {capa}: {len(pendientes)} a auditar, "
+          f"{len(lista) - len(pendientes)} sin cambios desde la última auditoría limpia.")
+
+    with tempfile.TemporaryDirectory(prefix="fsck_") as temporal:
+        cuerpos = {u: cache.cuerpo(u) for u in lista if u not in pendientes}
+        resumenes = {u: cache.indice[u]["resumen"] for u in cuerpos}
+        estados = {}
+
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="fsck") as pool:
+            destinos = {u: Path(temporal) / f"{i}.txt" for i, u in enumerate(pendientes)}
+            futuros = {u: pool.submit(propagar(auditar_unidad), hdfs, u, destinos[u]) for u in pendientes}
+            for unidad, futuro in futuros.items():
+                resumen, problemas = futuro.result()
+                cuerpos[unidad] = destinos[unidad]
+                resumenes[unidad] = resumen.lineas
+                estados[unidad] = resumen.estado
+                # Solo las particiones limpias (y con huella) entran en la caché
+                if resumen.estado == "HEALTHY" and not problemas and huellas[unidad] is not None:
+                    cache.guardar(unidad, huellas[unidad], cuerpos[unidad], resumen)
+                else:
+                    cache.olvidar(unidad)
+        cache.cerrar(lista, alcance=(lambda u: de_la_fecha(u, fecha)) if fecha else (lambda u: True))
+        sumar(particiones_auditadas=len(pendientes), particiones_reutilizadas=len(lista) - len(pendientes))
+
+        # El estado de la capa es el peor de sus particiones (las reutilizadas estaban HEALTHY)
+        estado = next((e for e in estados.values() if e != "HEALTHY"), "HEALTHY")
+        contadores = sumar_contadores(resumenes[u] for u in lista)
+
+        def reporte():
+            yield f"FSCK started by pipeline for path {capa} at {datetime.now().strftime('%a %b %d %H:%M:%S %Z %Y')} " \
+                  f"({len(pendientes)} particiones auditadas, {len(lista) - len(pendientes)} reutilizadas)\n"
+            for unidad in lista:
+                with open(cuerpos[unidad], encoding="utf-8") as cuerpo:
+                    yield from cuerpo
+            yield from (linea + "\n" for linea in lineas_resumen(resumenes[lista[0]], contadores, capa, estado,
+                                                                  time.perf_counter() - inicio))
+
+        resumen, totales = volcar_fsck(reporte(), ruta_txt, ruta_jsonl)
+    return resumen, totales, {"auditadas": len(pendientes), "reutilizadas": len(lista) - len(pendientes)}
@@ -0,0 +1,741 @@
+# Capa de acceso a HDFS compartida por todos los scripts del pipeline
+#
+# Antes cada script construía sus propios comandos 'docker exec namenode hdfs dfs ...'
+# (-mkdir, -test, -du, -stat, -rm, -setrep, fsck...). Cada uno arranca una JVM
+# dentro del contenedor (1-2 s por llamada), y en las operaciones pequeñas eso es
+# casi todo el tiempo. Aquí las reunimos detrás de una sola interfaz con dos backends:
+#
+#   HDFSWeb   -> Clúster real. Los metadatos (listados, estados, mkdir, borrados,
+#                renombrados, replicación, uso de disco) y el fsck van por HTTP al
+#                NameNode, sobre una sesión con conexiones keep-alive reutilizadas
+#                (ninguna JVM). Para mover datos hay dos caminos:
+#                  "docker"  -> Puente docker cp / 'hdfs dfs' (o curl, para los rangos)
+#                               dentro del NameNode (por defecto: el host no resuelve
+#                               los DataNodes, ver README).
+#                  "webhdfs" -> Streaming directo siguiendo la redirección al DataNode.
+#   HDFSLocal -> Un directorio del disco local hace de HDFS. Permite ejecutar y
+#                probar el pipeline sin clúster (HDFS_BACKEND=local).
+#
+# Los listados devuelven el mismo formato que WebHDFS (FileStatus):
+#   {"pathSuffix": "a.log", "type": "FILE", "length": 123, "modificationTime": 1700000000000, ...}
+#
+# Uso:
+#   hdfs = ctx.hdfs                      # Backend configurado en el Contexto
+#   hdfs.crear_directorio("/audit/fsck/dt=2026-02-05")
+#   with hdfs.fsck("/data") as lineas:
+#       ...
+#   datos = hdfs.leer_rango(ruta, offset=0, longitud=65536)
+#   trozos = hdfs.leer_rangos(ruta, [(0, 65536), (1048576, 65536)])   # Una sola llamada
+#   with FlujoEscritura(hdfs, "/data/logs/raw/dt=2026-02-05/logs.log") as f:
+#       f.write(lote)                    # Se sube mientras se sigue generando
+#
+# Cada llamada a HDFS se mide (trazas.py): latencia por operación y bytes leídos y
+# escritos, que se suman al tramo de la etapa en curso.
+
+import hashlib
+import math
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from urllib.parse import quote
+from trazas import llamada_hdfs, sumar, propagar
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+# Contenedor del NameNode y carpeta temporal del puente docker
+CONTENEDOR = "namenode"
+DIR_TEMPORAL = "/tmp"
+
+# WebHDFS visto desde dentro del contenedor del NameNode (red del clúster: ahí sí
+# se resuelven los DataNodes a los que redirige OPEN)
+URL_INTERNA = "http://localhost:9870"
+
+# Lectura de varios rangos en un solo 'docker exec': un bucle de curl dentro del
+# contenedor que escribe cada trozo precedido de su longitud en una línea
+# ("<bytes>\n<datos>"), para poder separarlos aunque alguno venga más corto.
+SCRIPT_RANGOS = (
+    'command -v curl >/dev/null 2>&1 || { echo "curl no disponible" >&2; exit 127; }\n'
+    't=$(mktemp) || exit 1\n'
+    'trap \'rm -f "$t"\' EXIT\n'
+    'for url in "$@"; do\n'
+    '  curl -sSfL -o "$t" "$url" || exit 1\n'
+    '  wc -c < "$t"\n'
+    '  cat "$t"\n'
+    'done\n'
+)
+
+# Timeout de cada petición HTTP al NameNode (las de datos pueden tardar más)
+TIMEOUT_METADATOS = 60
+TIMEOUT_DATOS = 600
+
+# Tamaño de bloque del clúster (hdfs-site.xml). El backend local lo usa para
+# repartir cada archivo en bloques en su fsck simulado.
+TAM_BLOQUE = 64 * 1024 * 1024
+TAM_BUFFER = 8 * 1024 * 1024
+
+class ErrorHDFS(IOError):
+    """Error devuelto por HDFS (RemoteException de WebHDFS o comando fallido del puente docker)."""
+
+def nombre_de(ruta):
+    return PurePosixPath(ruta).name
+
+def carpeta_de(ruta):
+    return str(PurePosixPath(ruta).parent)
+
+def trozos(datos, tam_buffer=TAM_BUFFER):
+    """Convierte bytes, un archivo binario abierto o un iterable de bytes en un generador de trozos."""
+    if isinstance(datos, (bytes, bytearray)):
+        yield bytes(datos)
+    elif hasattr(datos, "read"):
+        yield from iter(lambda: datos.read(tam_buffer), b"")
+    else:
+        yield from datos
+
+def contar(datos, contador):
+    """Deja pasar los trozos de datos sumando sus bytes al tramo en curso (bytes_leidos/bytes_escritos)."""
+    for trozo in datos:
+        sumar(**{contador: len(trozo)})
+        yield trozo
+
+def parsear_checksum(salida, ruta):
+    """
+    Convierte la salida de 'hdfs dfs -checksum' ("<ruta>\t<algoritmo>\t<bytes en hex>")
+    al formato FileChecksum de WebHDFS.
+    """
+    lineas = [linea for linea in salida.splitlines() if linea.strip()]
+    partes = lineas[-1].rsplit("\t", 2) if lineas else []
+    if len(partes) != 3 or partes[1] == "NONE" or not partes[2]:
+        raise ErrorHDFS(f"{ruta}: checksum no disponible ({salida.strip() or 'sin salida'})")
+    _, algoritmo, valor = partes
+    return {"algorithm": algoritmo, "bytes": valor.strip(), "length": len(valor.strip()) // 2}
+
+def legible(n):
+    """Bytes en formato corto, como 'hdfs dfs -du -h' (p.ej. 256.0 M)."""
+    for unidad in ("", " K", " M", " G", " T"):
+        if n < 1024 or unidad == " T":
+            return f"{n:.1f}{unidad}" if unidad else str(int(n))
+        n /= 1024
+
+# ---------------------------------------------------------
+# 2. BACKEND WEBHDFS (CLÚSTER REAL)
+# ---------------------------------------------------------
+class HDFSWeb:
+    """
+    Acceso al clúster: metadatos y fsck por HTTP al NameNode; datos por el puente
+    docker o por WebHDFS directo según 'datos'. 'sesion' es una requests.Session
+    compartida (la del Contexto), así todas las llamadas reutilizan sus conexiones.
+    """
+    def __init__(self, url, usuario, sesion, datos="docker"):
+        self.url = url.rstrip("/")
+        self.usuario = usuario
+        self.sesion = sesion
+        self.datos = datos
+
+    # --- Peticiones HTTP ---
+    def _peticion(self, metodo, ruta, op, timeout=TIMEOUT_METADATOS, stream=False, **params):
+        params = {"op": op, "user.name": self.usuario, **{k: v for k, v in params.items() if v is not None}}
+        with llamada_hdfs(op):
+            respuesta = self.sesion.request(metodo, f"{self.url}/webhdfs/v1{quote(ruta)}", params=params,
+                                            timeout=timeout, stream=stream)
+            self._comprobar(respuesta, ruta)
+        return respuesta
+
+    @staticmethod
+    def _comprobar(respuesta, ruta):
+        """Convierte las respuestas de error de WebHDFS (RemoteException) en ErrorHDFS."""
+        if respuesta.status_code < 400:
+            return
+        try:
+            detalle = respuesta.json()["RemoteException"]
+            mensaje = f"{detalle.get('exception')}: {detalle.get('message')}"
+        except (ValueError, KeyError):
+            mensaje = f"HTTP {respuesta.status_code}"
+        error = FileNotFoundError if respuesta.status_code == 404 else ErrorHDFS
+        raise error(f"{ruta}: {mensaje}")
+
+    # --- Puente docker ---
+    @staticmethod
+    def _docker(*argumentos, operacion, entrada=None):
+        """Ejecuta un comando de docker (sin shell). 'operacion' da nombre a la llamada en las métricas."""
+        with llamada_hdfs(operacion):
+            resultado = subprocess.run(["docker", *argumentos], input=entrada, capture_output=True)
+            if resultado.returncode != 0:
+                raise ErrorHDFS(resultado.stderr.decode(errors="replace").strip() or f"docker {argumentos[0]} falló")
+        return resultado.stdout
+
+    @staticmethod
+    def _opcion_replicacion(replicacion):
+        return ["-D", f"dfs.replication={replicacion}"] if replicacion else []
+
+    # --- Metadatos ---
+    def estado(self, ruta):
+        """FileStatus de una ruta, o None si no existe."""
+        try:
+            return self._peticion("GET", ruta, "GETFILESTATUS").json()["FileStatus"]
+        except FileNotFoundError:
+            return None
+
+    def existe(self, ruta):
+        return self.estado(ruta) is not None
+
+    def listar(self, ruta):
+        """
+        Generador con el FileStatus de cada entrada de una carpeta, ordenadas por nombre.
+        Pide el listado por páginas (LISTSTATUS_BATCH): nunca hay en memoria más de una
+        página. Una carpeta que no existe se trata como vacía.
+        """
+        despues = None
+        while True:
+            try:
+                listado = self._peticion("GET", ruta, "LISTSTATUS_BATCH", startAfter=despues).json()["DirectoryListing"]
+            except FileNotFoundError:
+                return
+            entradas = listado["partialListing"]["FileStatuses"]["FileStatus"]
+            yield from entradas
+            if not entradas or not listado["remainingEntries"]:
+                return
+            despues = entradas[-1]["pathSuffix"]
+
+    def estados(self, rutas):
+        """
+        Estado de varias rutas en lote: en lugar de una petición por ruta, se lista
+        una vez cada carpeta que las contiene. Devuelve {ruta: FileStatus o None}.
+        """
+        resultado = dict.fromkeys(rutas)
+        por_carpeta = {}
+        for ruta in rutas:
+            por_carpeta.setdefault(carpeta_de(ruta), {})[nombre_de(ruta)] = ruta
+        for carpeta, nombres in por_carpeta.items():
+            for entrada in self.listar(carpeta):
+                if entrada["pathSuffix"] in nombres:
+                    resultado[nombres[entrada["pathSuffix"]]] = entrada
+        return resultado
+
+    def resumen(self, ruta):
+        """Uso de disco de una ruta (GETCONTENTSUMMARY: length, fileCount, spaceConsumed...) o None."""
+        try:
+            return self._peticion("GET", ruta, "GETCONTENTSUMMARY").json()["ContentSummary"]
+        except FileNotFoundError:
+            return None
+
+    def ubicaciones(self, ruta):
+        """
+        Bloques de un archivo con sus réplicas (GETFILEBLOCKLOCATIONS, solo NameNode):
+        [{"offset": 0, "length": 134217728, "names": ["172.18.0.5:9866", ...], "corrupt": False}, ...]
+        """
+        respuesta = self._peticion("GET", ruta, "GETFILEBLOCKLOCATIONS", offset=0)
+        return respuesta.json()["BlockLocations"]["BlockLocation"]
+
+    def crear_directorio(self, ruta):
+        """Equivalente a 'hdfs dfs -mkdir -p'."""
+        self._peticion("PUT", ruta, "MKDIRS")
+
+    def borrar(self, ruta, recursivo=True):
+        """Borra sin pasar por la papelera. Devuelve False si la ruta no existía."""
+        return self._peticion("DELETE", ruta, "DELETE", recursive=str(recursivo).lower()).json()["boolean"]
+
+    def renombrar(self, origen, destino):
+        if not self._peticion("PUT", origen, "RENAME", destination=destino).json()["boolean"]:
+            raise ErrorHDFS(f"No se pudo renombrar {origen} -> {destino}")
+
+    def concatenar(self, destino, fuentes):
+        """Une 'fuentes' al final de 'destino' moviendo bloques (CONCAT), sin copiar datos."""
+        self._peticion("POST", destino, "CONCAT", sources=",".join(fuentes))
+
+    def replicacion(self, ruta, factor):
+        """
+        Cambia el factor de replicación de un archivo o de todos los archivos bajo
+        una carpeta (como 'hdfs dfs -setrep'). Devuelve el número de archivos cambiados.
+        """
+        info = self.estado(ruta)
+        if info is None:
+            return 0
+        return self._replicacion(ruta, info["type"], factor)
+
+    def _replicacion(self, ruta, tipo, factor):
+        # El tipo de cada hijo ya viene en el listado: no hace falta un GETFILESTATUS por archivo
+        if tipo == "FILE":
+            self._peticion("PUT", ruta, "SETREPLICATION", replication=factor)
+            return 1
+        return sum(self._replicacion(f"{ruta}/{e['pathSuffix']}", e["type"], factor) for e in self.listar(ruta))
+
+    def checksum(self, ruta):
+        """
+        getFileChecksum: {'algorithm': 'MD5-of-0MD5-of-512CRC32C', 'bytes': '...', 'length': 28}.
+        Lo calculan los DataNodes (el contenido no viaja), pero GETFILECHECKSUM no es una
+        llamada solo de metadatos: el NameNode redirige a un DataNode, que el host no
+        resuelve. Con datos="docker" se pide con 'hdfs dfs -checksum' dentro del NameNode
+        (mismo algoritmo y mismos bytes que WebHDFS).
+        """
+        if self.datos == "docker":
+            salida = self._docker("exec", CONTENEDOR, "hdfs", "dfs", "-checksum", ruta, operacion="dfs -checksum")
+            return parsear_checksum(salida.decode(errors="replace"), ruta)
+        return self._peticion("GET", ruta, "GETFILECHECKSUM").json()["FileChecksum"]
+
+    # --- Datos ---
+    @contextmanager
+    def leer(self, ruta, tam_buffer=TAM_BUFFER):
+        """Contexto que entrega el contenido de un archivo HDFS a trozos de tam_buffer bytes."""
+        if self.datos == "docker":
+            with llamada_hdfs("dfs -cat"):
+                proceso = subprocess.Popen(["docker", "exec", CONTENEDOR, "hdfs", "dfs", "-cat", ruta],
+                                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                try:
+                    yield contar(iter(lambda: proceso.stdout.read(tam_buffer), b""), "bytes_leidos")
+                finally:
+                    proceso.stdout.close()
+                    error = proceso.stderr.read()
+                    if proceso.wait() != 0:
+                        raise ErrorHDFS(error.decode(errors="replace").strip())
+        else:
+            respuesta = self._peticion("GET", ruta, "OPEN", timeout=TIMEOUT_DATOS, stream=True, buffersize=tam_buffer)
+            with respuesta:
+                yield contar(respuesta.iter_content(tam_buffer), "bytes_leidos")
+
+    def leer_rango(self, ruta, offset, longitud):
+        """
+        Lee 'longitud' bytes desde 'offset' (OPEN con offset/length de WebHDFS).
+        OPEN redirige a un DataNode que el host no resuelve, y 'hdfs dfs -cat' no sabe
+        leer un trozo suelto: con datos="docker" la petición la hace curl dentro del
+        contenedor del NameNode, que sigue la redirección por la red del clúster.
+        """
+        if self.datos == "docker":
+            url = (f"{URL_INTERNA}/webhdfs/v1{quote(ruta)}?op=OPEN&user.name={quote(self.usuario)}"
+                   f"&offset={offset}&length={longitud}")
+            try:
+                datos = self._docker("exec", CONTENEDOR, "curl", "-sSfL", url, operacion="OPEN rango")
+            except ErrorHDFS as e:
+                if "executable file not found" in str(e):
+                    raise ErrorHDFS(f"{ruta}: el contenedor {CONTENEDOR} no tiene curl para leer rangos; "
+                                    f"usa el acceso webhdfs (HDFS_DATOS=webhdfs) desde un host que resuelva "
+                                    f"los DataNodes") from e
+                raise ErrorHDFS(f"{ruta}: {e}") from e
+        else:
+            datos = self._peticion("GET", ruta, "OPEN", timeout=TIMEOUT_DATOS, offset=offset, length=longitud).content
+        sumar(bytes_leidos=len(datos))
+        return datos
+
+    def leer_rangos(self, ruta, rangos):
+        """
+        Lee varios rangos (offset, longitud) de un mismo archivo y devuelve sus bytes
+        en el mismo orden. Con datos="docker" todos van en UN solo 'docker exec' (un
+        bucle de curl, SCRIPT_RANGOS) en lugar de uno por rango; con webhdfs, las
+        peticiones reutilizan la conexión keep-alive de la sesión.
+        """
+        if self.datos != "docker":
+            return [self.leer_rango(ruta, offset, longitud) for offset, longitud in rangos]
+        urls = [f"{URL_INTERNA}/webhdfs/v1{quote(ruta)}?op=OPEN&user.name={quote(self.usuario)}"
+                f"&offset={offset}&length={longitud}" for offset, longitud in rangos]
+        try:
+            salida = self._docker("exec", CONTENEDOR, "sh", "-c", SCRIPT_RANGOS, "sh", *urls, operacion="OPEN rangos")
+        except ErrorHDFS as e:
+            if "curl no disponible" in str(e):
+                raise ErrorHDFS(f"{ruta}: el contenedor {CONTENEDOR} no tiene curl para leer rangos; "
+                                f"usa el acceso webhdfs (HDFS_DATOS=webhdfs) desde un host que resuelva "
+                                f"los DataNodes") from e
+            raise ErrorHDFS(f"{ruta}: {e}") from e
+
+        # Separa la salida: "<bytes>\n<datos>" por cada rango
+        trozos_leidos, pos = [], 0
+        for _ in rangos:
+            fin = salida.find(b"\n", pos)
+            longitud = int(salida[pos:fin]) if fin > pos else -1
+            trozo = salida[fin + 1:fin + 1 + longitud]
+            if longitud < 0 or len(trozo) != longitud:
+                raise ErrorHDFS(f"{ruta}: salida incompleta al leer {len(rangos)} rangos por el puente docker")
+            trozos_leidos.append(trozo)
+            pos = fin + 1 + longitud
+        sumar(bytes_leidos=sum(len(t) for t in trozos_leidos))
+        return trozos_leidos
+
+    def escribir(self, ruta, datos, replicacion=None, tam_buffer=TAM_BUFFER):
+        """
+        Escribe (sobrescribiendo) un archivo HDFS con 'datos': bytes, un archivo binario
+        abierto o un iterable de trozos. Los datos viajan en streaming, sin cargarlos enteros.
+        """
+        if self.datos == "docker":
+            # 'hdfs dfs -put -f -' lee el contenido de la entrada estándar
+            with llamada_hdfs("dfs -put"):
+                proceso = subprocess.Popen(["docker", "exec", "-i", CONTENEDOR, "hdfs", "dfs",
+                                            *self._opcion_replicacion(replicacion), "-put", "-f", "-", ruta],
+                                           stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                try:
+                    for trozo in contar(trozos(datos, tam_buffer), "bytes_escritos"):
+                        proceso.stdin.write(trozo)
+                finally:
+                    proceso.stdin.close()
+                    error = proceso.stderr.read()
+                    codigo = proceso.wait()
+                if codigo != 0:
+                    raise ErrorHDFS(error.decode(errors="replace").strip())
+            return
+
+        # WebHDFS en dos pasos: el NameNode responde con una redirección (307) al
+        # DataNode que recibirá los datos, y ahí los enviamos.
+        params = {"op": "CREATE", "user.name": self.usuario, "overwrite": "true", "buffersize": tam_buffer}
+        if replicacion:
+            params["replication"] = replicacion
+        with llamada_hdfs("CREATE"):
+            respuesta = self.sesion.put(f"{self.url}/webhdfs/v1{quote(ruta)}", params=params,
+                                        allow_redirects=False, timeout=TIMEOUT_METADATOS)
+            self._comprobar(respuesta, ruta)
+            respuesta = self.sesion.put(respuesta.headers["Location"],
+                                        data=contar(trozos(datos, tam_buffer), "bytes_escritos"), timeout=TIMEOUT_DATOS)
+            self._comprobar(respuesta, ruta)
+
+    def subir(self, local, ruta, replicacion=None, tam_buffer=TAM_BUFFER):
+        """Sube un archivo local a la ruta HDFS indicada (sobrescribiendo)."""
+        if self.datos == "docker":
+            self.subir_varios([local], carpeta_de(ruta), replicacion, nombres=[nombre_de(ruta)])
+            return
+        with open(local, "rb") as f:
+            self.escribir(ruta, f, replicacion, tam_buffer)
+
+    def subir_varios(self, locales, carpeta, replicacion=None, nombres=None):
+        """
+        Sube varios archivos locales a una carpeta HDFS. Por el puente docker se
+        copian todos al contenedor y se cargan con UN solo 'hdfs dfs -put' (una JVM
+        para todo el lote en lugar de una por archivo).
+        """
+        locales = [Path(l) for l in locales]
+        nombres = nombres or [l.name for l in locales]
+        if self.datos != "docker":
+            for local, nombre in zip(locales, nombres):
+                self.subir(local, f"{carpeta}/{nombre}", replicacion)
+            return
+
+        temporales = [f"{DIR_TEMPORAL}/{nombre}" for nombre in nombres]
+        try:
+            for local, temporal in zip(locales, temporales):
+                self._docker("cp", str(local), f"{CONTENEDOR}:{temporal}", operacion="docker cp")
+            if len(nombres) == 1:
+                self._docker("exec", CONTENEDOR, "hdfs", "dfs", *self._opcion_replicacion(replicacion),
+                             "-put", "-f", temporales[0], f"{carpeta}/{nombres[0]}", operacion="dfs -put")
+            else:
+                self._docker("exec", CONTENEDOR, "hdfs", "dfs", *self._opcion_replicacion(replicacion),
+                             "-put", "-f", *temporales, f"{carpeta}/", operacion="dfs -put")
+            sumar(bytes_escritos=sum(l.stat().st_size for l in locales))
+        finally:
+            # Limpiamos /tmp del contenedor como root (-u 0) aunque la carga falle
+            subprocess.run(["docker", "exec", "-u", "0", CONTENEDOR, "rm", "-f", *temporales],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def copiar(self, origen, destino):
+        """Copia un archivo dentro de HDFS (sobrescribiendo), como 'hdfs dfs -cp -f'."""
+        if self.datos == "docker":
+            self._docker("exec", CONTENEDOR, "hdfs", "dfs", "-cp", "-f", origen, destino, operacion="dfs -cp")
+            return
+        with self.leer(origen) as lector:
+            self.escribir(destino, lector)
+
+    # --- Auditoría ---
+    @contextmanager
+    def fsck(self, ruta):
+        """
+        Contexto que entrega, línea a línea, la salida de 'hdfs fsck <ruta> -files -blocks
+        -locations'. Se pide directamente al servlet /fsck del NameNode (el mismo que usa
+        el comando hdfs fsck por debajo), sin arrancar ninguna JVM.
+        """
+        params = {"ugi": self.usuario, "user.name": self.usuario, "path": ruta,
+                  "files": 1, "blocks": 1, "locations": 1}
+        with llamada_hdfs("fsck"):
+            respuesta = self.sesion.get(f"{self.url}/fsck", params=params, stream=True, timeout=TIMEOUT_DATOS)
+            self._comprobar(respuesta, ruta)
+        respuesta.encoding = "utf-8"
+        with respuesta:
+            yield (linea + "\n" for linea in respuesta.iter_lines(decode_unicode=True))
+
+# ---------------------------------------------------------
+# 3. BACKEND LOCAL (SIN CLÚSTER)
+# ---------------------------------------------------------
+class HDFSLocal:
+    """
+    Mismo interfaz que HDFSWeb sobre un directorio local: '/data/logs' es
+    '<raiz>/data/logs'. La replicación no existe (siempre 1) y el fsck se
+    simula con el mismo formato de texto que el de Hadoop.
+    """
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+        self.raiz.mkdir(parents=True, exist_ok=True)
+
+    def _local(self, ruta):
+        return self.raiz / ruta.lstrip("/")
+
+    @staticmethod
+    def _estado(ruta_local):
+        info = ruta_local.stat()
+        archivo = ruta_local.is_file()
+        return {"pathSuffix": ruta_local.name, "type": "FILE" if archivo else "DIRECTORY",
+                "length": info.st_size if archivo else 0, "modificationTime": info.st_mtime_ns // 1_000_000,
+                "replication": 1 if archivo else 0, "blockSize": TAM_BLOQUE if archivo else 0}
+
+    # --- Metadatos ---
+    def estado(self, ruta):
+        local = self._local(ruta)
+        return self._estado(local) if local.exists() else None
+
+    def existe(self, ruta):
+        return self._local(ruta).exists()
+
+    def listar(self, ruta):
+        local = self._local(ruta)
+        if not local.is_dir():
+            return
+        for hijo in sorted(local.iterdir(), key=lambda p: p.name):
+            yield self._estado(hijo)
+
+    def estados(self, rutas):
+        return {ruta: self.estado(ruta) for ruta in rutas}
+
+    def resumen(self, ruta):
+        local = self._local(ruta)
+        if not local.exists():
+            return None
+        archivos = [local] if local.is_file() else [p for p in local.rglob("*") if p.is_file()]
+        tam = sum(p.stat().st_size for p in archivos)
+        return {"length": tam, "spaceConsumed": tam, "fileCount": len(archivos),
+                "directoryCount": 0 if local.is_file() else 1 + sum(p.is_dir() for p in local.rglob("*"))}
+
+    def ubicaciones(self, ruta):
+        # Los mismos bloques que el fsck simulado, todos en el único "DataNode"
+        local = self._local(ruta)
+        if not local.is_file():
+            raise FileNotFoundError(f"{ruta}: no existe")
+        tam = local.stat().st_size
+        return [{"offset": i * TAM_BLOQUE, "length": min(TAM_BLOQUE, tam - i * TAM_BLOQUE),
+                 "names": ["127.0.0.1:9866"], "corrupt": False} for i in range(math.ceil(tam / TAM_BLOQUE))]
+
+    def crear_directorio(self, ruta):
+        self._local(ruta).mkdir(parents=True, exist_ok=True)
+
+    def borrar(self, ruta, recursivo=True):
+        local = self._local(ruta)
+        if not local.exists():
+            return False
+        if local.is_dir():
+            if recursivo:
+                shutil.rmtree(local)
+            else:
+                local.rmdir()
+        else:
+            local.unlink()
+        return True
+
+    def renombrar(self, origen, destino):
+        try:
+            self._local(origen).rename(self._local(destino))
+        except OSError as e:
+            raise ErrorHDFS(f"No se pudo renombrar {origen} -> {destino}: {e}") from e
+
+    def concatenar(self, destino, fuentes):
+        with open(self._local(destino), "ab") as salida:
+            for fuente in fuentes:
+                with open(self._local(fuente), "rb") as entrada:
+                    shutil.copyfileobj(entrada, salida, TAM_BUFFER)
+                self._local(fuente).unlink()
+
+    def replicacion(self, ruta, factor):
+        local = self._local(ruta)
+        if not local.exists():
+            return 0
+        return 1 if local.is_file() else sum(p.is_file() for p in local.rglob("*"))
+
+    def checksum(self, ruta):
+        md5 = hashlib.md5()
+        with self.leer(ruta) as lector:
+            for trozo in lector:
+                md5.update(trozo)
+        return {"algorithm": "MD5", "bytes": md5.hexdigest(), "length": 16}
+
+    # --- Datos ---
+    @contextmanager
+    def leer(self, ruta, tam_buffer=TAM_BUFFER):
+        try:
+            f = open(self._local(ruta), "rb")
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"{ruta}: no existe") from e
+        with f:
+            yield contar(iter(lambda: f.read(tam_buffer), b""), "bytes_leidos")
+
+    def leer_rango(self, ruta, offset, longitud):
+        try:
+            f = open(self._local(ruta), "rb")
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"{ruta}: no existe") from e
+        with f:
+            f.seek(offset)
+            datos = f.read(longitud)
+        sumar(bytes_leidos=len(datos))
+        return datos
+
+    def leer_rangos(self, ruta, rangos):
+        return [self.leer_rango(ruta, offset, longitud) for offset, longitud in rangos]
+
+    def escribir(self, ruta, datos, replicacion=None, tam_buffer=TAM_BUFFER):
+        local = self._local(ruta)
+        local.parent.mkdir(parents=True, exist_ok=True)
+        with open(local, "wb") as f:
+            for trozo in contar(trozos(datos, tam_buffer), "bytes_escritos"):
+                f.write(trozo)
+
+    def subir(self, local, ruta, replicacion=None, tam_buffer=TAM_BUFFER):
+        destino = self._local(ruta)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(local, destino)
+        sumar(bytes_escritos=destino.stat().st_size)
+
+    def subir_varios(self, locales, carpeta, replicacion=None, nombres=None):
+        locales = [Path(l) for l in locales]
+        for local, nombre in zip(locales, nombres or [l.name for l in locales]):
+            self.subir(local, f"{carpeta}/{nombre}", replicacion)
+
+    def copiar(self, origen, destino):
+        try:
+            shutil.copyfile(self._local(origen), self._local(destino))
+        except FileNotFoundError as e:
+            raise ErrorHDFS(f"No se pudo copiar {origen} -> {destino}: {e}") from e
+
+    # --- Auditoría ---
+    @contextmanager
+    def fsck(self, ruta):
+        """fsck simulado: cada archivo en bloques de TAM_BLOQUE con una réplica sana en 127.0.0.1."""
+        yield self._lineas_fsck(ruta)
+
+    def _lineas_fsck(self, ruta):
+        ahora = datetime.now().strftime("%a %b %d %H:%M:%S %Z %Y")
+        yield f"FSCK started by local for path {ruta} at {ahora}\n"
+        local = self._local(ruta)
+        entradas = [local] if local.is_file() else sorted(local.rglob("*")) if local.exists() else []
+        directorios = archivos = bloques = tam_total = 0
+        inicio = time.perf_counter()
+        for entrada in ([local] if local.is_dir() else []) + entradas:
+            ruta_hdfs = "/" + entrada.relative_to(self.raiz).as_posix()
+            if entrada.is_dir():
+                directorios += 1
+                yield f"{ruta_hdfs} <dir>\n"
+                continue
+            tam = entrada.stat().st_size
+            n = math.ceil(tam / TAM_BLOQUE)
+            archivos += 1
+            tam_total += tam
+            yield f"{ruta_hdfs} {tam} bytes, replicated: replication=1, {n} block(s):  OK\n"
+            for i in range(n):
+                bloques += 1
+                largo = min(TAM_BLOQUE, tam - i * TAM_BLOQUE)
+                yield (f"{i}. BP-local:blk_{1073741824 + bloques}_{1000 + bloques} len={largo} Live_repl=1  "
+                       f"[DatanodeInfoWithStorage[127.0.0.1:9866,DS-local,DISK]]\n")
+            yield "\n"
+        media = tam_total // bloques if bloques else 0
+        yield from (l + "\n" for l in [
+            "", "Status: HEALTHY",
+            " Number of data-nodes:\t1", " Number of racks:\t\t1",
+            f" Total dirs:\t\t\t{directorios}", " Total symlinks:\t\t0", "",
+            "Replicated Blocks:",
+            f" Total size:\t{tam_total} B", f" Total files:\t{archivos}",
+            f" Total blocks (validated):\t{bloques} (avg. block size {media} B)",
+            f" Minimally replicated blocks:\t{bloques} (100.0 %)",
+            " Over-replicated blocks:\t0 (0.0 %)", " Under-replicated blocks:\t0 (0.0 %)",
+            " Mis-replicated blocks:\t\t0 (0.0 %)", " Default replication factor:\t1",
+            " Average block replication:\t1.0", " Missing blocks:\t\t0",
+            " Corrupt blocks:\t\t0", " Missing replicas:\t\t0 (0.0 %)",
+            f"FSCK ended at {ahora} in {int((time.perf_counter() - inicio) * 1000)} milliseconds", "",
+            f"The filesystem under path '{ruta}' is HEALTHY",
+        ])
+
+# ---------------------------------------------------------
+# 4. ESCRITURA EN STREAMING DESDE UN PRODUCTOR (COLA ACOTADA)
+# ---------------------------------------------------------
+# Lotes en vuelo entre quien genera los datos y el hilo que los sube
+TAM_COLA = 4
+
+class FlujoEscritura:
+    """
+    Archivo de escritura (write/close, usable con 'with') cuyo contenido va a HDFS
+    mientras se produce: cada write() deja el lote en una cola acotada y un hilo lo
+    envía por escribir() del backend, así producir y subir se solapan. Si el
+    productor va más rápido que la red, write() espera (como mucho hay tam_cola
+    lotes en memoria), y nada pasa por el disco local.
+
+    'filtro' transforma los lotes antes de enviarlos (p.ej. Compresor.comprimir).
+
+    Los datos se escriben en un temporal junto al destino ('.<nombre>._STREAMING_',
+    como el '._COPYING_' de 'hdfs dfs -put') que se renombra al cerrar sin errores:
+    una generación cortada nunca deja un archivo a medias con el nombre final.
+    """
+    FIN = object()
+
+    def __init__(self, hdfs, ruta, replicacion=None, tam_cola=TAM_COLA, filtro=None):
+        self.hdfs = hdfs
+        self.filtro = filtro
+        self.ruta = ruta
+        self.temporal = f"{carpeta_de(ruta)}/.{nombre_de(ruta)}._STREAMING_"
+        self.cola = queue.Queue(maxsize=tam_cola)
+        self.error = None
+        self.vaciada = False
+        self.hilo = threading.Thread(target=propagar(self._subir), args=(replicacion,),
+                                     name=f"subida_{nombre_de(ruta)}", daemon=True)
+        self.hilo.start()
+
+    def _lotes(self):
+        while (lote := self.cola.get()) is not FlujoEscritura.FIN:
+            if isinstance(lote, BaseException):
+                raise lote
+            yield lote
+        self.vaciada = True
+
+    def _subir(self, replicacion):
+        try:
+            lotes = self._lotes()
+            self.hdfs.escribir(self.temporal, self.filtro(lotes) if self.filtro else lotes, replicacion)
+        except BaseException as e:
+            self.error = e
+            # Seguimos vaciando la cola para que el productor nunca se quede bloqueado
+            while not self.vaciada and self.cola.get() is not FlujoEscritura.FIN:
+                pass
+
+    def write(self, lote):
+        if self.error:
+            raise ErrorHDFS(f"Falló la subida de {self.ruta}: {self.error}") from self.error
+        self.cola.put(lote)
+        return len(lote)
+
+    def close(self, error=None):
+        """Espera a que se suban los lotes pendientes y publica el archivo con su nombre final."""
+        # Con error del productor, el hilo aborta la subida en lugar de cerrarla bien
+        self.cola.put(error or FlujoEscritura.FIN)
+        if error:
+            self.cola.put(FlujoEscritura.FIN)
+        self.hilo.join()
+        if error or self.error:
+            try:
+                self.hdfs.borrar(self.temporal)
+            except OSError:
+                pass    # Sin conexión no hay limpieza posible: el temporal no tiene el nombre final
+            if self.error and not error:
+                raise ErrorHDFS(f"Falló la subida de {self.ruta}: {self.error}") from self.error
+            return
+        self.hdfs.borrar(self.ruta)     # RENAME no sobrescribe (equivale al '-f' de 'hdfs dfs -put')
+        self.hdfs.renombrar(self.temporal, self.ruta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        self.close(error)
+
+# ---------------------------------------------------------
+# 5. CREACIÓN DEL BACKEND
+# ---------------------------------------------------------
+def crear_backend(backend, url=None, usuario=None, sesion=None, datos="docker", raiz_local=None):
+    """Instancia el backend pedido: "webhdfs" (clúster) o "local" (directorio raiz_local)."""
+    if backend == "local":
+        return HDFSLocal(raiz_local)
+    if backend == "webhdfs":
+        return HDFSWeb(url, usuario, sesion, datos)
+    raise ValueError(f"Backend HDFS desconocido: {backend} (usa 'webhdfs' o 'local')")
@@ -0,0 +1,152 @@
+# Manifiestos Merkle de las capas de HDFS (usados por 50)
+#
+# Un manifiesto resume una capa entera (/data o /backup) en un árbol de hashes
+# de cuatro niveles:
+#
+#   capa (/data) -> familia (logs) -> partición (raw/dt=2026-02-05) -> archivo (logs_2026-02-05.log)
+#
+# El hash de un archivo es el SHA-256 de su contenido (descomprimido si es .gz/.zst:
+# x.log en /data y x.log.gz en /backup tienen el mismo). El de cada nivel superior
+# es el SHA-256 de la lista ordenada "nombre hash" de sus hijos. Si dos capas tienen
+# el mismo hash raíz son idénticas; si no, solo se baja por los hijos cuyo hash
+# difiere. Comparar meses de histórico cuesta lo que ha cambiado, no lo que ocupa.
+#
+# Un archivo cuyo hash no se pudo calcular (error de lectura) queda con hash None, y
+# ese None sube hasta la raíz: un nodo con algún hijo sin hash tampoco tiene hash.
+# Así nunca coincide con el otro lado (aunque allí también falle) y la comparación
+# baja hasta el archivo y lo informa como distinto.
+#
+# La construcción también es incremental: una partición cuyo listado (nombres,
+# tamaños y fechas de modificación) coincide con el del manifiesto anterior se copia
+# tal cual, sin leer sus archivos. Solo se calcula el hash de lo nuevo o modificado.
+#
+# Formato del manifiesto (JSON):
+#   {"capa": "/data", "fecha": "2026-02-05", "hash": "...", "archivos": 2, "hijos": {
+#       "logs": {"hash": "...", "archivos": 1, "hijos": {
+#           "raw/dt=2026-02-05": {"hash": "...", "archivos": 1, "hijos": {
+#               "logs_2026-02-05.log": {"hash": "SHA-256:...", "tam": 123, "mtime": 1700000000000,
+#                                       "ruta": "/data/logs/raw/dt=2026-02-05/logs_2026-02-05.log"}}}}}}}
+
+import hashlib
+from compresion import codec_de, nombre_logico
+
+# ---------------------------------------------------------
+# 1. HASHES DE LOS NODOS
+# ---------------------------------------------------------
+def hash_nodo(hijos):
+    """
+    Hash de un nodo a partir de los de sus hijos (ordenados por nombre), o None si
+    alguno no tiene hash: un subárbol con un archivo sin verificar no es comparable.
+    """
+    sha = hashlib.sha256()
+    for nombre in sorted(hijos):
+        if hijos[nombre]["hash"] is None:
+            return None
+        sha.update(f"{nombre} {hijos[nombre]['hash']}\n".encode())
+    return sha.hexdigest()
+
+def nodo(hijos):
+    """Nodo intermedio (partición, familia o capa) con su hash y su número de archivos."""
+    return {"hash": hash_nodo(hijos), "archivos": sum(h.get("archivos", 1) for h in hijos.values()),
+            "hijos": hijos}
+
+def contar_nodos(arbol):
+    """Número total de nodos de un (sub)árbol, él incluido."""
+    return 1 + sum(contar_nodos(hijo) for hijo in arbol.get("hijos", {}).values())
+
+# ---------------------------------------------------------
+# 2. CONSTRUCCIÓN INCREMENTAL
+# ---------------------------------------------------------
+def particiones(hdfs, raiz, relativa=()):
+    """
+    Recorre una familia y genera (nombre de la partición, archivos) por cada carpeta
+    que contiene archivos: ('raw/dt=2026-02-05', [FileStatus, ...]). Los archivos
+    ocultos (subidas a medias: ._COPYING_, ._STREAMING_...) no cuentan.
+    """
+    archivos = []
+    for entrada in hdfs.listar("/".join((raiz,) + relativa)):
+        if entrada["type"] == "DIRECTORY":
+            yield from particiones(hdfs, raiz, relativa + (entrada["pathSuffix"],))
+        elif not entrada["pathSuffix"].startswith("."):
+            archivos.append(entrada)
+    if archivos:
+        yield "/".join(relativa), archivos
+
+def construir(hdfs, capa, fecha, hashear, previo=None):
+    """
+    Construye el manifiesto de una capa.
+    hashear: función {ruta: info} -> {ruta: hash} que calcula el hash del contenido
+             de los archivos nuevos o modificados (info lleva tam, mtime y codec).
+    previo:  manifiesto anterior de la misma capa (o None): de él se reutilizan los
+             archivos que no han cambiado.
+    Devuelve (manifiesto, número de archivos cuyo hash se ha calculado).
+    """
+    calculados = 0
+    familias = {}
+    for entrada in hdfs.listar(capa):
+        if entrada["type"] != "DIRECTORY":
+            continue
+        familia = entrada["pathSuffix"]
+        anteriores = (previo or {}).get("hijos", {}).get(familia, {}).get("hijos", {})
+        parts = {}
+        for particion, archivos in particiones(hdfs, f"{capa}/{familia}"):
+            viejos = anteriores.get(particion, {}).get("hijos", {})
+            hojas, pendientes = {}, {}
+            for archivo in archivos:
+                nombre = nombre_logico(archivo["pathSuffix"])
+                info = {"tam": archivo["length"], "mtime": archivo["modificationTime"],
+                        "ruta": f"{capa}/{familia}/{particion}/{archivo['pathSuffix']}"}
+                viejo = viejos.get(nombre)
+                if viejo and viejo["hash"] and all(viejo[k] == info[k] for k in info):
+                    hojas[nombre] = viejo
+                else:
+                    pendientes[info["ruta"]] = (nombre, info)
+            if pendientes:
+                hashes = hashear({ruta: {**info, "codec": codec_de(ruta)} for ruta, (_, info) in pendientes.items()})
+                calculados += len(pendientes)
+                for ruta, (nombre, info) in pendientes.items():
+                    # Un hash que no se pudo calcular queda a None, y con él la partición,
+                    # la familia y la capa (hash_nodo): diferencias() baja hasta este archivo
+                    hojas[nombre] = {"hash": hashes.get(ruta), **info}
+            parts[particion] = nodo(hojas)
+        if parts:
+            familias[familia] = nodo(parts)
+    return {"capa": capa, "fecha": fecha, **nodo(familias)}, calculados
+
+# ---------------------------------------------------------
+# 3. COMPARACIÓN DE DOS MANIFIESTOS
+# ---------------------------------------------------------
+def diferencias(origen, destino, visitados, ruta=()):
+    """
+    Compara dos (sub)árboles bajando solo por los hijos cuyo hash difiere.
+    Genera (estado, partes de la ruta, hoja_origen, hoja_destino) de cada archivo:
+      "falta"    -> solo está en el origen
+      "sobra"    -> solo está en el destino
+      "distinto" -> está en ambos con distinto contenido
+    'visitados' (Counter) acumula los nodos comparados y los archivos que coinciden
+    sin haberlos mirado uno a uno (iguales).
+    """
+    visitados["nodos"] += 1
+    if origen["hash"] == destino["hash"] and origen["hash"] is not None:
+        visitados["iguales"] += origen.get("archivos", 1)
+        return
+    if "hijos" not in origen:
+        yield "distinto", ruta, origen, destino
+        return
+    hijos_origen, hijos_destino = origen["hijos"], destino["hijos"]
+    for nombre in sorted(hijos_origen.keys() | hijos_destino.keys()):
+        partes = ruta + (nombre,)
+        if nombre not in hijos_destino:
+            yield from hojas(hijos_origen[nombre], "falta", partes)
+        elif nombre not in hijos_origen:
+            yield from hojas(hijos_destino[nombre], "sobra", partes)
+        else:
+            yield from diferencias(hijos_origen[nombre], hijos_destino[nombre], visitados, partes)
+
+def hojas(arbol, estado, ruta):
+    """Todos los archivos de un subárbol que solo existe en un lado."""
+    if "hijos" not in arbol:
+        yield (estado, ruta, arbol, None) if estado == "falta" else (estado, ruta, None, arbol)
+        return
+    for nombre in sorted(arbol["hijos"]):
+        yield from hojas(arbol["hijos"][nombre], estado, ruta + (nombre,))
@@ -0,0 +1,143 @@
+# Sondeo adaptativo de la salud del clúster a través del JMX del NameNode
+#
+# Sustituye a las esperas fijas de 600 segundos de 70_incident_simulation.py y
+# 80_recovery_restore.py: en lugar de dormir siempre 10 minutos, preguntamos al
+# NameNode por sus métricas (nodos vivos/muertos, bloques perdidos y
+# sub-replicados) y volvemos en cuanto el clúster llega al estado que esperamos.
+#
+# Estados objetivo:
+#   "disponible"    -> El NameNode responde, ha salido de safe mode y tiene DataNodes vivos.
+#   "fallo_visible" -> El NameNode ya ha declarado muertos los nodos apagados.
+#   "sano"          -> Ningún nodo muerto y ningún bloque perdido, corrupto o sub-replicado.
+#
+# La línea temporal de sondeos se guarda como evidencia en 'raw_audits'.
+#
+# Uso:
+#   from salud_cluster import esperar_estado
+#   alcanzado, linea_tiempo = esperar_estado("sano", nombre_evidencia="salud_recuperacion")
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+# Endpoint JMX del NameNode (puerto publicado en el docker-compose).
+# 'FSNamesystem*' devuelve los beans FSNamesystem y FSNamesystemState.
+URL_JMX = "http://localhost:9870/jmx?qry=Hadoop:service=NameNode,name=FSNamesystem*"
+
+# Métricas que consultamos y guardamos en la línea temporal
+METRICAS = ["FSState", "NumLiveDataNodes", "NumDeadDataNodes", "NumStaleDataNodes",
+            "MissingBlocks", "CorruptBlocks", "UnderReplicatedBlocks", "PendingReplicationBlocks"]
+
+# Espera entre sondeos: empieza corta y crece (backoff) hasta un máximo,
+# porque los cambios de estado del NameNode son lentos.
+INTERVALO_INICIAL = 5
+INTERVALO_MAXIMO = 60
+FACTOR_BACKOFF = 1.5
+
+# Tiempo máximo de espera. Con la configuración por defecto de Hadoop un DataNode
+# se declara muerto a los ~10,5 minutos sin latidos, así que damos algo de margen.
+TIEMPO_MAXIMO = 900
+
+# Timeout de cada petición HTTP al NameNode
+TIMEOUT_PETICION = 10
+
+# Carpeta compartida con Jupyter (la misma que usan los scripts de auditoría)
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+DIR_COMPARTIDO = RAIZ_PROYECTO / "docker" / "clusterA" / "notebooks" / "raw_audits"
+
+DT = datetime.now().strftime('%Y-%m-%d')
+ahora = lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+# ---------------------------------------------------------
+# 2. LECTURA DE MÉTRICAS Y ESTADOS OBJETIVO
+# ---------------------------------------------------------
+def leer_metricas(sesion, url=URL_JMX):
+    """Consulta el JMX del NameNode y devuelve solo las métricas que nos interesan."""
+    respuesta = sesion.get(url, timeout=TIMEOUT_PETICION)
+    respuesta.raise_for_status()
+    valores = {}
+    for bean in respuesta.json().get("beans", []):
+        valores.update({k: v for k, v in bean.items() if k in METRICAS})
+    return valores
+
+def disponible(m, nodos_caidos=0):
+    # FSState vale "safeMode" mientras el NameNode arranca y "Operational" cuando acepta escrituras
+    return m.get("FSState") == "Operational" and m.get("NumLiveDataNodes", 0) > 0
+
+def fallo_visible(m, nodos_caidos):
+    return m.get("NumDeadDataNodes", 0) >= nodos_caidos
+
+def sano(m, nodos_caidos=0):
+    return (m.get("NumDeadDataNodes", 0) == 0 and m.get("MissingBlocks", 0) == 0
+            and m.get("CorruptBlocks", 0) == 0 and m.get("UnderReplicatedBlocks", 0) == 0)
+
+OBJETIVOS = {"disponible": disponible, "fallo_visible": fallo_visible, "sano": sano}
+
+# ---------------------------------------------------------
+# 3. SONDEO CON BACKOFF
+# ---------------------------------------------------------
+def guardar_linea_tiempo(nombre, objetivo, alcanzado, linea_tiempo):
+    """Guarda la línea temporal de sondeos como evidencia (un JSON por sondeo)."""
+    DIR_COMPARTIDO.mkdir(parents=True, exist_ok=True)
+    ruta = DIR_COMPARTIDO / f"{nombre}_dt={DT}.jsonl"
+    with open(ruta, "w", encoding="utf-8") as f:
+        for punto in linea_tiempo:
+            f.write(json.dumps(punto) + "\n")
+        f.write(json.dumps({"objetivo": objetivo, "alcanzado": alcanzado,
+                            "segundos": linea_tiempo[-1]["segundos"] if linea_tiempo else 0}) + "\n")
+    return ruta
+
+def esperar_estado(objetivo, nodos_caidos=0, tiempo_maximo=TIEMPO_MAXIMO, nombre_evidencia=None,
+                   intervalo_inicial=INTERVALO_INICIAL, intervalo_maximo=INTERVALO_MAXIMO, sesion=None):
+    """
+    Sondea el NameNode hasta alcanzar el estado objetivo o agotar tiempo_maximo.
+    Los errores de conexión (NameNode ocupado o reiniciándose) no cortan la espera:
+    se anotan en la línea temporal y se reintenta con el mismo backoff.
+    Con 'sesion' se reutiliza una sesión HTTP existente (p.ej. la del Contexto).
+    Devuelve (alcanzado, linea_tiempo).
+    """
+    cumple = OBJETIVOS[objetivo]
+    sesion = sesion or requests.Session()
+    inicio = time.monotonic()
+    intervalo = intervalo_inicial
+    linea_tiempo = []
+    alcanzado = False
+
+    print(f"[{ahora()}] [INFO]      Sondeando JMX del NameNode hasta estado '{objetivo}' (máx. {tiempo_maximo} s)...")
+    while True:
+        transcurrido = time.monotonic() - inicio
+        punto = {"instante": ahora(), "segundos": round(transcurrido, 1)}
+        try:
+            metricas = leer_metricas(sesion)
+            punto.update(metricas)
+            alcanzado = cumple(metricas, nodos_caidos)
+            print(f"[{ahora()}] [PROG]      t={transcurrido:5.0f}s | Vivos: {metricas.get('NumLiveDataNodes')} "
+                  f"Muertos: {metricas.get('NumDeadDataNodes')} | Perdidos: {metricas.get('MissingBlocks')} "
+                  f"Sub-replicados: {metricas.get('UnderReplicatedBlocks')}")
+        except (requests.RequestException, ValueError) as e:
+            punto["error"] = str(e)
+            print(f"[{ahora()}] [WARN]      t={transcurrido:5.0f}s | NameNode no responde: {e}")
+        punto["alcanzado"] = alcanzado
+        linea_tiempo.append(punto)
+
+        restante = tiempo_maximo - (time.monotonic() - inicio)
+        if alcanzado or restante <= 0:
+            break
+        time.sleep(min(intervalo, restante))
+        intervalo = min(intervalo * FACTOR_BACKOFF, intervalo_maximo)
+
+    if alcanzado:
+        print(f"[{ahora()}] [OK]    Estado '{objetivo}' alcanzado en {linea_tiempo[-1]['segundos']:.0f} s.")
+    else:
+        print(f"[{ahora()}] [WARN]  Tiempo máximo agotado ({tiempo_maximo} s) sin alcanzar '{objetivo}'.")
+
+    if nombre_evidencia:
+        ruta = guardar_linea_tiempo(nombre_evidencia, objetivo, alcanzado, linea_tiempo)
+        print(f"[{ahora()}] [INFO]      Línea temporal guardada en: {ruta}")
+    return alcanzado, linea_tiempo
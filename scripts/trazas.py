@@ -0,0 +1,339 @@
+# Trazas y métricas de las etapas del pipeline
+#
+# Sustituye a los cronómetros sueltos (time.time() / perf_counter() + print) de
+# cada script por tramos anidados: la etapa completa y sus pasos. Cada tramo
+# mide el tiempo real y el tiempo de CPU y acumula contadores (bytes leídos y
+# escritos, archivos, llamadas a HDFS y su latencia).
+#
+# Salidas (en la carpeta compartida con Jupyter, 'raw_audits'):
+#   trazas_dt=<fecha>.jsonl  -> Un JSON por tramo terminado (se añade al final).
+#   metricas_pipeline.prom   -> Métricas acumuladas en formato de texto de Prometheus
+#                               (válido para el 'textfile collector' de node_exporter).
+# Y, si se pide, un endpoint HTTP /metrics con las mismas métricas (servir_metricas).
+#
+# Todos los tramos de una ejecución comparten el identificador de traza. Cuando
+# 90_run_all.py lanza las etapas como procesos, les pasa la traza y el tramo padre
+# por las variables de entorno TRAZA_ID y TRAZA_PADRE.
+#
+# Uso:
+#   from trazas import tramo, etapa, sumar
+#   @etapa("40_backup_copy")          # La función completa es un tramo
+#   def backup(...):
+#       with tramo("copia") as copia:   # Un paso dentro de la etapa
+#           ...
+#           sumar(archivos=1)           # Suma al tramo en curso
+#       print(copia.segundos)
+
+import contextvars
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# ---------------------------------------------------------
+# 1. CONFIGURACIÓN
+# ---------------------------------------------------------
+RAIZ_PROYECTO = Path(__file__).resolve().parent.parent
+DIR_TRAZAS = Path(os.environ.get("TRAZAS_DIR", RAIZ_PROYECTO / "docker" / "clusterA" / "notebooks" / "raw_audits"))
+
+DT = os.environ.get("DT") or datetime.now().strftime('%Y-%m-%d')
+RUTA_TRAZAS = DIR_TRAZAS / f"trazas_dt={DT}.jsonl"
+RUTA_METRICAS = DIR_TRAZAS / "metricas_pipeline.prom"
+
+# Identificador de esta ejecución (heredado del orquestador si nos lanza como proceso)
+TRAZA = os.environ.get("TRAZA_ID") or uuid.uuid4().hex[:16]
+PADRE_EXTERNO = os.environ.get("TRAZA_PADRE")
+
+# Límites (en segundos) de los cubos del histograma de latencia de las llamadas a HDFS
+CUBOS_LATENCIA = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Tramo en curso del hilo (o de la tarea) actual
+_actual = contextvars.ContextVar("tramo_actual", default=None)
+_cerrojo_archivo = threading.Lock()
+
+# ---------------------------------------------------------
+# 2. TRAMOS
+# ---------------------------------------------------------
+class Tramo:
+    """
+    Un paso medido del pipeline. El tiempo de CPU se toma de dos formas:
+      - cpu_segundos:          CPU del hilo que ejecuta el tramo.
+      - cpu_proceso_segundos:  CPU de todo el proceso en ese intervalo (incluye los hilos
+                               de copia/checksum, pero también otras etapas en paralelo).
+    """
+    def __init__(self, nombre, padre, atributos):
+        self.id = uuid.uuid4().hex[:16]
+        self.nombre = nombre
+        self.padre = padre
+        self.atributos = atributos
+        self.contadores = Counter()
+        self.estado = "ok"
+        self.error = None
+        self.instante = datetime.now().isoformat(timespec="milliseconds")
+        self.segundos = self.cpu_segundos = self.cpu_proceso_segundos = None
+        self._t0, self._cpu0, self._proceso0 = time.perf_counter(), time.thread_time(), time.process_time()
+        self._cerrojo = threading.Lock()
+
+    @property
+    def transcurrido(self):
+        """Segundos desde que empezó el tramo (o su duración, si ya terminó)."""
+        return self.segundos if self.segundos is not None else time.perf_counter() - self._t0
+
+    def sumar(self, **valores):
+        # Los hilos de un pool pueden sumar a la vez al tramo de su etapa
+        with self._cerrojo:
+            self.contadores.update(valores)
+
+    def fallar(self, error):
+        """Marca el tramo como fallido aunque la excepción se haya capturado dentro."""
+        self.estado, self.error = "error", f"{type(error).__name__}: {error}"
+
+    def cerrar(self):
+        self.segundos = time.perf_counter() - self._t0
+        self.cpu_segundos = time.thread_time() - self._cpu0
+        self.cpu_proceso_segundos = time.process_time() - self._proceso0
+
+    def registro(self):
+        return {"traza": TRAZA, "tramo": self.id, "padre": self.padre, "nombre": self.nombre,
+                "inicio": self.instante, "segundos": round(self.segundos, 6),
+                "cpu_segundos": round(self.cpu_segundos, 6),
+                "cpu_proceso_segundos": round(self.cpu_proceso_segundos, 6),
+                "estado": self.estado, "error": self.error, "atributos": self.atributos,
+                "contadores": {k: round(v, 6) if isinstance(v, float) else v for k, v in self.contadores.items()}}
+
+@contextmanager
+def tramo(nombre, **atributos):
+    """
+    Abre un tramo hijo del tramo en curso. Sirve como 'with' y como decorador.
+    Al cerrarse se escribe en la traza y se acumula en las métricas. Si es el
+    tramo raíz del proceso, además se exportan las métricas a disco.
+    """
+    padre = _actual.get()
+    actual = Tramo(nombre, padre.id if padre else PADRE_EXTERNO, atributos)
+    token = _actual.set(actual)
+    try:
+        yield actual
+    except BaseException as e:
+        actual.fallar(e)
+        raise
+    finally:
+        _actual.reset(token)
+        actual.cerrar()
+        registrar(actual)
+        if padre is None:
+            exportar()
+
+class EtapaFallida(Exception):
+    """La etapa terminó con su tramo marcado como fallido (errores capturados dentro)."""
+
+def etapa(nombre, **atributos):
+    """
+    Decorador de la función principal de una etapa. Es un tramo como @tramo, pero
+    las etapas capturan sus errores (actual().fallar()) para terminar de escribir
+    sus reportes: si al cerrarse el tramo ha quedado fallido, lanza EtapaFallida.
+    Así el fallo llega a quien ejecuta la etapa (el código de salida del script o
+    el DAG de 90_run_all.py) aunque ninguna excepción haya salido de la función.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with tramo(nombre, **atributos) as t:
+                resultado = funcion(*args, **kwargs)
+            if t.estado == "error":
+                raise EtapaFallida(f"{nombre}: {t.error}")
+            return resultado
+        return envoltura
+    return decorador
+
+def salir(funcion, *args, **kwargs):
+    """
+    Punto de entrada de un script: ejecuta la etapa y, si falla, termina con código 1
+    (sin volcar la pila: la etapa ya ha mostrado sus errores).
+    """
+    try:
+        funcion(*args, **kwargs)
+    except EtapaFallida as e:
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] [ERROR] Etapa fallida -> {e}")
+        sys.exit(1)
+
+def actual():
+    """Tramo en curso (o None si no hay ninguno)."""
+    return _actual.get()
+
+def sumar(**valores):
+    """Suma contadores al tramo en curso. Sin tramo abierto no hace nada."""
+    en_curso = _actual.get()
+    if en_curso is not None:
+        en_curso.sumar(**valores)
+
+def propagar(funcion):
+    """
+    Los hilos nuevos (ThreadPoolExecutor, threading.Thread) empiezan sin tramo en
+    curso. propagar() envuelve la función para que se ejecute dentro del tramo de
+    quien la envía: sus contadores y llamadas a HDFS cuentan para ese tramo.
+    """
+    padre = _actual.get()
+
+    def envoltura(*args, **kwargs):
+        token = _actual.set(padre)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            _actual.reset(token)
+    return envoltura
+
+@contextmanager
+def llamada_hdfs(operacion):
+    """Mide una llamada a HDFS: histograma de latencia por operación y contadores del tramo."""
+    inicio = time.perf_counter()
+    error = False
+    try:
+        yield
+    except FileNotFoundError:
+        raise                     # Una ruta que no existe es una respuesta, no un fallo
+    except BaseException:
+        error = True
+        raise
+    finally:
+        segundos = time.perf_counter() - inicio
+        REGISTRO.observar("pipeline_hdfs_llamada_segundos", segundos, operacion=operacion)
+        if error:
+            REGISTRO.incrementar("pipeline_hdfs_errores_total", 1, operacion=operacion)
+        sumar(llamadas_hdfs=1, segundos_hdfs=segundos, errores_hdfs=int(error))
+
+# ---------------------------------------------------------
+# 3. MÉTRICAS (FORMATO PROMETHEUS)
+# ---------------------------------------------------------
+AYUDA = {
+    "pipeline_tramo_ejecuciones_total": ("counter", "Tramos terminados por nombre y estado"),
+    "pipeline_tramo_segundos_total": ("counter", "Tiempo real acumulado de cada tramo"),
+    "pipeline_tramo_cpu_segundos_total": ("counter", "Tiempo de CPU acumulado del hilo de cada tramo"),
+    "pipeline_tramo_ultima_duracion_segundos": ("gauge", "Duración de la última ejecución de cada tramo"),
+    "pipeline_hdfs_llamada_segundos": ("histogram", "Latencia de las llamadas a HDFS por operación"),
+    "pipeline_hdfs_errores_total": ("counter", "Llamadas a HDFS fallidas por operación"),
+}
+
+class Registro:
+    """Métricas acumuladas del proceso: contadores, indicadores e histogramas con etiquetas."""
+    def __init__(self):
+        self.valores = defaultdict(float)       # (métrica, etiquetas) -> valor
+        self.indicadores = {}                   # (métrica, etiquetas) -> último valor
+        self.histogramas = {}                   # (métrica, etiquetas) -> [cubos..., suma, cuenta]
+        self.cerrojo = threading.Lock()
+
+    def incrementar(self, metrica, valor, **etiquetas):
+        with self.cerrojo:
+            self.valores[metrica, tuple(sorted(etiquetas.items()))] += valor
+
+    def fijar(self, metrica, valor, **etiquetas):
+        with self.cerrojo:
+            self.indicadores[metrica, tuple(sorted(etiquetas.items()))] = valor
+
+    def observar(self, metrica, valor, **etiquetas):
+        with self.cerrojo:
+            h = self.histogramas.setdefault((metrica, tuple(sorted(etiquetas.items()))),
+                                            [0] * len(CUBOS_LATENCIA) + [0.0, 0])
+            for i, limite in enumerate(CUBOS_LATENCIA):
+                if valor <= limite:
+                    h[i] += 1
+            h[-2] += valor
+            h[-1] += 1
+
+    def texto(self):
+        """Exposición en formato de texto de Prometheus (versión 0.0.4)."""
+        with self.cerrojo:
+            series = defaultdict(list)
+            for (metrica, etiquetas), valor in sorted([*self.valores.items(), *self.indicadores.items()]):
+                series[metrica].append(f"{metrica}{formatear(etiquetas)} {numero(valor)}")
+            # Los cubos de cada histograma, en orden creciente de 'le' (no alfabético)
+            for (metrica, etiquetas), h in sorted(self.histogramas.items()):
+                for limite, cuenta in zip(CUBOS_LATENCIA, h):
+                    series[metrica].append(f"{metrica}_bucket{formatear(etiquetas + (('le', f'{limite:g}'),))} {cuenta}")
+                series[metrica].append(f"{metrica}_bucket{formatear(etiquetas + (('le', '+Inf'),))} {h[-1]}")
+                series[metrica].append(f"{metrica}_sum{formatear(etiquetas)} {numero(h[-2])}")
+                series[metrica].append(f"{metrica}_count{formatear(etiquetas)} {h[-1]}")
+        lineas = []
+        for metrica in sorted(series):
+            tipo, ayuda = AYUDA.get(metrica, ("counter", "Contador acumulado de los tramos"))
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} {tipo}", *series[metrica]]
+        return "\n".join(lineas) + "\n"
+
+def formatear(etiquetas):
+    if not etiquetas:
+        return ""
+    escapar = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in etiquetas) + "}"
+
+def numero(valor):
+    """Enteros sin decimales ni notación científica (los bytes no pierden precisión)."""
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+def nombre_metrica(contador):
+    """'bytes_escritos' -> 'pipeline_bytes_escritos_total' (solo caracteres válidos en Prometheus)."""
+    return "pipeline_" + re.sub(r"[^a-zA-Z0-9_]", "_", contador) + "_total"
+
+REGISTRO = Registro()
+
+# ---------------------------------------------------------
+# 4. SALIDAS: TRAZA JSONL, ARCHIVO .prom Y ENDPOINT HTTP
+# ---------------------------------------------------------
+def registrar(terminado):
+    """Escribe el tramo en la traza y lo acumula en las métricas."""
+    REGISTRO.incrementar("pipeline_tramo_ejecuciones_total", 1, tramo=terminado.nombre, estado=terminado.estado)
+    REGISTRO.incrementar("pipeline_tramo_segundos_total", terminado.segundos, tramo=terminado.nombre)
+    REGISTRO.incrementar("pipeline_tramo_cpu_segundos_total", terminado.cpu_segundos, tramo=terminado.nombre)
+    REGISTRO.fijar("pipeline_tramo_ultima_duracion_segundos", terminado.segundos, tramo=terminado.nombre)
+    for contador, valor in terminado.contadores.items():
+        if contador not in ("llamadas_hdfs", "segundos_hdfs", "errores_hdfs"):   # Ya están en el histograma
+            REGISTRO.incrementar(nombre_metrica(contador), valor, tramo=terminado.nombre)
+
+    linea = json.dumps(terminado.registro(), ensure_ascii=False) + "\n"
+    try:
+        with _cerrojo_archivo:
+            DIR_TRAZAS.mkdir(parents=True, exist_ok=True)
+            with open(RUTA_TRAZAS, "a", encoding="utf-8") as f:
+                f.write(linea)
+    except OSError as e:
+        # La traza nunca debe tumbar una etapa
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] [WARN]  No se pudo escribir la traza: {e}")
+
+def exportar(ruta=RUTA_METRICAS):
+    """Guarda las métricas en formato Prometheus (escritura atómica: nunca se lee a medias)."""
+    try:
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix(".tmp")
+        temporal.write_text(REGISTRO.texto(), encoding="utf-8")
+        temporal.replace(ruta)
+    except OSError as e:
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] [WARN]  No se pudieron exportar las métricas: {e}")
+    return ruta
+
+def servir_metricas(puerto):
+    """Sirve las métricas en http://localhost:<puerto>/metrics desde un hilo en segundo plano."""
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            cuerpo = REGISTRO.texto().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass    # Sin una línea de log por cada sondeo de Prometheus
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    return servidor
@@ -0,0 +1,238 @@
+# Índice de ubicación de bloques: bloque -> DataNodes (usado por 65 y 70)
+#
+# 70_incident_simulation.py apaga dos DataNodes y espera a que el NameNode vea el
+# fallo para saber qué se ha roto. Pero la respuesta ya está en la salida de
+# 'fsck -files -blocks -locations' que generan 30 y 60: cada bloque lleva las
+# direcciones (ip:puerto) de los DataNodes que guardan sus réplicas. Con ese
+# listado invertido (nodo -> bloques que guarda) la pregunta "¿qué se pierde o
+# queda sub-replicado si caen X e Y?" se responde al momento, sin apagar nada:
+#
+#   - Solo se miran los bloques con alguna réplica en los nodos caídos.
+#   - Réplicas vivas = réplicas del bloque fuera de los nodos caídos.
+#       0 vivas                      -> bloque perdido (el archivo queda MISSING)
+#       menos que su replicación     -> bloque sub-replicado
+#
+# Además mide el reparto de bloques entre nodos (sesgo) y ordena los nodos por el
+# daño que haría su caída, para decidir cuáles drenar primero en un mantenimiento.
+#
+# Formato del índice guardado (JSON compacto: los nodos y rutas se guardan una vez):
+#   {"fecha": "2026-02-05", "fuentes": [...], "nodos": ["172.18.0.5:9866", ...],
+#    "nombres": {"172.18.0.5": "clustera-dnnm-1"}, "rutas": ["/data/logs/...", ...],
+#    "replicacion": [3, ...], "bloques": [["blk_1073741825", 0, 134217728, [0, 2, 3]], ...]}
+#
+# Uso:
+#   indice = IndiceUbicacion.desde_registros(registros_fsck)
+#   impacto = indice.impacto(["clustera-dnnm-1", "clustera-dnnm-2"])
+
+import json
+import subprocess
+from collections import Counter, defaultdict
+from dataclasses import asdict, is_dataclass
+from statistics import mean, pstdev
+
+# ---------------------------------------------------------
+# 1. NOMBRES DE LOS NODOS
+# ---------------------------------------------------------
+# fsck identifica las réplicas por ip:puerto; 70 apaga los nodos por el nombre del
+# contenedor. Los DataNodes del docker compose son los contenedores con este filtro.
+FILTRO_DATANODES = "dnnm"
+
+def nombres_docker(filtro=FILTRO_DATANODES):
+    """
+    {ip: nombre del contenedor} de los DataNodes en marcha, según 'docker inspect'.
+    Sin Docker (backend local o fuera del host del clúster) devuelve {} y los nodos
+    se muestran por su ip:puerto.
+    """
+    try:
+        nombres = subprocess.run(["docker", "ps", "--filter", f"name={filtro}", "--format", "{{.Names}}"],
+                                 capture_output=True, text=True, check=True).stdout.split()
+        if not nombres:
+            return {}
+        salida = subprocess.run(["docker", "inspect", "-f",
+                                 "{{.Name}} {{range .NetworkSettings.Networks}}{{.IPAddress}} {{end}}", *nombres],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    ips = {}
+    for linea in salida.splitlines():
+        nombre, *direcciones = linea.split()
+        for ip in direcciones:
+            ips[ip] = nombre.lstrip("/")
+    return ips
+
+# ---------------------------------------------------------
+# 2. EL ÍNDICE
+# ---------------------------------------------------------
+class IndiceUbicacion:
+    """
+    Bloques con sus réplicas y el índice invertido nodo -> bloques.
+    Los nodos y las rutas se guardan como posiciones en listas (no como textos
+    repetidos en cada bloque): un millón de bloques ocupa decenas de MB, no cientos.
+    """
+    def __init__(self, fecha="", fuentes=(), nombres=None):
+        self.fecha = fecha
+        self.fuentes = list(fuentes)
+        self.nombres = dict(nombres or {})      # ip -> nombre del contenedor
+        self.nodos, self._pos_nodo = [], {}     # "ip:puerto" y su posición
+        self.rutas, self._pos_ruta = [], {}
+        self.replicacion = []                   # Replicación pedida por archivo (misma posición que rutas)
+        self.bloques = []                       # (id, posición de la ruta, tam, (posiciones de nodos))
+        self.por_nodo = defaultdict(list)       # posición del nodo -> posiciones de sus bloques
+
+    # --- Construcción ---
+    def _posicion(self, lista, posiciones, valor):
+        if valor not in posiciones:
+            posiciones[valor] = len(lista)
+            lista.append(valor)
+        return posiciones[valor]
+
+    def _ruta(self, ruta):
+        pos = self._posicion(self.rutas, self._pos_ruta, ruta)
+        if pos == len(self.replicacion):
+            self.replicacion.append(0)
+        return pos
+
+    def _enlazar(self, bloque, ruta, tam, nodos):
+        """Guarda un bloque (ruta y nodos ya como posiciones) y lo apunta en el índice invertido."""
+        pos = len(self.bloques)
+        self.bloques.append((bloque, ruta, tam, nodos))
+        for nodo in nodos:
+            self.por_nodo[nodo].append(pos)
+
+    def añadir_bloque(self, bloque, ruta, tam, replicas):
+        nodos = tuple(self._posicion(self.nodos, self._pos_nodo, r) for r in dict.fromkeys(replicas))
+        self._enlazar(bloque, self._ruta(ruta), tam, nodos)
+
+    def añadir_registros(self, registros):
+        """
+        Añade los registros de un fsck: los de fsck_parser.parsear_fsck o las líneas
+        ya leídas de un reporte JSONL de 30/60 (diccionarios con el mismo contenido).
+        Del Archivo se toma la replicación pedida y de cada Bloque sus réplicas.
+        """
+        for registro in registros:
+            if is_dataclass(registro):
+                registro = asdict(registro)
+            if registro["tipo"] == "bloque":
+                self.añadir_bloque(registro["bloque"], registro["ruta"], registro["tam"], registro["replicas"])
+            elif registro["tipo"] == "archivo":
+                self.replicacion[self._ruta(registro["ruta"])] = registro["replicacion"]
+
+    @classmethod
+    def desde_registros(cls, registros, **kwargs):
+        indice = cls(**kwargs)
+        indice.añadir_registros(registros)
+        return indice
+
+    # --- Guardado ---
+    def guardar(self, ruta):
+        datos = {"fecha": self.fecha, "fuentes": self.fuentes, "nodos": self.nodos, "nombres": self.nombres,
+                 "rutas": self.rutas, "replicacion": self.replicacion,
+                 "bloques": [[b, r, t, list(n)] for b, r, t, n in self.bloques]}
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, separators=(",", ":"))
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        indice = cls(datos["fecha"], datos["fuentes"], datos["nombres"])
+        indice.nodos, indice.rutas, indice.replicacion = datos["nodos"], datos["rutas"], datos["replicacion"]
+        indice._pos_nodo = {n: i for i, n in enumerate(indice.nodos)}
+        indice._pos_ruta = {r: i for i, r in enumerate(indice.rutas)}
+        for bloque, ruta, tam, nodos in datos["bloques"]:
+            indice._enlazar(bloque, ruta, tam, tuple(nodos))
+        return indice
+
+    # --- Nombres ---
+    def nombre(self, pos):
+        """'clustera-dnnm-1 (172.18.0.5:9866)' si se conoce el contenedor, si no 'ip:puerto'."""
+        direccion = self.nodos[pos]
+        nombre = self.nombres.get(direccion.rsplit(":", 1)[0])
+        return f"{nombre} ({direccion})" if nombre else direccion
+
+    def resolver(self, nodos):
+        """
+        Posiciones de los nodos pedidos, dados por nombre del contenedor, por ip o
+        por ip:puerto. Lanza ValueError si alguno no guarda ningún bloque del índice.
+        """
+        posiciones = set()
+        for pedido in nodos:
+            encontrados = {pos for pos, direccion in enumerate(self.nodos)
+                           if pedido in (direccion, direccion.rsplit(":", 1)[0],
+                                         self.nombres.get(direccion.rsplit(":", 1)[0]))}
+            if not encontrados:
+                raise ValueError(f"El nodo {pedido} no guarda ningún bloque del índice "
+                                 f"(nodos conocidos: {', '.join(self.nombre(p) for p in range(len(self.nodos)))})")
+            posiciones |= encontrados
+        return posiciones
+
+    # ---------------------------------------------------------
+    # 3. CONSULTAS
+    # ---------------------------------------------------------
+    def impacto(self, nodos):
+        """
+        Qué pasaría si cayeran a la vez los nodos dados. Solo recorre los bloques con
+        alguna réplica en ellos. Devuelve un diccionario con los contadores y las
+        rutas de los archivos que quedarían MISSING o sub-replicados.
+        """
+        return self._impacto(self.resolver(nodos))
+
+    def _impacto(self, caidos):
+        afectados = set()
+        for nodo in caidos:
+            afectados.update(self.por_nodo.get(nodo, ()))
+
+        cuenta = Counter()
+        perdidos, subreplicados = set(), set()
+        for pos in afectados:
+            _, ruta, tam, replicas = self.bloques[pos]
+            vivas = sum(nodo not in caidos for nodo in replicas)
+            if vivas == 0:
+                cuenta["bloques_perdidos"] += 1
+                cuenta["bytes_perdidos"] += tam
+                perdidos.add(ruta)
+            elif vivas < self.replicacion[ruta]:
+                cuenta["bloques_subreplicados"] += 1
+                if vivas == 1:
+                    # Una sola copia: el siguiente fallo ya pierde datos
+                    cuenta["bloques_una_replica"] += 1
+                subreplicados.add(ruta)
+        subreplicados -= perdidos
+        return {"nodos": sorted(self.nombre(p) for p in caidos), "bloques_afectados": len(afectados),
+                "bloques_perdidos": cuenta["bloques_perdidos"], "bytes_perdidos": cuenta["bytes_perdidos"],
+                "bloques_subreplicados": cuenta["bloques_subreplicados"],
+                "bloques_una_replica": cuenta["bloques_una_replica"],
+                "archivos_perdidos": sorted(self.rutas[r] for r in perdidos),
+                "archivos_subreplicados": sorted(self.rutas[r] for r in subreplicados)}
+
+    def sesgo(self):
+        """
+        Reparto de bloques entre nodos: bloques, bytes y desviación respecto a la
+        media de cada nodo, más el coeficiente de variación (0 = reparto perfecto).
+        """
+        nodos = []
+        for pos in range(len(self.nodos)):
+            bloques = self.por_nodo.get(pos, [])
+            nodos.append({"nodo": self.nombre(pos), "bloques": len(bloques),
+                          "bytes": sum(self.bloques[b][2] for b in bloques)})
+        cuentas = [n["bloques"] for n in nodos] or [0]
+        media = mean(cuentas)
+        for n in nodos:
+            n["desviacion"] = (n["bloques"] - media) / media if media else 0.0
+        return {"nodos": sorted(nodos, key=lambda n: -n["bloques"]), "media_bloques": media,
+                "coef_variacion": pstdev(cuentas) / media if media else 0.0}
+
+    def orden_drenaje(self):
+        """
+        Nodos ordenados por el daño que haría su caída (solos): primero los que
+        perderían bloques, luego los que dejarían más bloques con una sola réplica y
+        después los que guardan más. Son los que conviene drenar antes.
+        """
+        orden = []
+        for pos in range(len(self.nodos)):
+            efecto = self._impacto({pos})
+            orden.append({"nodo": self.nombre(pos), "bloques": len(self.por_nodo.get(pos, [])),
+                          "bloques_perdidos": efecto["bloques_perdidos"],
+                          "bloques_una_replica": efecto["bloques_una_replica"],
+                          "bloques_subreplicados": efecto["bloques_subreplicados"]})
+        return sorted(orden, key=lambda n: (-n["bloques_perdidos"], -n["bloques_una_replica"], -n["bloques"]))
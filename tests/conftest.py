@@ -0,0 +1,10 @@
+# Los scripts no son un paquete: se importan desde su carpeta, como hacen entre ellos.
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+# Las trazas de los tramos que se ejecutan en las pruebas no van a la carpeta del notebook
+os.environ.setdefault("TRAZAS_DIR", tempfile.mkdtemp(prefix="trazas_pruebas_"))
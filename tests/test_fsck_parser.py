@@ -0,0 +1,126 @@
+import json
+
+from fsck_parser import Archivo, Bloque, Replica, Resumen, parsear_fsck, volcar_fsck
+
+# Salida de 'hdfs fsck /data -files -blocks -locations' recortada: un archivo sano, uno
+# con un bloque sub-replicado, uno con un bloque perdido, uno con una réplica corrupta
+# y uno con erasure coding.
+SALIDA_FSCK = """\
+Connecting to namenode via http://namenode:9870/fsck?ugi=hdadmin&files=1&blocks=1&locations=1&path=%2Fdata
+FSCK started by hdadmin (auth:SIMPLE) from /172.18.0.2 for path /data at Thu Feb 05 10:00:00 UTC 2026
+
+/data <dir>
+/data/logs/raw/dt=2026-02-05 <dir>
+/data/logs/raw/dt=2026-02-05/sano.log 100 bytes, replicated: replication=3, 1 block(s):  OK
+0. BP-1-172.18.0.2-1:blk_1073741825_1001 len=100 Live_repl=3  [DatanodeInfoWithStorage[172.18.0.5:9866,DS-a,DISK], DatanodeInfoWithStorage[172.18.0.6:9866,DS-b,DISK], DatanodeInfoWithStorage[172.18.0.7:9866,DS-c,SSD]]
+
+/data/logs/raw/dt=2026-02-05/sub.log 200 bytes, replicated: replication=3, 1 block(s):  Under replicated BP-1-172.18.0.2-1:blk_1073741826_1002. Target Replicas is 3 but found 2 live replica(s), 0 decommissioned replica(s), 0 decommissioning replica(s).
+0. BP-1-172.18.0.2-1:blk_1073741826_1002 len=200 Live_repl=2  [DatanodeInfoWithStorage[172.18.0.5:9866,DS-a,DISK], DatanodeInfoWithStorage[172.18.0.6:9866,DS-b,DISK]]
+
+/data/logs/raw/dt=2026-02-05/perdido.log 300 bytes, replicated: replication=3, 1 block(s): 
+/data/logs/raw/dt=2026-02-05/perdido.log: MISSING 1 blocks of total size 300 B.
+0. BP-1-172.18.0.2-1:blk_1073741827_1003 len=300 MISSING!
+
+/data/iot/raw/dt=2026-02-05 <dir>
+/data/iot/raw/dt=2026-02-05/corrupto.jsonl 400 bytes, replicated: replication=3, 1 block(s): 
+/data/iot/raw/dt=2026-02-05/corrupto.jsonl: CORRUPT blockpool BP-1-172.18.0.2-1 block blk_1073741828
+0. BP-1-172.18.0.2-1:blk_1073741828_1004 len=400 Live_repl=3 CORRUPT  [DatanodeInfoWithStorage[172.18.0.5:9866,DS-a,DISK], DatanodeInfoWithStorage[172.18.0.6:9866,DS-b,DISK], DatanodeInfoWithStorage[172.18.0.7:9866,DS-c,DISK]]
+
+/data/ec/dt=2026-02-05 <dir>
+/data/ec/dt=2026-02-05/frio.bin 500 bytes, erasure-coded: policy=RS-3-2-1024k, 1 block(s):  OK
+0. BP-1-172.18.0.2-1:blk_-9223372036854775792_1005 len=500 Live_repl=5  [blk_-9223372036854775792:DatanodeInfoWithStorage[172.18.0.5:9866,DS-a,DISK]]
+
+
+Status: CORRUPT
+ Number of data-nodes:\t3
+ Number of racks:\t\t1
+ Total dirs:\t\t\t4
+ Total symlinks:\t\t0
+
+Replicated Blocks:
+ Total size:\t1000 B
+ Total files:\t4
+ Total blocks (validated):\t4 (avg. block size 250 B)
+ Under-replicated blocks:\t1 (25.0 %)
+ Missing blocks:\t\t1
+ Corrupt blocks:\t\t1
+ Average block replication:\t2.0
+
+Erasure Coded Block Groups:
+ Total size:\t500 B
+ Total files:\t1
+ Missing block groups:\t\t0
+FSCK ended at Thu Feb 05 10:00:01 UTC 2026 in 12 milliseconds
+
+
+The filesystem under path '/data' is CORRUPT
+"""
+
+def registros(tipo=None):
+    return [r for r in parsear_fsck(SALIDA_FSCK.splitlines(keepends=True)) if tipo in (None, r.tipo)]
+
+def test_tipos_y_orden_de_los_registros():
+    todos = registros()
+    # Los bloques y réplicas de un archivo salen antes que su registro Archivo; el Resumen, al final
+    assert [type(r) for r in todos[:5]] == [Bloque, Replica, Replica, Replica, Archivo]
+    assert isinstance(todos[-1], Resumen)
+    assert len(registros("archivo")) == 5 and len(registros("bloque")) == 5
+
+def test_archivos_y_estados():
+    archivos = {a.ruta.rsplit("/", 1)[1]: a for a in registros("archivo")}
+    assert {nombre: a.estado for nombre, a in archivos.items()} == {
+        "sano.log": "OK", "sub.log": "UNDER_REPLICATED", "perdido.log": "MISSING",
+        "corrupto.jsonl": "CORRUPT", "frio.bin": "OK"}
+    assert archivos["sub.log"].bloques_subreplicados == 1
+    assert archivos["perdido.log"].bloques_perdidos == 1
+    assert archivos["corrupto.jsonl"].bloques_corruptos == 1
+    assert (archivos["sano.log"].tam, archivos["sano.log"].replicacion, archivos["sano.log"].bloques) == (100, 3, 1)
+
+def test_erasure_coding():
+    [archivo] = [a for a in registros("archivo") if a.ruta.endswith("frio.bin")]
+    [bloque] = [b for b in registros("bloque") if b.ruta.endswith("frio.bin")]
+    # Sin factor de replicación (0): sus réplicas vivas no se comparan con nada
+    assert archivo.replicacion == 0 and archivo.estado == "OK"
+    assert bloque.bloque == "blk_-9223372036854775792" and bloque.estado == "OK"
+
+def test_bloques_y_replicas():
+    bloques = {b.bloque: b for b in registros("bloque")}
+    assert bloques["blk_1073741825"].replicas == ["172.18.0.5:9866", "172.18.0.6:9866", "172.18.0.7:9866"]
+    assert bloques["blk_1073741825"].pool == "BP-1-172.18.0.2-1" and bloques["blk_1073741825"].tam == 100
+    assert bloques["blk_1073741826"].replicas_vivas == 2 and bloques["blk_1073741826"].estado == "UNDER_REPLICATED"
+    assert bloques["blk_1073741827"].estado == "MISSING" and bloques["blk_1073741827"].replicas == []
+    assert bloques["blk_1073741828"].estado == "CORRUPT"
+
+    replicas = [r for r in registros("replica") if r.bloque == "blk_1073741825"]
+    assert replicas[2] == Replica(ruta="/data/logs/raw/dt=2026-02-05/sano.log", bloque="blk_1073741825",
+                                  ip="172.18.0.7", puerto=9866, almacenamiento="DS-c", medio="SSD")
+    assert len(registros("replica")) == 9
+
+def test_resumen():
+    [resumen] = registros("resumen")
+    assert (resumen.ruta, resumen.estado) == ("/data", "CORRUPT")
+    assert resumen.contadores["under_replicated_blocks"] == 1
+    assert resumen.contadores["missing_blocks"] == 1
+    assert resumen.contadores["corrupt_blocks"] == 1
+    assert resumen.contadores["average_block_replication"] == 2.0
+    # Los contadores de erasure coding van con el prefijo ec_
+    assert resumen.contadores["total_files"] == 4 and resumen.contadores["ec_total_files"] == 1
+    assert resumen.contadores["ec_missing_block_groups"] == 0
+
+def test_volcar_fsck(tmp_path):
+    ruta_txt, ruta_jsonl = tmp_path / "fsck.txt", tmp_path / "fsck.jsonl"
+    resumen, totales = volcar_fsck(SALIDA_FSCK.splitlines(keepends=True), ruta_txt, ruta_jsonl)
+
+    # El texto original se copia tal cual
+    assert ruta_txt.read_text(encoding="utf-8") == SALIDA_FSCK
+    assert resumen.estado == "CORRUPT"
+    assert totales["archivo"] == 5 and totales["bloque"] == 5 and totales["replica"] == 9
+    assert totales["archivo_OK"] == 2 and totales["archivo_CORRUPT"] == 1 and totales["bloque_MISSING"] == 1
+
+    # El JSONL no lleva líneas de réplica (van dentro de su bloque) y termina con el resumen
+    lineas = [json.loads(l) for l in ruta_jsonl.read_text(encoding="utf-8").splitlines()]
+    assert [l["tipo"] for l in lineas].count("replica") == 0
+    assert len(lineas) == 5 + 5 + 1 and lineas[-1]["tipo"] == "resumen"
+    assert lineas[0] == {"ruta": "/data/logs/raw/dt=2026-02-05/sano.log", "indice": 0, "pool": "BP-1-172.18.0.2-1",
+                         "bloque": "blk_1073741825", "tam": 100, "replicas_vivas": 3, "estado": "OK",
+                         "replicas": ["172.18.0.5:9866", "172.18.0.6:9866", "172.18.0.7:9866"], "tipo": "bloque"}
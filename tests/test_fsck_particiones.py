@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import fsck_particiones
+from hdfs_io import HDFSLocal
+
+class HDFSMovido(HDFSLocal):
+    """Backend local en el que las réplicas de un archivo se pueden mover de DataNode."""
+    def __init__(self, raiz):
+        super().__init__(raiz)
+        self.nodos = {}
+
+    def ubicaciones(self, ruta):
+        return [{**b, "names": self.nodos.get(ruta, b["names"])} for b in super().ubicaciones(ruta)]
+
+def test_huella_cambia_si_se_mueve_una_replica(tmp_path):
+    hdfs = HDFSMovido(tmp_path)
+    hdfs.escribir("/data/logs/raw/dt=2026-02-05/logs.log", b"x" * 100)
+    antes = fsck_particiones.huella(hdfs, "/data/logs/raw/dt=2026-02-05")
+    assert antes == fsck_particiones.huella(hdfs, "/data/logs/raw/dt=2026-02-05")
+
+    hdfs.nodos["/data/logs/raw/dt=2026-02-05/logs.log"] = ["172.18.0.9:9866"]
+    assert fsck_particiones.huella(hdfs, "/data/logs/raw/dt=2026-02-05") != antes
+
+def test_huella_de_unidad_borrada(tmp_path):
+    assert fsck_particiones.huella(HDFSLocal(tmp_path), "/data/logs/raw/dt=2026-02-05") is None
+
+def test_auditar_solo_la_fecha_del_backfill(tmp_path, monkeypatch):
+    monkeypatch.setattr(fsck_particiones, "DIR_CACHE", tmp_path / "cache")
+    hdfs = HDFSLocal(tmp_path / "hdfs")
+    for dt in ("2026-02-04", "2026-02-05"):
+        hdfs.escribir(f"/data/logs/raw/dt={dt}/logs_{dt}.log", b"x" * 100)
+        hdfs.escribir(f"/data/iot/raw/dt={dt}/iot_{dt}.jsonl", b"y" * 50)
+    ctx = SimpleNamespace(hdfs=hdfs, local=True)
+
+    fsck_particiones.auditar_capa(ctx, "/data", tmp_path / "todo.txt", tmp_path / "todo.jsonl")
+    resumen, totales, particiones = fsck_particiones.auditar_capa(
+        ctx, "/data", tmp_path / "dia.txt", tmp_path / "dia.jsonl", fecha="2026-02-05")
+
+    assert totales["archivo"] == 2 and resumen.contadores["total_files"] == 2
+    assert "dt=2026-02-04" not in (tmp_path / "dia.txt").read_text()
+    assert particiones == {"auditadas": 0, "reutilizadas": 2}
+    # La auditoría de una fecha no saca de la caché las particiones de las demás
+    assert len(fsck_particiones.CacheFsck("/data").indice) == 4
+
+def test_cerrar_no_pierde_los_cambios_de_otro_proceso(tmp_path, monkeypatch):
+    monkeypatch.setattr(fsck_particiones, "DIR_CACHE", tmp_path)
+    cuerpo = tmp_path / "cuerpo.txt"
+    cuerpo.write_text("")
+    resumen = SimpleNamespace(lineas=["Status: HEALTHY"])
+    # Dos procesos abren la caché a la vez y cada uno guarda su partición
+    a, b = fsck_particiones.CacheFsck("/data"), fsck_particiones.CacheFsck("/data")
+    a.guardar("/data/logs/raw/dt=2026-02-04", "h1", cuerpo, resumen)
+    b.guardar("/data/logs/raw/dt=2026-02-05", "h2", cuerpo, resumen)
+    a.cerrar(["/data/logs/raw/dt=2026-02-04"], alcance=lambda u: u.endswith("2026-02-04"))
+    b.cerrar(["/data/logs/raw/dt=2026-02-05"], alcance=lambda u: u.endswith("2026-02-05"))
+
+    assert set(fsck_particiones.CacheFsck("/data").indice) == {"/data/logs/raw/dt=2026-02-04",
+                                                               "/data/logs/raw/dt=2026-02-05"}
+    assert not (tmp_path / "data" / "indice.lock").exists()
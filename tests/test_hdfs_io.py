@@ -0,0 +1,95 @@
+import subprocess
+
+import pytest
+
+import hdfs_io
+from hdfs_io import HDFSWeb, ErrorHDFS, parsear_checksum
+
+SALIDA_CHECKSUM = (b"/data/logs/raw/dt=2026-02-05/logs_2026-02-05.log\tMD5-of-131072MD5-of-512CRC32C\t"
+                   b"000002000000000000020000d1f3c6b4a0e5b1c8b4e8f4a3c6a2b1e0\n")
+
+class SesionSinRed:
+    """Cualquier petición HTTP falla: el camino docker no debe usarla."""
+    def request(self, *args, **kwargs):
+        raise AssertionError("petición HTTP inesperada")
+
+def test_checksum_docker_usa_dfs_checksum(monkeypatch):
+    llamadas = []
+
+    def run(argumentos, **kwargs):
+        llamadas.append(argumentos)
+        return subprocess.CompletedProcess(argumentos, 0, stdout=SALIDA_CHECKSUM, stderr=b"")
+
+    monkeypatch.setattr(hdfs_io.subprocess, "run", run)
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    resultado = hdfs.checksum("/data/logs/raw/dt=2026-02-05/logs_2026-02-05.log")
+
+    assert llamadas == [["docker", "exec", "namenode", "hdfs", "dfs", "-checksum",
+                         "/data/logs/raw/dt=2026-02-05/logs_2026-02-05.log"]]
+    assert resultado == {"algorithm": "MD5-of-131072MD5-of-512CRC32C",
+                         "bytes": "000002000000000000020000d1f3c6b4a0e5b1c8b4e8f4a3c6a2b1e0", "length": 28}
+
+def test_checksum_docker_error(monkeypatch):
+    monkeypatch.setattr(hdfs_io.subprocess, "run", lambda argumentos, **kwargs: subprocess.CompletedProcess(
+        argumentos, 1, stdout=b"", stderr=b"checksum: `/no/existe': No such file or directory"))
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    with pytest.raises(ErrorHDFS, match="No such file"):
+        hdfs.checksum("/no/existe")
+
+def test_parsear_checksum_sin_checksum():
+    with pytest.raises(ErrorHDFS):
+        parsear_checksum("/data/vacio\tNONE\t\n", "/data/vacio")
+
+def test_leer_rango_docker_usa_curl_en_el_namenode(monkeypatch):
+    llamadas = []
+
+    def run(argumentos, **kwargs):
+        llamadas.append(argumentos)
+        return subprocess.CompletedProcess(argumentos, 0, stdout=b"0123456789", stderr=b"")
+
+    monkeypatch.setattr(hdfs_io.subprocess, "run", run)
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    datos = hdfs.leer_rango("/data/logs/raw/dt=2026-02-05/logs 1.log", offset=65536, longitud=10)
+
+    assert datos == b"0123456789"
+    assert llamadas == [["docker", "exec", "namenode", "curl", "-sSfL",
+                         "http://localhost:9870/webhdfs/v1/data/logs/raw/dt%3D2026-02-05/logs%201.log"
+                         "?op=OPEN&user.name=hdadmin&offset=65536&length=10"]]
+
+def test_leer_rango_docker_sin_curl(monkeypatch):
+    monkeypatch.setattr(hdfs_io.subprocess, "run", lambda argumentos, **kwargs: subprocess.CompletedProcess(
+        argumentos, 126, stdout=b"", stderr=b'OCI runtime exec failed: exec: "curl": executable file not found in $PATH'))
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    with pytest.raises(ErrorHDFS, match="HDFS_DATOS=webhdfs"):
+        hdfs.leer_rango("/data/a.log", offset=0, longitud=10)
+
+def test_leer_rangos_docker_un_solo_exec(monkeypatch):
+    llamadas = []
+
+    def run(argumentos, **kwargs):
+        llamadas.append(argumentos)
+        return subprocess.CompletedProcess(argumentos, 0, stdout=b"10\n0123456789      3\nabc", stderr=b"")
+
+    monkeypatch.setattr(hdfs_io.subprocess, "run", run)
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    trozos = hdfs.leer_rangos("/data/a.log", [(0, 10), (65536, 3)])
+
+    assert trozos == [b"0123456789", b"abc"]
+    assert len(llamadas) == 1
+    assert llamadas[0][:5] == ["docker", "exec", "namenode", "sh", "-c"]
+    assert llamadas[0][6:] == ["sh", "http://localhost:9870/webhdfs/v1/data/a.log?op=OPEN&user.name=hdadmin&offset=0&length=10",
+                               "http://localhost:9870/webhdfs/v1/data/a.log?op=OPEN&user.name=hdadmin&offset=65536&length=3"]
+
+def test_leer_rangos_docker_salida_incompleta(monkeypatch):
+    monkeypatch.setattr(hdfs_io.subprocess, "run", lambda argumentos, **kwargs: subprocess.CompletedProcess(
+        argumentos, 0, stdout=b"10\n0123", stderr=b""))
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    with pytest.raises(ErrorHDFS, match="incompleta"):
+        hdfs.leer_rangos("/data/a.log", [(0, 10)])
+
+def test_leer_rangos_docker_sin_curl(monkeypatch):
+    monkeypatch.setattr(hdfs_io.subprocess, "run", lambda argumentos, **kwargs: subprocess.CompletedProcess(
+        argumentos, 127, stdout=b"", stderr=b"curl no disponible"))
+    hdfs = HDFSWeb("http://localhost:9870", "hdadmin", SesionSinRed(), datos="docker")
+    with pytest.raises(ErrorHDFS, match="HDFS_DATOS=webhdfs"):
+        hdfs.leer_rangos("/data/a.log", [(0, 10)])
@@ -0,0 +1,37 @@
+import importlib.util
+from pathlib import Path
+
+# Los scripts de etapa empiezan por número: se cargan por su ruta
+_spec = importlib.util.spec_from_file_location(
+    "inventario", Path(__file__).resolve().parent.parent / "scripts" / "50_inventory_compare.py")
+inventario = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(inventario)
+
+def recorrido(*partes):
+    return iter([(p, {"ruta": "/".join(p)}) for p in partes])
+
+def test_diff_ordenado():
+    origen = recorrido(("dt=2026-02-04", "a.log"), ("dt=2026-02-05", "a.log"), ("dt=2026-02-05", "b.log"))
+    destino = recorrido(("dt=2026-02-05", "a.log"), ("dt=2026-02-05", "c.log"))
+    assert [(estado, partes) for estado, partes, _, _ in inventario.diff_ordenado(origen, destino)] == [
+        ("falta", ("dt=2026-02-04", "a.log")),
+        ("comun", ("dt=2026-02-05", "a.log")),
+        ("falta", ("dt=2026-02-05", "b.log")),
+        ("sobra", ("dt=2026-02-05", "c.log")),
+    ]
+
+def test_diff_ordenado_un_lado_vacio():
+    assert [e for e, _, _, _ in inventario.diff_ordenado(recorrido(), recorrido(("a.log",), ("b.log",)))] == [
+        "sobra", "sobra"]
+
+def test_diff_ordenado_lleva_la_info_de_cada_lado():
+    [(estado, partes, info_src, info_dst)] = inventario.diff_ordenado(recorrido(("x", "a.log")),
+                                                                      recorrido(("x", "a.log")))
+    assert (estado, info_src, info_dst) == ("comun", {"ruta": "x/a.log"}, {"ruta": "x/a.log"})
+
+def test_describir_muestra_solo_da_cota_si_sale_limpia():
+    info = {"tam": 20 * 1024 * 1024}
+    muestra = {"rangos": 64, "huecos": 320, "bytes": 4 * 1024 * 1024, "distintos": [], "error": None}
+    assert "corrupción < 6.94%" in inventario.describir_muestra("/data/a.log", info, muestra)
+    assert "corrupción" not in inventario.describir_muestra("/data/a.log", info, {**muestra, "distintos": [0]})
+    assert "corrupción" not in inventario.describir_muestra("/data/a.log", info, {**muestra, "error": "sin curl"})
@@ -0,0 +1,70 @@
+import hashlib
+
+import merkle
+from hdfs_io import HDFSLocal
+
+def crear_capas(raiz):
+    """/data y /backup con los mismos dos archivos."""
+    hdfs = HDFSLocal(raiz)
+    for capa in ("/data", "/backup"):
+        hdfs.escribir(f"{capa}/logs/raw/dt=2026-02-05/logs_2026-02-05.log", b"linea 1\nlinea 2\n")
+        hdfs.escribir(f"{capa}/iot/raw/dt=2026-02-05/iot_2026-02-05.jsonl", b'{"v": 1}\n')
+    return hdfs
+
+def hashear_con(hdfs, rotos=()):
+    """SHA-256 del contenido; los archivos de 'rotos' no se pueden leer (sin hash)."""
+    def hashear(archivos):
+        hashes = {}
+        for ruta in archivos:
+            if any(ruta.endswith(roto) for roto in rotos):
+                continue
+            with hdfs.leer(ruta) as lector:
+                hashes[ruta] = "SHA-256:" + hashlib.sha256(b"".join(lector)).hexdigest()
+        return hashes
+    return hashear
+
+def comparar(hdfs, rotos=()):
+    origen, _ = merkle.construir(hdfs, "/data", "2026-02-05", hashear_con(hdfs, rotos))
+    destino, _ = merkle.construir(hdfs, "/backup", "2026-02-05", hashear_con(hdfs, rotos))
+    visitados = {"nodos": 0, "iguales": 0}
+    return origen, destino, list(merkle.diferencias(origen, destino, visitados)), visitados
+
+def test_capas_iguales(tmp_path):
+    origen, destino, diferencias, visitados = comparar(crear_capas(tmp_path))
+    assert origen["hash"] == destino["hash"] is not None
+    assert diferencias == []
+    assert visitados == {"nodos": 1, "iguales": 2}
+
+def test_archivo_distinto(tmp_path):
+    hdfs = crear_capas(tmp_path)
+    hdfs.escribir("/backup/logs/raw/dt=2026-02-05/logs_2026-02-05.log", b"linea 1\nlinea X\n")
+    _, _, diferencias, visitados = comparar(hdfs)
+    assert [(estado, partes) for estado, partes, _, _ in diferencias] == [
+        ("distinto", ("logs", "raw/dt=2026-02-05", "logs_2026-02-05.log"))]
+    # La familia iot coincide sin bajar por ella
+    assert visitados["iguales"] == 1
+
+def test_falta_y_sobra(tmp_path):
+    hdfs = crear_capas(tmp_path)
+    hdfs.escribir("/data/logs/raw/dt=2026-02-06/logs_2026-02-06.log", b"nuevo\n")
+    hdfs.escribir("/backup/iot/raw/dt=2026-02-04/iot_2026-02-04.jsonl", b"viejo\n")
+    _, _, diferencias, _ = comparar(hdfs)
+    assert sorted((estado, partes[-1]) for estado, partes, _, _ in diferencias) == [
+        ("falta", "logs_2026-02-06.log"), ("sobra", "iot_2026-02-04.jsonl")]
+
+def test_hash_fallido_en_los_dos_lados_no_cuenta_como_igual(tmp_path):
+    hdfs = crear_capas(tmp_path)
+    origen, destino, diferencias, visitados = comparar(hdfs, rotos=("logs_2026-02-05.log",))
+    # El None de la hoja envenena la partición, la familia y la capa
+    assert origen["hash"] is None and destino["hash"] is None
+    assert origen["hijos"]["logs"]["hash"] is None
+    assert origen["hijos"]["iot"]["hash"] is not None
+    assert [(estado, partes[-1]) for estado, partes, _, _ in diferencias] == [("distinto", "logs_2026-02-05.log")]
+    assert visitados["iguales"] == 1
+
+def test_hash_fallido_se_recalcula_en_el_siguiente_manifiesto(tmp_path):
+    hdfs = crear_capas(tmp_path)
+    previo, _ = merkle.construir(hdfs, "/data", "2026-02-05", hashear_con(hdfs, rotos=("logs_2026-02-05.log",)))
+    manifiesto, calculados = merkle.construir(hdfs, "/data", "2026-02-06", hashear_con(hdfs), previo)
+    assert calculados == 1
+    assert manifiesto["hash"] is not None